@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+from helper.options import TRANSPORTS, DEFAULT_TRANSPORT, DEFAULT_MAX_RETRIES
+
 
 _DATA_DIR = 'json_data'
 _JSON_FILE_NAME = 'factory_data.json'
@@ -20,6 +22,20 @@ class Params:
     namespace: str                  # SurrealDB 使用するデータベース名
     json_file: str                  # 製造情報jsonファイルのパス
     clock: int                      # simulate で使用するシミュレータのクロック値
+    batch_size: int                 # import で1リクエストにまとめるレコード/関係数(0: 1件毎に登録)
+    concurrency: int                # import で同時に実行するリクエスト数
+    chunk_size: int                 # import でファイルを逐次読み込む際のメッセージ数(0: ファイル全体を読み込む)
+    resume: bool                    # import で中断したインポートをチェックポイントから再開する
+    delta: bool                     # import で未登録のノードと関係のみを登録する
+    manifest: str                   # import で登録済み識別子を記録するマニフェストファイルパス
+    workers: int                    # import で作業履歴から関係を生成するプロセス数
+    metrics_file: str               # import の統計情報を出力する json ファイルパス
+    max_retries: int                # import で一時的なエラーの場合にリクエストを再試行する回数
+    rate_limit: float               # import で1秒あたりに送信する最大リクエスト数(0: 制限しない)
+    skip_schema: bool               # import でテーブル、フィールド、インデックスを定義しない
+    skip_summary: bool              # import で集計テーブルを生成しない
+    transport: str                  # SurrealDB への接続方式('http', 'ws': WebSocket RPC)
+    snapshot_dir: str               # ダッシュボードのデータセットのスナップショット格納ディレクトリ('': 使用しない)
 
     @property
     def url(self) -> str:
@@ -77,6 +93,15 @@ def set_common_option(parser) -> Any:
         default='test',
         help='Specify the namespace to use'
     )
+    parser.add_argument(
+        '--transport',
+        dest='transport',
+        type=str,
+        action='store',
+        choices=TRANSPORTS,
+        default=DEFAULT_TRANSPORT,
+        help='Specify how to connect to SurrealDB (ws: multiplex requests over one WebSocket RPC connection)'
+    )
     return parser
 
 
@@ -90,6 +115,15 @@ def parse(
     """
     parser = argparse.ArgumentParser()
     set_common_option(parser=parser)
+    parser.add_argument(
+        '--snapshot-dir',
+        dest='snapshot_dir',
+        type=str,
+        action='store',
+        default='',
+        help='Specify the directory where the dashboard stores the snapshots of its datasets '
+             '(created private to the current user; empty: no snapshot)'
+    )
     cwd = Path.cwd()
     json_data_file_path = Path.joinpath(cwd.parent, _DATA_DIR, _JSON_FILE_NAME)
     subparser = parser.add_subparsers(dest='cmd')
@@ -120,6 +154,98 @@ def parse(
         default=json_data_file_path,
         help='Specify the path of the json data file where the factory data is stored'
     )
+    import_parser.add_argument(
+        '--batch-size',
+        dest='batch_size',
+        type=int,
+        action='store',
+        default=0,
+        help='Specify the number of records or relationships sent in one request (0: one request per record)'
+    )
+    import_parser.add_argument(
+        '--concurrency',
+        dest='concurrency',
+        type=int,
+        action='store',
+        default=1,
+        help='Specify the maximum number of requests in flight at the same time (1: sequential)'
+    )
+    import_parser.add_argument(
+        '--chunk-size',
+        dest='chunk_size',
+        type=int,
+        action='store',
+        default=0,
+        help='Specify the number of messages read from the json file at a time (0: read the whole file)'
+    )
+    import_parser.add_argument(
+        '--resume',
+        dest='resume',
+        action='store_true',
+        default=False,
+        help='Resume an interrupted import from its checkpoint (requires --batch-size)'
+    )
+    import_parser.add_argument(
+        '--delta',
+        dest='delta',
+        action='store_true',
+        default=False,
+        help='Import only the nodes and relationships that are not in the database (or the manifest) yet'
+    )
+    import_parser.add_argument(
+        '--manifest',
+        dest='manifest',
+        type=str,
+        action='store',
+        default='',
+        help='Specify the path of the manifest file that records the imported nodes and relationships'
+    )
+    import_parser.add_argument(
+        '--workers',
+        dest='workers',
+        type=int,
+        action='store',
+        default=1,
+        help='Specify the number of processes that derive relationships from the production histories (1: single process)'
+    )
+    import_parser.add_argument(
+        '--metrics-file',
+        dest='metrics_file',
+        type=str,
+        action='store',
+        default='',
+        help='Specify the path of the json file where the import metrics are written'
+    )
+    import_parser.add_argument(
+        '--max-retries',
+        dest='max_retries',
+        type=int,
+        action='store',
+        default=DEFAULT_MAX_RETRIES,
+        help='Specify the maximum number of retries for a request that failed with a transient error (0: no retry)'
+    )
+    import_parser.add_argument(
+        '--rate-limit',
+        dest='rate_limit',
+        type=float,
+        action='store',
+        default=0,
+        help='Specify the maximum number of requests per second (0: unlimited)'
+    )
+    import_parser.add_argument(
+        '--skip-schema',
+        dest='skip_schema',
+        action='store_true',
+        default=False,
+        help='Do not define the tables, fields and indexes before the import'
+    )
+    import_parser.add_argument(
+        '--skip-summary',
+        dest='skip_summary',
+        action='store_true',
+        default=False,
+        help='Do not build the summary tables that the dashboard reads after the import'
+    )
     set_common_option(parser=import_parser)
 
     accepted_args = parser.parse_args(args=args)
@@ -127,11 +253,25 @@ def parse(
         cmd=accepted_args.cmd,
         json_file=accepted_args.file if accepted_args.cmd == 'simulate' or accepted_args.cmd == 'import' else '',
         clock=accepted_args.clock if accepted_args.cmd == 'simulate' else 0,
+        batch_size=accepted_args.batch_size if accepted_args.cmd == 'import' else 0,
+        concurrency=accepted_args.concurrency if accepted_args.cmd == 'import' else 1,
+        chunk_size=accepted_args.chunk_size if accepted_args.cmd == 'import' else 0,
+        resume=accepted_args.resume if accepted_args.cmd == 'import' else False,
+        delta=accepted_args.delta if accepted_args.cmd == 'import' else False,
+        manifest=accepted_args.manifest if accepted_args.cmd == 'import' else '',
+        workers=accepted_args.workers if accepted_args.cmd == 'import' else 1,
+        metrics_file=accepted_args.metrics_file if accepted_args.cmd == 'import' else '',
+        max_retries=accepted_args.max_retries if accepted_args.cmd == 'import' else DEFAULT_MAX_RETRIES,
+        rate_limit=accepted_args.rate_limit if accepted_args.cmd == 'import' else 0,
+        skip_schema=accepted_args.skip_schema if accepted_args.cmd == 'import' else False,
+        skip_summary=accepted_args.skip_summary if accepted_args.cmd == 'import' else False,
         host=accepted_args.server if accepted_args.cmd != 'simulate' else '',
         port=accepted_args.port if accepted_args.cmd != 'simulate' else '',
         user=accepted_args.user if accepted_args.cmd != 'simulate' else '',
         pw=accepted_args.pw if accepted_args.cmd != 'simulate' else '',
         database=accepted_args.database if accepted_args.cmd != 'simulate' else '',
         namespace=accepted_args.namespace if accepted_args.cmd != 'simulate' else '',
+        transport=accepted_args.transport if accepted_args.cmd != 'simulate' else DEFAULT_TRANSPORT,
+        snapshot_dir=accepted_args.snapshot_dir if accepted_args.cmd is None else '',
     )
     return params
@@ -0,0 +1,428 @@
+import asyncio
+import contextvars
+import threading
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from dashboard.shared_cache import SHARED_CACHE, SharedCache
+from dashboard.snapshot_store import get_snapshot_store
+from helper.options import TRANSPORT_WS, DEFAULT_TRANSPORT
+from helper.factory_db_helper import FactoryDBHelper
+from helper.surreal_ws_client import MultiplexedSurrealWS
+from simulator.factory_models import FactoryNodeTable, FactoryRelationship
+
+# 変更を検出する間隔(秒)(デフォルト)
+DEFAULT_POLL_INTERVAL = 5.0
+
+# ライブクエリで変更を反映するノードテーブルとデータセット名
+WATCHED_NODE_DATASETS = {
+    FactoryNodeTable.PRODUCT.name: 'products',
+    FactoryNodeTable.WORK.name: 'works',
+}
+
+# ライブクエリで変更を反映する関係テーブルのデータセット名 ({関係名: 関係レコード群})
+RELATIONSHIPS_DATASET = 'relationships'
+
+# ノード・関係から生成するデータセット (ノード・関係の変更時に破棄し、次回の参照時に再生成する)
+DERIVED_DATASETS = [
+    'factory_data_cache',
+    'production_line_data_cache',
+    'factory_dashboard',
+    'product_work_histories',
+    'transfer_working_histories',
+]
+
+# ライブクエリの通知の種類
+ACTION_CREATE = 'CREATE'
+ACTION_UPDATE = 'UPDATE'
+ACTION_DELETE = 'DELETE'
+
+# スナップショットの再取得中に読み込んだデータセット {データセット名: 読み込みタスク} (再取得中のみ設定する)
+_refreshing: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('refreshing', default=None)
+
+
+def get_record_id(record: Any) -> Optional[str]:
+    """
+    ライブクエリの通知からレコード識別子を取り出す (DELETE の通知はレコード識別子のみ)
+    :param record: 通知のレコード
+    :return: レコード識別子
+    """
+    return record if isinstance(record, str) else record.get('id', None) if isinstance(record, dict) else None
+
+
+def apply_record_changes(
+        records: Optional[List[dict]],
+        changes: List[Tuple[str, Any]],
+) -> List[dict]:
+    """
+    レコード群へ変更を反映する
+    他のセッションが参照中のレコード群は変更せず、変更を反映した新しいレコード群を返す.
+    :param records: レコード群
+    :param changes: 変更群 [(通知の種類, レコード)] (通知順)
+    :return: 変更を反映したレコード群 (登録順を保つ)
+    """
+    _records: {str, dict} = {record.get('id', None): record for record in records} if records else {}
+    for action, record in changes:
+        record_id = get_record_id(record=record)
+        if record_id is None:
+            continue
+        if action == ACTION_DELETE:
+            _records.pop(record_id, None)
+        elif isinstance(record, dict):
+            _records[record_id] = record
+    return list(_records.values())
+
+
+class ChangeSubscriber:
+    """
+    データ変更の購読
+    共有キャッシュのデータセットを SurrealDB の変更に追従させるバックグラウンドスレッド.
+    - WebSocket 接続方式の場合は PRODUCT, WORK, 全関係テーブルのライブクエリ(LIVE SELECT)の通知を
+      キャッシュしたノード・関係へ反映し、それらから生成するデータセットを破棄する.
+    - 接続方式によらず集計テーブルの更新日時(インポータが更新する)を監視し、変更された場合は全データセットを破棄する.
+    - ライブクエリのコネクションが切断された場合は通知を取りこぼしているため、全データセットを破棄して再登録する.
+    - スナップショット(dashboard.snapshot_store)から読み込んだデータセットは、保存時の更新日時が現在と異なる場合に
+      最新データを読み込み、キャッシュとスナップショットを置き換える. データセットを破棄した場合はスナップショットも削除する.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+            transport: str = DEFAULT_TRANSPORT,
+            cache: SharedCache = SHARED_CACHE,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """
+        コンストラクタ
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        :param transport: 接続方式 ('ws' の場合のみライブクエリを使用する)
+        :param cache: 変更を反映する共有キャッシュ
+        :param poll_interval: 変更を検出する間隔(秒)
+        """
+        self.url = url
+        self.namespace = namespace
+        self.database = database
+        self.username = username
+        self.password = password
+        self.transport = transport
+        self.cache = cache
+        self.poll_interval = poll_interval
+        # 未反映の変更 {テーブル名: [(通知の種類, レコード)]}
+        self._changes: {str, List[Tuple[str, Any]]} = {}
+        self._refreshed: Optional[str] = None
+        self._live_client: Optional[MultiplexedSurrealWS] = None
+        self._live_ws: Any = None
+        # 再取得を要求されたデータセット {データセット名: (スナップショットの更新日時, 読み込み関数)}
+        self._snapshot_refreshes: {} = {}
+        # 保存を要求されたスナップショット {データセット名: (データセット, 更新日時)}
+        self._snapshot_saves: {} = {}
+        self._snapshot_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        購読開始 (デーモンスレッドで実行する)
+        :return:
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name='change-subscriber', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        購読終了
+        :return:
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _key(self, name: str) -> Tuple[str, str, str, str]:
+        return self.url, self.namespace, self.database, name
+
+    def invalidate(
+            self,
+            names: Optional[List[str]] = None,
+    ) -> None:
+        """
+        データセット破棄
+        :param names: データセット名群 (省略時 全データセット)
+        :return:
+        """
+        snapshot_store = get_snapshot_store()
+        for name in names if names is not None else [None]:
+            self.cache.invalidate(url=self.url, namespace=self.namespace, database=self.database, name=name)
+            if snapshot_store is not None:
+                snapshot_store.delete(url=self.url, namespace=self.namespace, database=self.database, name=name)
+
+    async def _run(self) -> None:
+        async with FactoryDBHelper(
+                url=self.url,
+                namespace=self.namespace,
+                database=self.database,
+                username=self.username,
+                password=self.password,
+                transport=self.transport,
+        ) as client:
+            # 購読開始時点の更新日時 (キャッシュ済みのデータセットは破棄しない)
+            self._refreshed = await self._get_refreshed(client=client)
+            while not self._stopped.is_set():
+                try:
+                    if self.transport == TRANSPORT_WS:
+                        await self._ensure_live_queries()
+                    self.apply_changes()
+                    await self._check_refreshed(client=client)
+                    await self._refresh_snapshots(client=client)
+                    self._save_snapshots()
+                except Exception as e:
+                    print(f'Change subscription failed. ({e})')
+                await asyncio.sleep(self.poll_interval)
+        if self._live_client is not None:
+            await self._live_client.close()
+
+    @staticmethod
+    async def _get_refreshed(
+            client: FactoryDBHelper,
+    ) -> Optional[str]:
+        try:
+            return await client.get_summary_tables_refreshed()
+        except Exception as e:
+            print(f'{e}')
+            return None
+
+    async def _check_refreshed(
+            self,
+            client: FactoryDBHelper,
+    ) -> None:
+        """
+        集計テーブルの更新日時が変更された場合(インポートの開始、終了)は全データセットを破棄する
+        :param client: SurrealDBヘルパ
+        :return:
+        """
+        refreshed = await client.get_summary_tables_refreshed()
+        if refreshed != self._refreshed:
+            print(f'Factory data was changed. invalidating the cached datasets. (refreshed={refreshed})')
+            self._refreshed = refreshed
+            self._changes.clear()
+            self.invalidate()
+
+    async def _ensure_live_queries(self) -> None:
+        """
+        ライブクエリ登録 (未登録、またはコネクションが切断された場合)
+        :return:
+        """
+        if self._live_client is None:
+            self._live_client = MultiplexedSurrealWS(
+                url=self.url,
+                namespace=self.namespace,
+                database=self.database,
+                username=self.username,
+                password=self.password,
+            )
+        if self._live_ws is not None and self._live_client.ws is self._live_ws and self._live_client.ready:
+            return
+        if self._live_ws is not None:
+            # 切断中の変更は通知されないため全データセットを破棄する
+            print('Live query connection was closed. invalidating the cached datasets.')
+            self._changes.clear()
+            self.invalidate()
+        tables = list(WATCHED_NODE_DATASETS.keys()) + [r.name for r in list(FactoryRelationship)]
+        for table in tables:
+            await self._live_client.subscribe(
+                table=table,
+                handler=lambda notification, _table=table: self._on_notification(table=_table, notification=notification))
+        self._live_ws = self._live_client.ws
+
+    def _on_notification(
+            self,
+            table: str,
+            notification: dict,
+    ) -> None:
+        """
+        ライブクエリの通知 (通知は次回の反映時にまとめて反映する)
+        :param table: テーブル名
+        :param notification: 通知
+        :return:
+        """
+        self._changes.setdefault(table, []).append(
+            (notification.get('action', None), notification.get('result', None)))
+
+    def apply_changes(self) -> None:
+        """
+        未反映の変更をキャッシュしたノード・関係へ反映し、それらから生成するデータセットを破棄する
+        ノード・関係をキャッシュしていない場合は次回の参照時に SurrealDB から取得するため反映しない.
+        :return:
+        """
+        if len(self._changes) <= 0:
+            return
+        changes, self._changes = self._changes, {}
+        relationship_changes = {}
+        for table, table_changes in changes.items():
+            if table in WATCHED_NODE_DATASETS:
+                self.cache.update(
+                    key=self._key(WATCHED_NODE_DATASETS[table]),
+                    function=lambda records, _changes=table_changes: apply_record_changes(records, _changes))
+            else:
+                relationship_changes[table] = table_changes
+        if len(relationship_changes) > 0:
+            self.cache.update(
+                key=self._key(RELATIONSHIPS_DATASET),
+                function=lambda relationships: {
+                    **relationships,
+                    **{relation: apply_record_changes(relationships.get(relation, None), _changes)
+                       for relation, _changes in relationship_changes.items()}
+                })
+        # 変更前のノード・関係のスナップショットは使用できないため削除する
+        snapshot_store = get_snapshot_store()
+        if snapshot_store is not None:
+            names = [WATCHED_NODE_DATASETS[table] for table in changes if table in WATCHED_NODE_DATASETS]
+            for name in names + ([RELATIONSHIPS_DATASET] if len(relationship_changes) > 0 else []):
+                snapshot_store.delete(url=self.url, namespace=self.namespace, database=self.database, name=name)
+        self.invalidate(names=DERIVED_DATASETS)
+        print(f'applied {sum(len(c) for c in changes.values())} changes to the cached datasets.')
+
+    @property
+    def refreshing(self) -> bool:
+        """
+        :return: True: スナップショットの再取得中 (購読スレッドで再取得中のデータセットから参照された場合)
+        """
+        return _refreshing.get() is not None
+
+    def request_snapshot_save(
+            self,
+            name: str,
+            value: Any,
+            fingerprint: Optional[str],
+    ) -> None:
+        """
+        スナップショット保存要求 (次回の変更検出時に購読スレッドで保存する)
+        :param name: データセット名
+        :param value: データセット
+        :param fingerprint: 読み込み開始時の集計テーブルの更新日時
+        :return:
+        """
+        with self._snapshot_lock:
+            self._snapshot_saves[name] = (value, fingerprint)
+
+    def request_snapshot_refresh(
+            self,
+            name: str,
+            fingerprint: Optional[str],
+            load: Callable[[FactoryDBHelper], Awaitable[Any]],
+    ) -> None:
+        """
+        スナップショットから読み込んだデータセットの再取得要求 (次回の変更検出時に購読スレッドで再取得する)
+        :param name: データセット名
+        :param fingerprint: スナップショット保存時の集計テーブルの更新日時
+        :param load: 読み込み関数 (async, 引数: SurrealDBヘルパ)
+        :return:
+        """
+        with self._snapshot_lock:
+            self._snapshot_refreshes[name] = (fingerprint, load)
+
+    async def reload_dataset(
+            self,
+            client: FactoryDBHelper,
+            name: str,
+            load: Callable[[FactoryDBHelper], Awaitable[Any]],
+    ) -> Any:
+        """
+        データセット再取得 (スナップショットの再取得中のみ使用する)
+        キャッシュ・スナップショットを使用せずに最新データを読み込み、キャッシュとスナップショットを置き換える.
+        再取得中に同じデータセットを参照された場合は1回だけ読み込む.
+        :param client: SurrealDBヘルパ
+        :param name: データセット名
+        :param load: 読み込み関数 (async, 引数: SurrealDBヘルパ)
+        :return: データセット
+        """
+        tasks = _refreshing.get()
+        task = tasks.get(name, None)
+        if task is None:
+            async def _reload() -> Any:
+                value = await load(client)
+                self.cache.put(key=self._key(name), value=value)
+                self.request_snapshot_save(name=name, value=value, fingerprint=self._refreshed)
+                return value
+            task = tasks[name] = asyncio.ensure_future(_reload())
+        return await task
+
+    async def _refresh_snapshots(
+            self,
+            client: FactoryDBHelper,
+    ) -> None:
+        """
+        スナップショットから読み込んだデータセットのうち、保存時から変更されたデータセットを再取得する
+        集計テーブルの更新日時が不明(集計テーブルが無い)の場合は変更の有無が分からないため再取得する.
+        :param client: SurrealDBヘルパ
+        :return:
+        """
+        with self._snapshot_lock:
+            refreshes, self._snapshot_refreshes = self._snapshot_refreshes, {}
+        refreshes = {name: load for name, (fingerprint, load) in refreshes.items()
+                     if fingerprint is None or fingerprint != self._refreshed}
+        if len(refreshes) <= 0:
+            return
+        print(f'refreshing the datasets loaded from the snapshots. ({", ".join(refreshes.keys())})')
+        token = _refreshing.set({})
+        try:
+            for name, load in refreshes.items():
+                await self.reload_dataset(client=client, name=name, load=load)
+        finally:
+            _refreshing.reset(token)
+
+    def _save_snapshots(self) -> None:
+        """
+        要求されたスナップショットを保存する
+        保存要求後に破棄・変更されたデータセット(キャッシュの値と異なる)は保存しない.
+        :return:
+        """
+        snapshot_store = get_snapshot_store()
+        with self._snapshot_lock:
+            saves, self._snapshot_saves = self._snapshot_saves, {}
+        if snapshot_store is None:
+            return
+        for name, (value, fingerprint) in saves.items():
+            if self.cache.get(key=self._key(name)) is not value:
+                continue
+            snapshot_store.save(key=self._key(name), value=value, fingerprint=fingerprint)
+
+
+# 購読中のデータベース {(url, 名前空間, データベース名): ChangeSubscriber}
+_subscribers: {Tuple[str, str, str], ChangeSubscriber} = {}
+_subscribers_lock = threading.Lock()
+
+
+def start_change_subscriber(
+        client: FactoryDBHelper,
+) -> ChangeSubscriber:
+    """
+    データ変更の購読開始
+    データベース毎に1つだけ購読する (購読中の場合は何もしない)
+    :param client: SurrealDBヘルパ
+    :return: 購読
+    """
+    key = (client.url, client.namespace, client.database)
+    with _subscribers_lock:
+        subscriber = _subscribers.get(key, None)
+        if subscriber is None:
+            subscriber = ChangeSubscriber(
+                url=client.url,
+                namespace=client.namespace,
+                database=client.database,
+                username=client.username,
+                password=client.password,
+                transport=client.transport,
+            )
+            subscriber.start()
+            _subscribers[key] = subscriber
+    return subscriber
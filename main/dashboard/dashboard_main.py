@@ -4,9 +4,12 @@ import sys
 import streamlit as st
 
 from arguments_parser import Params, parse
+from dashboard.factory_session_state_cache import invalidate_factory_data
 from dashboard.page1 import factory_dashboard
 from dashboard.page2 import production_work_history_dashboard
 from dashboard.page3 import factory_chatbot
+from dashboard.snapshot_store import configure_snapshot_store
+from helper.factory_db_helper import FactoryDBHelper
 
 PAGE1 = '全体状況'
 PAGE2 = '製造ライン作業履歴'
@@ -19,7 +22,21 @@ async def main(param: Params):
         layout='wide',
     )
 
+    # データセットのスナップショット (再起動時はスナップショットから表示し、最新データはバックグラウンドで取得する)
+    configure_snapshot_store(directory=param.snapshot_dir)
+
     selected_menu = st.sidebar.radio("メニュー", [PAGE1, PAGE2, PAGE3])
+    if st.sidebar.button('データ再読み込み'):
+        # 全セッションで共有するデータセットを破棄し、SurrealDB から再取得する
+        count = invalidate_factory_data(client=FactoryDBHelper(
+            url=param.url,
+            username=param.user,
+            password=param.pw,
+            database=param.database,
+            namespace=param.namespace,
+            transport=param.transport,
+        ))
+        print(f'{count} cached datasets were invalidated.')
     st.sidebar.markdown('---')
 
     if selected_menu == PAGE1:
@@ -43,6 +60,8 @@ if __name__ == '__main__':
     #    [--database test]                              SurrealDB データベース名
     #    [--user root]                                  SurrealDB 認証ユーザ
     #    [--PW root]                                    SurrealDB 認証ユーザ パスワード
+    #    [--transport http]                             SurrealDB 接続方式(http, ws: 1本の WebSocket コネクションで多重化)
+    #    [--snapshot-dir <dir>]                         データセットのスナップショット格納ディレクトリ(省略時: 使用しない)
     args = sys.argv
     param = parse(args=args[1:])
     asyncio.run(main(param))
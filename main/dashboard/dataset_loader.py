@@ -0,0 +1,120 @@
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+# 同時に実行するデータセット読み込み数(デフォルト)
+DEFAULT_MAX_CONCURRENCY = 4
+
+# データセット読み込み毎のタイムアウト(秒)(デフォルト)
+DEFAULT_LOAD_TIMEOUT = 120.0
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    データセット定義
+    """
+    name: str                                               # データセット名
+    load: Callable[..., Any]                                # 読み込み関数 (依存するデータセット名をキーワード引数で受け取る)
+    depends_on: List[str] = field(default_factory=list)     # 依存するデータセット名群
+
+
+class DatasetLoader:
+    """
+    データセットの並行読み込み
+    データセット間の依存関係を宣言し、依存関係の無いデータセットを asyncio.gather で同時に読み込む.
+    依存するデータセットは読み込み済みの結果をキーワード引数として読み込み関数へ渡す.
+    同時に実行する読み込み数は max_concurrency 以下に制限し、読み込み毎に timeout 秒でタイムアウトする.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            timeout: Optional[float] = DEFAULT_LOAD_TIMEOUT,
+    ):
+        """
+        コンストラクタ
+        :param max_concurrency: 同時に実行する読み込み数
+        :param timeout: 読み込み毎のタイムアウト(秒) (None: タイムアウトしない)
+        """
+        self._max_concurrency = max(1, max_concurrency)
+        self._timeout = timeout
+        self._datasets: {str, Dataset} = {}
+
+    def add(
+            self,
+            name: str,
+            load: Callable[..., Any],
+            depends_on: Optional[List[str]] = None,
+    ) -> 'DatasetLoader':
+        """
+        データセット追加
+        :param name: データセット名
+        :param load: 読み込み関数 (async 関数または通常の関数)
+        :param depends_on: 依存するデータセット名群 (省略時 依存なし)
+        :return: self
+        """
+        if name in self._datasets:
+            raise ValueError(f'Dataset {name} is already defined.')
+        self._datasets[name] = Dataset(name=name, load=load, depends_on=list(depends_on) if depends_on else [])
+        return self
+
+    @property
+    def names(self) -> [str]:
+        return list(self._datasets.keys())
+
+    def __len__(self) -> int:
+        return len(self._datasets)
+
+    def _sorted_datasets(self) -> [Dataset]:
+        """
+        依存関係順(依存されるデータセットが先)のデータセット群
+        :return: データセット群
+        """
+        for dataset in self._datasets.values():
+            for dependency in dataset.depends_on:
+                if dependency not in self._datasets:
+                    raise ValueError(f'Dataset {dataset.name} depends on undefined dataset {dependency}.')
+        datasets: {str, Dataset} = {}
+        while len(datasets) < len(self._datasets):
+            ready = [dataset for name, dataset in self._datasets.items()
+                     if name not in datasets and all(d in datasets for d in dataset.depends_on)]
+            if len(ready) == 0:
+                names = [name for name in self._datasets if name not in datasets]
+                raise ValueError(f'Circular dependency was found. ({", ".join(names)})')
+            for dataset in ready:
+                datasets[dataset.name] = dataset
+        return list(datasets.values())
+
+    async def load(self) -> {}:
+        """
+        全データセット読み込み
+        いずれかの読み込みが失敗(タイムアウトを含む)した場合は読み込み中の他のデータセットを取り消し、例外を送出する.
+        :return: 読み込み結果 {データセット名: 読み込み結果}
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        tasks: {str, asyncio.Task} = {}
+
+        async def _load(dataset: Dataset) -> Any:
+            # 依存するデータセットの読み込み完了を待つ (セマフォは読み込み中のみ取得する)
+            arguments = {dependency: await tasks[dependency] for dependency in dataset.depends_on}
+            async with semaphore:
+                result = dataset.load(**arguments)
+                if inspect.isawaitable(result):
+                    try:
+                        result = await asyncio.wait_for(result, timeout=self._timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f'Loading dataset {dataset.name} timed out. ({self._timeout}s)')
+                return result
+
+        for dataset in self._sorted_datasets():
+            tasks[dataset.name] = asyncio.create_task(_load(dataset), name=dataset.name)
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return dict(zip(tasks.keys(), results))
@@ -1,8 +1,10 @@
-from dataclasses import dataclass
-from typing import Optional
-
-import streamlit as st
+from dataclasses import dataclass, field
+from typing import Optional, Any, Awaitable, Callable, Tuple
 
+from dashboard.change_subscriber import ChangeSubscriber, start_change_subscriber
+from dashboard.relationship_index import RelationshipIndex
+from dashboard.shared_cache import SHARED_CACHE, SharedCache
+from dashboard.snapshot_store import get_snapshot_store
 from helper.factory_db_helper import FactoryDBHelper
 from simulator.factory_models import FactoryNodeTable, ProductStatus, ProductType, WorkType, FactoryRelationship
 
@@ -20,39 +22,38 @@ class FactoryDataCache:
     defect_info: []
     raw_materials: []
     relationships: []
+    # 関係の隣接インデックス (relationships から生成する)
+    relationship_index: Optional[RelationshipIndex] = field(default=None, repr=False)
+    # ノードのインデックス {ノード識別子: ノード}
+    _nodes_by_id: {} = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.relationship_index is None:
+            self.relationship_index = RelationshipIndex(relationships=self.relationships)
+        for nodes in [self.factories, self.production_lines, self.machines, self.products, self.storages, self.works,
+                      self.inspection_results, self.defect_info, self.raw_materials, self.working_teams]:
+            for node in nodes if nodes else []:
+                node_id = node.get('id', None)
+                if node_id:
+                    self._nodes_by_id[node_id] = node
 
     def find_node(self, node_id: str) -> {}:
-        nodes = self._get_nodes(node_id=node_id)
-        for node in nodes:
-            if node_id == node.get('id', '?'):
-                return node
-        else:
-            return {}
-
-    def _get_nodes(self, node_id: str) -> {}:
-        match node_id.split(':')[0]:
-            case FactoryNodeTable.FACTORY.name:
-                return self.factories
-            case FactoryNodeTable.PRODUCTION_LINE.name:
-                return self.production_lines
-            case FactoryNodeTable.MACHINE.name:
-                return self.machines
-            case FactoryNodeTable.PRODUCT.name:
-                return self.products
-            case FactoryNodeTable.STORAGE.name:
-                return self.storages
-            case FactoryNodeTable.WORK.name:
-                return self.works
-            case FactoryNodeTable.INSPECTION_RESULT.name:
-                return self.inspection_results
-            case FactoryNodeTable.DEFECT_INFORMATION.name:
-                return self.defect_info
-            case FactoryNodeTable.RAW_MATERIAL.name:
-                return self.raw_materials
-            case FactoryNodeTable.OPERATING_CREW.name:
-                return self.working_teams
-            case _:
-                return []
+        return self._nodes_by_id.get(node_id, {})
+
+
+# ノード情報のデータセット名とテーブル名
+FACTORY_NODE_STATE_KEYS = {
+    'production_lines': FactoryNodeTable.PRODUCTION_LINE.name,
+    'machines': FactoryNodeTable.MACHINE.name,
+    'products': FactoryNodeTable.PRODUCT.name,
+    'storages': FactoryNodeTable.STORAGE.name,
+    'works': FactoryNodeTable.WORK.name,
+    'working_teams': FactoryNodeTable.OPERATING_CREW.name,
+    'inspection_results': FactoryNodeTable.INSPECTION_RESULT.name,
+    'defect_info': FactoryNodeTable.DEFECT_INFORMATION.name,
+    'materials': FactoryNodeTable.RAW_MATERIAL.name,
+    'factories': FactoryNodeTable.FACTORY.name,
+}
 
 
 def get_table_name(s: str) -> str:
@@ -63,123 +64,220 @@ def get_id(s: str) -> str:
     return s[s.index(':') + 1:]
 
 
+# スナップショットの読み込みを試みたデータセットのキャッシュキー (スナップショットはプロセスで最初の読み込みのみ使用する)
+_snapshot_checked = set()
+
+
+async def get_dataset(
+        client: FactoryDBHelper,
+        name: str,
+        load: Callable[[FactoryDBHelper], Awaitable[Any]],
+) -> Any:
+    """
+    データセット取得
+    プロセス内の全セッションで共有するキャッシュから返し、キャッシュしていない場合は読み込んで格納する.
+    キャッシュは SurrealDB のデータ変更に追従する (dashboard.change_subscriber).
+    スナップショット(dashboard.snapshot_store)を使用する場合、プロセスで最初の読み込みはスナップショットから返し、
+    最新データとの照合・再取得は購読スレッドで行う.
+    :param client: SurrealDBヘルパ
+    :param name: データセット名
+    :param load: 読み込み関数 (async, 引数: SurrealDBヘルパ) (購読スレッドでの再取得にも使用する)
+    :return: データセット
+    """
+    subscriber = start_change_subscriber(client=client)
+    if subscriber.refreshing:
+        return await subscriber.reload_dataset(client=client, name=name, load=load)
+    key = SharedCache.get_key(client=client, name=name)
+    return await SHARED_CACHE.get_or_load(
+        key=key,
+        load=lambda: _load_dataset(client=client, key=key, load=load, subscriber=subscriber))
+
+
+async def _load_dataset(
+        client: FactoryDBHelper,
+        key: Tuple[str, str, str, str],
+        load: Callable[[FactoryDBHelper], Awaitable[Any]],
+        subscriber: ChangeSubscriber,
+) -> Any:
+    """
+    データセット読み込み (スナップショットを使用する場合はスナップショットの読み込み・保存を行う)
+    :param client: SurrealDBヘルパ
+    :param key: キャッシュキー
+    :param load: 読み込み関数
+    :param subscriber: データ変更の購読
+    :return: データセット
+    """
+    snapshot_store = get_snapshot_store()
+    if snapshot_store is None:
+        return await load(client)
+    name = key[-1]
+    if key not in _snapshot_checked:
+        _snapshot_checked.add(key)
+        snapshot = snapshot_store.load(key=key)
+        if snapshot is not None:
+            print(f'Dataset {name} was loaded from the snapshot. (created={snapshot.created})')
+            subscriber.request_snapshot_refresh(name=name, fingerprint=snapshot.fingerprint, load=load)
+            return snapshot.value
+
+    # 読み込み開始時の集計テーブルの更新日時 (読み込み中にインポートされた場合は次回の起動時に再取得する)
+    try:
+        fingerprint = await client.get_summary_tables_refreshed()
+    except Exception as e:
+        print(f'{e}')
+        fingerprint = None
+    value = await load(client)
+    subscriber.request_snapshot_save(name=name, value=value, fingerprint=fingerprint)
+    return value
+
+
+async def get_node_records(
+        client: FactoryDBHelper,
+        name: str,
+) -> {}:
+    """
+    ノード情報取得
+    :param client: SurrealDBヘルパ
+    :param name: データセット名 (FACTORY_NODE_STATE_KEYS のキー)
+    :return: ノード情報
+    """
+    return await get_dataset(
+        client=client,
+        name=name,
+        load=lambda _client: _client.get_all_records_from_table(table=FACTORY_NODE_STATE_KEYS[name]))
+
+
 async def get_production_lines(
         client: FactoryDBHelper,
 ) -> {}:
-    if 'production_lines' not in st.session_state:
-        production_lines = await client.get_all_records_from_table(table=FactoryNodeTable.PRODUCTION_LINE.name)
-        st.session_state.production_lines = production_lines
-    return st.session_state.production_lines
+    return await get_node_records(client=client, name='production_lines')
 
 
 async def get_machines(
         client: FactoryDBHelper
 ) -> {}:
-    if 'machines' not in st.session_state:
-        machines = await client.get_all_records_from_table(table=FactoryNodeTable.MACHINE.name)
-        st.session_state.machines = machines
-    return st.session_state.machines
+    return await get_node_records(client=client, name='machines')
 
 
 async def get_products(
         client: FactoryDBHelper
 ) -> {}:
-    if 'products' not in st.session_state:
-        products = await client.get_all_records_from_table(table=FactoryNodeTable.PRODUCT.name)
-        st.session_state.products = products
-    return st.session_state.products
+    return await get_node_records(client=client, name='products')
 
 
 async def get_storages(
         client: FactoryDBHelper
 ) -> {}:
-    if 'storages' not in st.session_state:
-        storages = await client.get_all_records_from_table(table=FactoryNodeTable.STORAGE.name)
-        st.session_state.storages = storages
-    return st.session_state.storages
+    return await get_node_records(client=client, name='storages')
 
 
 async def get_works(
         client: FactoryDBHelper
 ) -> {}:
-    if 'works' not in st.session_state:
-        works = await client.get_all_records_from_table(table=FactoryNodeTable.WORK.name)
-        st.session_state.works = works
-    return st.session_state.works
+    return await get_node_records(client=client, name='works')
 
 
 async def get_working_teams(
         client: FactoryDBHelper
 ) -> {}:
-    if 'working_teams' not in st.session_state:
-        working_teams = await client.get_all_records_from_table(table=FactoryNodeTable.OPERATING_CREW.name)
-        st.session_state.working_teams = working_teams
-    return st.session_state.working_teams
+    return await get_node_records(client=client, name='working_teams')
 
 
 async def get_result_info(
         client: FactoryDBHelper
 ) -> {}:
-    if 'inspection_results' not in st.session_state:
-        inspection_results = await client.get_all_records_from_table(table=FactoryNodeTable.INSPECTION_RESULT.name)
-        st.session_state.inspection_results = inspection_results
-    return st.session_state.inspection_results
+    return await get_node_records(client=client, name='inspection_results')
 
 
 async def get_defect_info(
         client: FactoryDBHelper
 ) -> {}:
-    if 'defect_info' not in st.session_state:
-        defect_info = await client.get_all_records_from_table(table=FactoryNodeTable.DEFECT_INFORMATION.name)
-        st.session_state.defect_info = defect_info
-    return st.session_state.defect_info
+    return await get_node_records(client=client, name='defect_info')
 
 
 async def get_raw_materials(
         client: FactoryDBHelper
 ) -> {}:
-    if 'materials' not in st.session_state:
-        materials = await client.get_all_records_from_table(table=FactoryNodeTable.RAW_MATERIAL.name)
-        st.session_state.materials = materials
-    return st.session_state.materials
+    return await get_node_records(client=client, name='materials')
 
 
 async def get_factory(
         client: FactoryDBHelper
 ):
-    if 'factories' not in st.session_state:
-        factories = await client.get_all_records_from_table(table=FactoryNodeTable.FACTORY.name)
-        st.session_state.factories = factories
-    return st.session_state.factories
+    return await get_node_records(client=client, name='factories')
+
+
+async def prefetch_factory_data(
+        client: FactoryDBHelper
+) -> None:
+    """
+    キャッシュしていないノード情報と関係情報を1回のリクエストで取得し共有キャッシュへ格納する
+    (以降の get_* は共有キャッシュから返す)
+    :param client: SurrealDBヘルパ
+    :return:
+    """
+    def _key(name: str):
+        return SharedCache.get_key(client=client, name=name)
+
+    if start_change_subscriber(client=client).refreshing:
+        # スナップショットの再取得中は各データセットを個別に再取得する
+        return
+    tables = [table for name, table in FACTORY_NODE_STATE_KEYS.items() if SHARED_CACHE.get(key=_key(name)) is None]
+    relationships = [r.name for r in list(FactoryRelationship)] \
+        if SHARED_CACHE.get(key=_key('relationships')) is None else []
+    if len(tables) + len(relationships) <= 0:
+        return
+    records = await client.get_all_records_from_tables(tables=tables + relationships)
+    for name, table in FACTORY_NODE_STATE_KEYS.items():
+        if table in tables:
+            SHARED_CACHE.put(key=_key(name), value=records.get(table, None))
+    if len(relationships) > 0:
+        SHARED_CACHE.put(
+            key=_key('relationships'),
+            value={relationship: records.get(relationship, None) for relationship in relationships})
 
 
 async def get_relationships_from_cache(
         client: FactoryDBHelper
 ):
-    if 'relationships' not in st.session_state:
-        relationships = await client.get_relationships(relationships=[r.name for r in list(FactoryRelationship)])
-        st.session_state.relationships = relationships
-    return st.session_state.relationships
+    return await get_dataset(
+        client=client,
+        name='relationships',
+        load=lambda _client: _client.get_relationships(relationships=[r.name for r in list(FactoryRelationship)]))
 
 
 async def get_product_work_histories_from_cache(
         client: FactoryDBHelper
 ):
-    if 'product_work_histories' not in st.session_state:
-        product_work_histories = await client.get_product_work_histories()
-        st.session_state.product_work_histories = product_work_histories
-    return st.session_state.product_work_histories
+    return await get_dataset(
+        client=client,
+        name='product_work_histories',
+        load=lambda _client: _client.get_product_work_histories())
 
 
 async def get_transfer_working_histories_from_cache(
         client: FactoryDBHelper
 ):
-    if 'transfer_working_histories' not in st.session_state:
-        product_work_histories = await client.get_transfer_work_histories()
-        st.session_state.get_transfer_work_histories = product_work_histories
-    else:
-        product_work_histories = st.session_state.get_transfer_work_histories
-    return product_work_histories
+    return await get_dataset(
+        client=client,
+        name='transfer_working_histories',
+        load=lambda _client: _client.get_transfer_work_histories())
+
+
+def invalidate_factory_data(
+        client: FactoryDBHelper,
+        name: Optional[str] = None,
+) -> int:
+    """
+    共有キャッシュ無効化
+    指定されたデータベースのデータセットとスナップショットを破棄する (以降の get_* は SurrealDB から再取得する)
+    :param client: SurrealDBヘルパ
+    :param name: データセット名 (省略時 全データセット)
+    :return: 破棄したデータセット数
+    """
+    snapshot_store = get_snapshot_store()
+    if snapshot_store is not None:
+        snapshot_store.delete(url=client.url, namespace=client.namespace, database=client.database, name=name)
+    return SHARED_CACHE.invalidate(url=client.url, namespace=client.namespace, database=client.database, name=name)
 
 
 def get_node_name(
@@ -249,14 +347,11 @@ def get_node_name(
 def confirm_work_type(
         node_id: str,
         work_type: WorkType,
-        works: []
+        factory_data_cache: FactoryDataCache,
 ) -> bool:
     if node_id.split(':')[0] == FactoryNodeTable.WORK.name:
-        for work in works:
-            if node_id == work.get('id', '?') and work.get('data', {}).get('type', '?') == work_type.name:
-                return True
-        else:
-            return False
+        work = factory_data_cache.find_node(node_id=node_id) or {}
+        return (work.get('data', None) or {}).get('type', '?') == work_type.name
     else:
         return True
 
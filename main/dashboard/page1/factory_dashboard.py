@@ -9,6 +9,8 @@ from matplotlib import pyplot as plt, ticker
 
 import util
 from arguments_parser import Params
+from dashboard.dataset_loader import DatasetLoader
+from dashboard.factory_session_state_cache import get_dataset
 from helper.factory_db_helper import FactoryDBHelper
 
 # Matplotlibで使用するフォント名
@@ -381,50 +383,57 @@ async def get_production_times(
     :param client: SurrealDBヘルパ
     :return: (部品情報: {}, 製品情報: {})
     """
-    all_production_times: {str, []} = {}
-
-    # 部品製造工程情報を取得
-    parts_processing_info = await client.get_production_time_records(
-        last_process=PARTS_LAST_PROCESS,
-        first_process=PARTS_FIRST_PROCESS,
-    )
-
-    # 製品製造工程情報を取得
-    product_processing_info = await client.get_production_time_records(
-        last_process=PRODUCT_LAST_PROCESS,
-        first_process=PRODUCT_FIRST_PROCESS,
-    )
-
-    # 部品の先頭工程から最終工程までの製造時間を集計する
-    parts_production_times = calculate_production_times(
-        first_process=PARTS_FIRST_PROCESS,
-        last_process=PARTS_LAST_PROCESS,
-        work_info=parts_processing_info,
-    )
-
-    # 製品の先頭工程から最終工程までの製造時間を集計する
-    product_prodcution_times = calculate_production_times(
-        first_process=PRODUCT_FIRST_PROCESS,
-        last_process=PRODUCT_LAST_PROCESS,
-        work_info=product_processing_info,
-    )
-
-    # 各製造ライン工程毎の製造時間を集計する
+    # 部品の先頭工程から最終工程まで、製品の先頭工程から最終工程まで、各製造ライン工程毎の製造時間を1回のリクエストで取得
+    processes = {
+        'parts': (PARTS_LAST_PROCESS, PARTS_FIRST_PROCESS),
+        'product': (PRODUCT_LAST_PROCESS, PRODUCT_FIRST_PROCESS),
+    }
     for production_line_id in PRODUCTION_LINE_IDS:
-        processing_info = await client.get_production_time_records(
-            last_process=production_line_id,
-            first_process=production_line_id,
-        )
-        all_production_times[production_line_id.split(':')[1]] = \
-            calculate_production_times(
-                first_process=production_line_id,
-                last_process=production_line_id,
-                work_info=processing_info,
-            )
+        processes[production_line_id] = (production_line_id, production_line_id)
 
+    lead_times = await client.get_production_lead_times_many(processes=processes)
+    if lead_times is not None:
+        # 集計テーブルで集計済みの製造時間を使用する
+        production_times = {name: convert_lead_times(lead_times=lead_times[name]) for name in processes}
+    else:
+        # 集計テーブルが存在しない場合は全作業の開始・終了時刻から集計する
+        processing_infos = await client.get_production_time_records_many(processes=processes)
+        production_times = {
+            name: calculate_production_times(
+                first_process=first_process,
+                last_process=last_process,
+                work_info=processing_infos[name],
+            )
+            for name, (last_process, first_process) in processes.items()
+        }
+
+    parts_production_times = production_times['parts']
+    product_prodcution_times = production_times['product']
+    all_production_times: {str, []} = {
+        production_line_id.split(':')[1]: production_times[production_line_id]
+        for production_line_id in PRODUCTION_LINE_IDS
+    }
     return parts_production_times, product_prodcution_times, all_production_times
 
 
+def convert_lead_times(
+        lead_times: [],
+) -> {}:
+    """
+    集計テーブルで集計済みの製造時間を仕掛品毎の製造時間情報へ変換する
+    :param lead_times: 仕掛品毎の製造時間 (FactoryDBHelper.get_production_lead_times_many の結果)
+    :return: 仕掛品毎の製造時間情報 (calculate_production_times と同じ形式)
+    """
+    production_times = {}
+    for lead_time in lead_times if lead_times else []:
+        production_times[lead_time.get('product', None)] = {
+            'started_at': datetime.datetime.fromtimestamp(lead_time.get('started_utime'), tz=datetime.timezone.utc),
+            'ended_at': datetime.datetime.fromtimestamp(lead_time.get('ended_utime'), tz=datetime.timezone.utc),
+            'delta': datetime.timedelta(seconds=lead_time.get('lead_time')),
+        }
+    return production_times
+
+
 def calculate_production_times(
         first_process: str,
         last_process: str,
@@ -505,6 +514,26 @@ def calculate_storage_dwell_times(
     return storage_dwell_times
 
 
+async def load_production_datasets(
+        client: FactoryDBHelper,
+) -> {}:
+    """
+    製造状況ダッシュボードの製造データ取得
+    互いに依存しない製造データを同時に取得する
+    :param client: SurrealDBヘルパ
+    :return: {'production_data': 製造ライン実績, 'production_times': 製造時間, 'storage_dwell_times': 貯蔵庫滞留時間, ...}
+    """
+    datasets = await DatasetLoader() \
+        .add(name='production_yield', load=client.get_production_yield) \
+        .add(name='production_times', load=lambda: get_production_times(client=client)) \
+        .add(name='storage_dwell_times', load=lambda: get_storage_dwell_times(client=client)) \
+        .add(name='production_data',
+             load=lambda production_yield: get_production_data(production_yield=production_yield),
+             depends_on=['production_yield']) \
+        .load()
+    return datasets
+
+
 async def run(
         param: Params
 ) -> None:
@@ -520,37 +549,28 @@ async def run(
     else:
         plt.rcParams['font.family'] = "IPAexGothic"
 
-    if 'production_data' not in st.session_state:
-        # 製造データをSurrealDBから取得する
-        with FactoryDBHelper(
-                url=param.url,
-                username=param.user,
-                password=param.pw,
-                database=param.database,
-                namespace=param.namespace,
-        ) as client:
-            production_yield = await client.get_production_yield()
-            # measurements_values = await get_measurements_values(client=client)
-            parts_production_times, product_production_times, all_production_times = \
-                await get_production_times(client=client)
-            storage_dwell_times = await get_storage_dwell_times(client=client)
-
-        production_data = get_production_data(production_yield=production_yield)
-        st.session_state.production_data = production_data
-        st.session_state.parts_production_times = parts_production_times
-        st.session_state.product_production_times = product_production_times
-        st.session_state.all_production_times = all_production_times
-        st.session_state.storage_dwell_times = storage_dwell_times
-
-    production_data = st.session_state.production_data
+    # 製造データをSurrealDBから取得する (全セッションで共有するキャッシュへ格納する)
+    with FactoryDBHelper(
+            url=param.url,
+            username=param.user,
+            password=param.pw,
+            database=param.database,
+            namespace=param.namespace,
+            transport=param.transport,
+    ) as client:
+        datasets = await get_dataset(
+            client=client,
+            name='factory_dashboard',
+            load=lambda _client: load_production_datasets(client=_client))
+
+    production_data = datasets['production_data']
     if len(production_data) <= 0:
         st.write('### データが見つかりません')
         return
 
-    parts_production_times = st.session_state.parts_production_times
-    product_production_times = st.session_state.product_production_times
-    all_production_times = st.session_state.all_production_times
-    storage_dwell_times = st.session_state.storage_dwell_times
+    # measurements_values = await get_measurements_values(client=client)
+    parts_production_times, product_production_times, all_production_times = datasets['production_times']
+    storage_dwell_times = datasets['storage_dwell_times']
     selected_summary_view = True
 
     st.sidebar.write('製造ライン状況表示')
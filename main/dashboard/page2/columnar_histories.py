@@ -0,0 +1,194 @@
+import datetime
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 列の種類
+COLUMN_CATEGORY = 'category'    # 識別子等の重複の多い文字列 (カテゴリ番号と値の一覧で保持する)
+COLUMN_STRING = 'string'        # 重複の少ない文字列
+COLUMN_UTIME = 'utime'          # UNIX時間 (int64 と欠損マスクで保持する)
+
+# 作業履歴の列 (GET_PRODUCTION_WORK_HISTORIES の項目)
+WORK_HISTORY_COLUMNS = {
+    'production_line': COLUMN_CATEGORY,
+    'work_id': COLUMN_STRING,
+    'product': COLUMN_CATEGORY,
+    'product_status': COLUMN_CATEGORY,
+    'started_utime': COLUMN_UTIME,
+    'ended_utime': COLUMN_UTIME,
+    'inspection_result': COLUMN_CATEGORY,
+}
+# UNIX時間から復元する日時文字列の列 {列名: UNIX時間の列名}
+WORK_HISTORY_TIMESTAMPS = {
+    'started': 'started_utime',
+    'ended': 'ended_utime',
+}
+
+# 移動作業履歴の列 (GET_TRANSFER_WORK_HISTORIES の項目)
+TRANSFER_WORK_HISTORY_COLUMNS = {
+    'work_id': COLUMN_STRING,
+    'product': COLUMN_CATEGORY,
+    'to_id': COLUMN_CATEGORY,
+    'from_id': COLUMN_CATEGORY,
+    'timestamp_utime': COLUMN_UTIME,
+}
+TRANSFER_WORK_HISTORY_TIMESTAMPS = {
+    'timestamp': 'timestamp_utime',
+}
+
+
+def to_utc_string(utime: int) -> str:
+    """
+    UNIX時間を SurrealDB の日時文字列 (util.convert_utc_string_to_datetime で変換できる形式) へ変換する
+    :param utime: UNIX時間(秒)
+    :return: 日時文字列
+    """
+    return datetime.datetime.fromtimestamp(int(utime), tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ColumnarHistories:
+    """
+    作業履歴の列指向格納
+    SurrealDB から取得した履歴レコード(dict)群を列毎の NumPy 配列で保持する.
+    - 識別子の列はカテゴリ番号(int32)とカテゴリ値の一覧で保持する
+    - UNIX時間の列は int64 と欠損マスクで保持し、日時文字列の列は保持せずに UNIX時間から復元する
+    - 行は仕掛品毎にまとめて並べ (同じ仕掛品の中では元の順序を保つ)、仕掛品毎の行範囲を保持する
+    描画等の大量の行を扱う処理は列の配列 (get_category_column, get_utime_column) を仕掛品の行範囲で参照する.
+    行番号による参照 (histories[i]) は従来と同じ形式の dict を返す (1行毎に dict を生成するため少数の行の参照に使用する).
+    """
+
+    def __init__(
+            self,
+            records: Optional[List[dict]],
+            columns: {},
+            timestamps: Optional[dict] = None,
+            group_by: str = 'product',
+    ):
+        """
+        コンストラクタ
+        :param records: 履歴レコード群
+        :param columns: 列 {列名: 列の種類}
+        :param timestamps: UNIX時間から復元する日時文字列の列 {列名: UNIX時間の列名} (省略時 なし)
+        :param group_by: 行をまとめる列 (カテゴリの列)
+        """
+        self._columns = dict(columns)
+        self._timestamps = dict(timestamps) if timestamps else {}
+        self._group_by = group_by
+        records = records if records else []
+        frame = pd.DataFrame.from_records(records, columns=list(columns.keys())) if len(records) > 0 \
+            else pd.DataFrame(columns=list(columns.keys()))
+
+        # 仕掛品毎にまとめる並び順 (安定ソート)
+        groups = pd.Categorical(frame[group_by])
+        order = np.argsort(groups.codes, kind='stable')
+
+        # {列名: 配列}, カテゴリの列は {列名: カテゴリ値の一覧}, UNIX時間の列は {列名: 欠損マスク}
+        self._arrays: {str, np.ndarray} = {}
+        self._categories: {str, np.ndarray} = {}
+        self._masks: {str, np.ndarray} = {}
+        for name, kind in columns.items():
+            if kind == COLUMN_CATEGORY:
+                values = groups if name == group_by else pd.Categorical(frame[name])
+                self._arrays[name] = values.codes[order].astype(np.int32)
+                self._categories[name] = np.asarray(values.categories, dtype=object)
+            elif kind == COLUMN_UTIME:
+                values = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64)[order]
+                self._masks[name] = np.isnan(values)
+                self._arrays[name] = np.where(self._masks[name], 0, values).astype(np.int64)
+            else:
+                self._arrays[name] = frame[name].to_numpy(dtype=object)[order]
+
+        # 仕掛品毎の行範囲 {仕掛品識別子: (開始行, 終了行)} (仕掛品の出現順)
+        codes = self._arrays[group_by]
+        categories = self._categories[group_by]
+        starts = np.searchsorted(codes, np.arange(len(categories)), side='left')
+        ends = np.searchsorted(codes, np.arange(len(categories)), side='right')
+        first_appearance = pd.unique(groups.codes[groups.codes >= 0])
+        self._offsets: {str, tuple} = {
+            categories[code]: (int(starts[code]), int(ends[code])) for code in first_appearance
+        }
+        # 仕掛品識別子の無い行数 (並び順の先頭に置かれ、仕掛品の行範囲に含まれない)
+        self.invalid_rows = int(np.count_nonzero(codes < 0))
+
+    def __len__(self) -> int:
+        return len(self._arrays[self._group_by])
+
+    def __getitem__(self, index: int) -> dict:
+        """
+        行参照
+        :param index: 行番号
+        :return: 履歴レコード (SurrealDB から取得した形式)
+        """
+        row = {}
+        for name, kind in self._columns.items():
+            row[name] = self._get_value(name=name, kind=kind, index=index)
+        for name, utime_name in self._timestamps.items():
+            utime = row.get(utime_name, None)
+            row[name] = to_utc_string(utime) if utime is not None else None
+        return row
+
+    def _get_value(
+            self,
+            name: str,
+            kind: str,
+            index: int,
+    ) -> Any:
+        if kind == COLUMN_CATEGORY:
+            code = self._arrays[name][index]
+            return self._categories[name][code] if code >= 0 else None
+        if kind == COLUMN_UTIME:
+            return None if self._masks[name][index] else int(self._arrays[name][index])
+        return self._arrays[name][index]
+
+    @property
+    def products(self) -> [str]:
+        """
+        :return: 仕掛品識別子群 (出現順)
+        """
+        return list(self._offsets.keys())
+
+    def get_rows(
+            self,
+            product_id: str,
+    ) -> range:
+        """
+        仕掛品の行番号群
+        :param product_id: 仕掛品識別子
+        :return: 行番号群
+        """
+        start, end = self._offsets.get(product_id, (0, 0))
+        return range(start, end)
+
+    def get_records(
+            self,
+            product_id: str,
+    ) -> [dict]:
+        """
+        仕掛品の履歴レコード群
+        :param product_id: 仕掛品識別子
+        :return: 履歴レコード群
+        """
+        return [self[i] for i in self.get_rows(product_id=product_id)]
+
+    def get_category_column(
+            self,
+            name: str,
+    ) -> (np.ndarray, np.ndarray):
+        """
+        カテゴリの列
+        :param name: カテゴリの列名
+        :return: (カテゴリ番号(int32, 欠損値は -1), カテゴリ値の一覧)
+        """
+        return self._arrays[name], self._categories[name]
+
+    def get_utime_column(
+            self,
+            name: str,
+    ) -> (np.ndarray, np.ndarray):
+        """
+        UNIX時間の列
+        :param name: UNIX時間の列名
+        :return: (UNIX時間(int64, 欠損値は 0), 欠損マスク)
+        """
+        return self._arrays[name], self._masks[name]
@@ -1,14 +1,13 @@
 from enum import IntEnum
 from typing import Any
 
-import streamlit as st
-
 from pyecharts import options as opts
 from pyecharts.charts import Graph
 
+from dashboard.dataset_loader import DatasetLoader
 from dashboard.factory_session_state_cache import FactoryDataCache, get_production_lines, get_machines, get_products, \
     get_storages, get_factory, get_works, get_working_teams, get_result_info, get_defect_info, get_raw_materials, \
-    get_relationships_from_cache, get_node_name
+    get_relationships_from_cache, get_node_name, prefetch_factory_data, get_dataset
 from dashboard.page2.production_line_data_cache import SidebarParameter
 from helper.factory_db_helper import FactoryDBHelper
 from simulator.factory_models import FactoryNodeTable, WorkType, ProductStatus, ProductType
@@ -116,19 +115,25 @@ def get_node_category(
 
 
 async def create_factory_data_cache(client: FactoryDBHelper) -> FactoryDataCache:
-    return FactoryDataCache(
-        production_lines=await get_production_lines(client=client),
-        machines=await get_machines(client=client),
-        products=await get_products(client=client),
-        storages=await get_storages(client=client),
-        factories=await get_factory(client=client),
-        works=await get_works(client=client),
-        working_teams=await get_working_teams(client=client),
-        inspection_results=await get_result_info(client=client),
-        defect_info=await get_defect_info(client=client),
-        raw_materials=await get_raw_materials(client=client),
-        relationships=await get_relationships_from_cache(client=client)
-    )
+    # 未取得のノード情報と関係情報を一括取得した後、各情報を同時に取得する (一括取得済みの情報は共有キャッシュから返す)
+    getters = {
+        'production_lines': get_production_lines,
+        'machines': get_machines,
+        'products': get_products,
+        'storages': get_storages,
+        'factories': get_factory,
+        'works': get_works,
+        'working_teams': get_working_teams,
+        'inspection_results': get_result_info,
+        'defect_info': get_defect_info,
+        'raw_materials': get_raw_materials,
+        'relationships': get_relationships_from_cache,
+    }
+    loader = DatasetLoader().add(name='prefetch', load=lambda: prefetch_factory_data(client=client))
+    for name, getter in getters.items():
+        loader.add(name=name, load=lambda prefetch, _getter=getter: _getter(client=client), depends_on=['prefetch'])
+    datasets = await loader.load()
+    return FactoryDataCache(**{name: datasets[name] for name in getters})
 
 
 async def show_product_operation_graph(
@@ -146,10 +151,11 @@ async def show_product_operation_graph(
     :return:
     """
 
-    if 'factory_data_cache' not in st.session_state:
-        factory_data_cache = await create_factory_data_cache(client=client)
-        st.session_state.factory_data_cache = factory_data_cache
-    factory_data_cache = st.session_state.factory_data_cache
+    # 全セッションで共有する
+    factory_data_cache = await get_dataset(
+        client=client,
+        name='factory_data_cache',
+        load=lambda _client: create_factory_data_cache(client=_client))
 
     nodes_data = []
     links_data = []
@@ -158,8 +164,9 @@ async def show_product_operation_graph(
     traverse_nodes = []
 
     if not sidebar_parameter.all_wip:
+        # SurrealDB へ問い合わせずにキャッシュした関係の隣接インデックスから検索する
         relationships, nodes, traverse_nodes = \
-            await client.get_relationships_of_node(node_id=sidebar_parameter.wip)
+            factory_data_cache.relationship_index.get_relationships_of_node(node_id=sidebar_parameter.wip)
 
     for node in nodes:
         nodes_data.append(
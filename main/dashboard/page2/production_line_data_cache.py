@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
-from typing import List, Any, Self
+from typing import List, Any, Optional, Self, Sequence, Union
 
+from dashboard.dataset_loader import DatasetLoader
+from dashboard.page2.columnar_histories import ColumnarHistories, WORK_HISTORY_COLUMNS, WORK_HISTORY_TIMESTAMPS, \
+    TRANSFER_WORK_HISTORY_COLUMNS, TRANSFER_WORK_HISTORY_TIMESTAMPS
 from helper.factory_db_helper import FactoryDBHelper
 from simulator.factory_models import FactoryNodeTable
 
@@ -29,37 +32,60 @@ class SidebarParameter:
 class ProductInformation:
     product_id: str
     product_info_index: int = field(default=-1)
-    production_histories: List[int] = field(default_factory=list)
-    transfer_work_histories: List[int] = field(default_factory=list)
+    # 作業履歴、移動作業履歴の行番号群 (列指向格納の場合は仕掛品の行範囲 (range))
+    production_histories: Sequence[int] = field(default_factory=list)
+    transfer_work_histories: Sequence[int] = field(default_factory=list)
+
+
+# True: 作業履歴、移動作業履歴を列指向で格納する (デフォルト)
+DEFAULT_COLUMNAR = True
 
 
 class ProductionLineDataCache:
 
     def __init__(
             self,
+            columnar: bool = DEFAULT_COLUMNAR,
     ):
+        """
+        コンストラクタ
+        :param columnar: True: 作業履歴、移動作業履歴を列指向(ColumnarHistories)で格納する  False: SurrealDB のレコードのまま格納する
+        """
+        self._columnar = columnar
         self._production_lines = None
         self._storages = None
         self._products = None
         self._products_hash_table = {}
         self._parts_hash_table = {}
-        self._product_work_histories: List[{}] = []
-        self._product_transfer_work_histories: List[{}] = []
+        self._product_work_histories: Union[List[dict], ColumnarHistories] = []
+        self._product_transfer_work_histories: Union[List[dict], ColumnarHistories] = []
         self._products_data: {str, ProductInformation} = {}
+        # 列指向の作業履歴、移動作業履歴 (SurrealDB のレコードのまま格納する場合に描画用に生成する)
+        self._columnar_work_histories: Optional[ColumnarHistories] = None
+        self._columnar_transfer_work_histories: Optional[ColumnarHistories] = None
 
     async def build(
             self,
             client: FactoryDBHelper,
     ) -> Self:
 
-        # 製造ライン情報取得
-        self._production_lines = await client.get_all_records_from_table(table=FactoryNodeTable.PRODUCTION_LINE.name)
-
-        # 貯蔵庫情報取得
-        self._storages = await client.get_all_records_from_table(table=FactoryNodeTable.STORAGE.name)
+        # 製造ライン情報、貯蔵庫情報、仕掛品情報、作業履歴、移動作業履歴を同時に取得
+        datasets = await DatasetLoader() \
+            .add(name='production_lines',
+                 load=lambda: client.get_all_records_from_table(table=FactoryNodeTable.PRODUCTION_LINE.name)) \
+            .add(name='storages',
+                 load=lambda: client.get_all_records_from_table(table=FactoryNodeTable.STORAGE.name)) \
+            .add(name='products', load=client.get_product_data_from_db) \
+            .add(name='product_work_histories', load=client.get_product_work_histories) \
+            .add(name='transfer_work_histories', load=client.get_transfer_work_histories) \
+            .load()
+        self._production_lines = datasets['production_lines']
+        self._storages = datasets['storages']
+        self._products = datasets['products']
+        self._product_work_histories = datasets['product_work_histories']
+        self._product_transfer_work_histories = datasets['transfer_work_histories']
 
-        # 仕掛品情報取得
-        self._products = await client.get_product_data_from_db()
+        # 仕掛品情報
         for product in self._products:
             pid = product.get('id').split(':')[1]
             self._products_hash_table[pid] = product
@@ -67,12 +93,25 @@ class ProductionLineDataCache:
             if parts_id:
                 self._parts_hash_table[parts_id] = pid
 
-        # 作業履歴取得
-        self._product_work_histories = await client.get_product_work_histories()
+        if self._columnar:
+            self._build_columnar_histories()
+        else:
+            self._build_histories()
 
-        # 移動作業履歴取得
-        self._product_transfer_work_histories = await client.get_transfer_work_histories()
+        # 仕掛品毎に作業履歴、移動履歴紐づけ
+        for i, product in enumerate(self._products):
+            product_id = product.get('id', None)
+            if not product_id:
+                print(f'Invalid product data was found. (index={i})')
+                continue
+            if product_id not in self._products_data:
+                print(f'product was not found in products_data. (product={product_id})')
+                continue
+            product_info = self._products_data[product_id]
+            product_info.product_info_index = i
+        return self
 
+    def _build_histories(self) -> None:
         # 作業履歴を仕掛品毎に集約
         for i, history in enumerate(self._product_work_histories):
             product_id = history.get('product', None)
@@ -95,18 +134,95 @@ class ProductionLineDataCache:
             product_info: ProductInformation = self._products_data[product_id]
             product_info.transfer_work_histories.append(i)
 
-        # 仕掛品毎に作業履歴、移動履歴紐づけ
-        for i, product in enumerate(self._products):
-            product_id = product.get('id', None)
-            if not product_id:
-                print(f'Invalid product data was found. (index={i})')
-                continue
+    def _build_columnar_histories(self) -> None:
+        # 作業履歴、移動作業履歴を列指向で格納し、仕掛品毎の行範囲を紐づける
+        self._product_work_histories = ColumnarHistories(
+            records=self._product_work_histories,
+            columns=WORK_HISTORY_COLUMNS,
+            timestamps=WORK_HISTORY_TIMESTAMPS,
+        )
+        self._product_transfer_work_histories = ColumnarHistories(
+            records=self._product_transfer_work_histories,
+            columns=TRANSFER_WORK_HISTORY_COLUMNS,
+            timestamps=TRANSFER_WORK_HISTORY_TIMESTAMPS,
+        )
+        if self._product_work_histories.invalid_rows > 0:
+            print(f'Invalid production history data was found. ({self._product_work_histories.invalid_rows} rows)')
+        if self._product_transfer_work_histories.invalid_rows > 0:
+            print(f'Invalid transfer production history data was found. '
+                  f'({self._product_transfer_work_histories.invalid_rows} rows)')
+        for product_id in self._product_work_histories.products:
+            self._products_data[product_id] = ProductInformation(
+                product_id=product_id,
+                production_histories=self._product_work_histories.get_rows(product_id=product_id))
+        for product_id in self._product_transfer_work_histories.products:
             if product_id not in self._products_data:
-                print(f'product was not found in products_data. (product={product_id})')
-                continue
-            product_info = self._products_data[product_id]
-            product_info.product_info_index = i
-        return self
+                self._products_data[product_id] = ProductInformation(product_id=product_id)
+            self._products_data[product_id].transfer_work_histories = \
+                self._product_transfer_work_histories.get_rows(product_id=product_id)
+
+    def get_product_work_histories(
+            self,
+            product_id: str,
+    ) -> [{}]:
+        """
+        仕掛品の作業履歴取得
+        :param product_id: 仕掛品識別子
+        :return: 作業履歴群
+        """
+        product_info = self._products_data.get(product_id, None)
+        if product_info is None:
+            return []
+        if isinstance(self._product_work_histories, ColumnarHistories):
+            return self._product_work_histories.get_records(product_id=product_id)
+        return [self._product_work_histories[i] for i in product_info.production_histories]
+
+    def get_product_transfer_work_histories(
+            self,
+            product_id: str,
+    ) -> [{}]:
+        """
+        仕掛品の移動作業履歴取得
+        :param product_id: 仕掛品識別子
+        :return: 移動作業履歴群
+        """
+        product_info = self._products_data.get(product_id, None)
+        if product_info is None:
+            return []
+        if isinstance(self._product_transfer_work_histories, ColumnarHistories):
+            return self._product_transfer_work_histories.get_records(product_id=product_id)
+        return [self._product_transfer_work_histories[i] for i in product_info.transfer_work_histories]
+
+    def get_columnar_work_histories(self) -> ColumnarHistories:
+        """
+        列指向の作業履歴 (SurrealDB のレコードのまま格納している場合は初回呼び出し時に生成する)
+        行番号は ColumnarHistories.get_rows で参照すること (products_data の行番号とは異なる場合がある)
+        :return: 作業履歴
+        """
+        if isinstance(self._product_work_histories, ColumnarHistories):
+            return self._product_work_histories
+        if self._columnar_work_histories is None:
+            self._columnar_work_histories = ColumnarHistories(
+                records=self._product_work_histories,
+                columns=WORK_HISTORY_COLUMNS,
+                timestamps=WORK_HISTORY_TIMESTAMPS,
+            )
+        return self._columnar_work_histories
+
+    def get_columnar_transfer_work_histories(self) -> ColumnarHistories:
+        """
+        列指向の移動作業履歴 (SurrealDB のレコードのまま格納している場合は初回呼び出し時に生成する)
+        :return: 移動作業履歴
+        """
+        if isinstance(self._product_transfer_work_histories, ColumnarHistories):
+            return self._product_transfer_work_histories
+        if self._columnar_transfer_work_histories is None:
+            self._columnar_transfer_work_histories = ColumnarHistories(
+                records=self._product_transfer_work_histories,
+                columns=TRANSFER_WORK_HISTORY_COLUMNS,
+                timestamps=TRANSFER_WORK_HISTORY_TIMESTAMPS,
+            )
+        return self._columnar_transfer_work_histories
 
     @property
     def production_lines(self) -> Any:
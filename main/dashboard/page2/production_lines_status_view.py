@@ -2,6 +2,7 @@ import datetime
 from abc import ABC, abstractmethod
 from typing import Any, Optional
 
+import numpy as np
 from matplotlib import pyplot as plt, dates
 
 import util
@@ -81,113 +82,129 @@ class ProductionLinesStatusView:
 
     def _init(self):
 
+        # 作業履歴、移動作業履歴は列(NumPy 配列)を仕掛品毎の行範囲で参照する
+        histories = self._production_data_cache.get_columnar_work_histories()
+        transfer_histories = self._production_data_cache.get_columnar_transfer_work_histories()
+
+        # 作業履歴の列 (製造ライン識別子が無い行は '?' の位置に描画する)
+        line_codes, line_categories = histories.get_category_column('production_line')
+        line_names = np.append(line_categories, '?')
+        line_y = np.array([Y_AXIS[name] for name in line_names], dtype=np.int64)[line_codes]
+        # 製造ラインが、'pl001', 'pl004' の場合、工程作業線分の下へ仕掛品番号を表示する
+        line_labeled = np.isin(line_names, FIRST_PROCESSES)[line_codes]
+        inspection_codes, inspection_categories = histories.get_category_column('inspection_result')
+        ng = np.isin(inspection_categories, ['NG'])[inspection_codes] & (inspection_codes >= 0)
+        # 工程作業開始時間、終了時間
+        started, _ = histories.get_utime_column('started_utime')
+        ended, ended_missing = histories.get_utime_column('ended_utime')
+        # 終了点：仕掛中（工程の終了時間が無い）は開始時間に適当な値を加えグラフ描画する
+        has_ended = ~ended_missing & (ended != 0)
+        end_x = np.where(has_ended, ended, started + 100)
+
+        # 移動作業履歴の列 (移動元、移動先識別子が無い行は '?' の位置に描画する)
+        from_codes, from_categories = transfer_histories.get_category_column('from_id')
+        to_codes, to_categories = transfer_histories.get_category_column('to_id')
+        from_names = np.append(from_categories, '?')
+        to_names = np.append(to_categories, '?')
+        timestamps, _ = transfer_histories.get_utime_column('timestamp_utime')
+
+        # グラフ図形の最大値、最小値を求める (仕掛品に紐づく行のみ)
         x_min, x_max = MAX_COORDINATE, MIN_COORDINATE
         y_min, y_max = MAX_COORDINATE, MIN_COORDINATE
-        number_of_unfinished_works = 0
+        rows = slice(histories.invalid_rows, len(histories))
+        if len(started[rows]) > 0:
+            x_min = min(x_min, int(started[rows].min()), int(np.where(has_ended, ended, MAX_COORDINATE)[rows].min()))
+            x_max = max(x_max, int(started[rows].max()), int(np.where(has_ended, ended, MIN_COORDINATE)[rows].max()))
+            y_min = min(y_min, int(line_y[rows].min()))
+            y_max = max(y_max, int(line_y[rows].max()))
+        # 欠陥品はrepair1貯蔵庫に移動されるが、グラフにすると見にくいので描画しない
+        rows = slice(transfer_histories.invalid_rows, len(transfer_histories))
+        drawn = (to_names != 'STORAGE:repair1')[to_codes][rows]
+        if np.count_nonzero(drawn) > 0:
+            from_y = np.array([Y_AXIS[name] for name in from_names], dtype=np.int64)[from_codes][rows][drawn]
+            to_y = np.array([Y_AXIS[name] for name in to_names], dtype=np.int64)[to_codes][rows][drawn]
+            x_min = min(x_min, int(timestamps[rows][drawn].min()))
+            x_max = max(x_max, int(timestamps[rows][drawn].max()))
+            y_min = min(y_min, int(from_y.min()), int(to_y.min()))
+            y_max = max(y_max, int(from_y.max()), int(to_y.max()))
 
         # 各仕掛品毎の工程作業グラフを作成する
         for product_id, product_data in self._production_data_cache.products_data.items():
+            gid = product_id.split(':')[1]
+            # 製品の仕掛品と部品の仕掛品でグラフの色を変える
+            product_color = self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_PRODUCT) \
+                if self._production_data_cache.products[product_data.product_info_index].get('data', {}).get(
+                'type') == 'PRODUCT' \
+                else self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_SEMI_PRODUCT)
+            defect_color = self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_DEFECT)
+
             # 仕掛品毎の作業履歴を処理する
-            for history_ix in product_data.production_histories:
-                production_history = self._production_data_cache.product_work_histories[history_ix]
-                # 工程作業開始時間
-                started = production_history.get('started_utime', None)
-                # 工程作業終了時間
-                ended = production_history.get('ended_utime', None)
-                # 製造ライン識別子取得
-                production_line = production_history.get('production_line', '?')
-                # 工程終了時間が無い（仕掛中）の仕掛品数を加算
-                if not (started and ended):
-                    number_of_unfinished_works += 1
-
-                # 製品の仕掛品と部品の仕掛品でグラフの色を変える
-                color = self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_DEFECT) \
-                    if production_history.get('inspection_result', '') == 'NG' \
-                    else self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_PRODUCT) \
-                    if self._production_data_cache.products[product_data.product_info_index].get('data', {}).get(
-                    'type') == 'PRODUCT' \
-                    else self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_SEMI_PRODUCT)
-
-                # グラフ開始点
-                start = Point2(started, Y_AXIS[production_line])
-                # 終了点：仕掛中（工程の終了時間が無い）は開始時間に適当な値を加えグラフ描画する
-                end = Point2(ended, Y_AXIS[production_line]) \
-                    if ended else Point2(start.x + 100, Y_AXIS[production_line])
+            rows = histories.get_rows(product_id=product_id)
+            rows = slice(rows.start, rows.stop)
+            for start_x, end_x_, y, is_ng, labeled in zip(
+                    started[rows].tolist(), end_x[rows].tolist(), line_y[rows].tolist(),
+                    ng[rows].tolist(), line_labeled[rows].tolist()):
 
                 # 工程作業の線分描画
                 self._graphic_builder.build_line(
-                    start=start,
-                    end=end,
+                    start=Point2(start_x, y),
+                    end=Point2(end_x_, y),
                     line_width=5,
-                    color=color,
+                    color=defect_color if is_ng else product_color,
                     solid_capstyle='butt',
                     zorder=1,
-                    gid=product_id.split(':')[1],
+                    gid=gid,
                 )
 
-                # 製造ラインが、'pl001', 'pl004' の場合、工程作業線分の下へ仕掛品番号を表示する
-                if production_line == 'PRODUCTION_LINE:pl001' or production_line == 'PRODUCTION_LINE:pl004':
+                if labeled:
                     self._graphic_builder.build_text(
-                        start=Point2(started, Y_AXIS[production_line]),
-                        text=production_history.get('product', '?').split(':')[1] + ' ',
+                        start=Point2(start_x, y),
+                        text=gid + ' ',
                         color=self._graphic_builder.get_color(ColorManager.ColorIx.FONT_COLOR),
                         fontsize=FONT_SIZE,
                         horizontal_alignment='left',
                         vertical_alignment='top',
                         rotation=90,
-                        gid=product_id.split(':')[1],
+                        gid=gid,
                     )
 
-                # グラフ図形の最大値、最小値を求める
-                x_min = min(x_min, started, ended if ended else MAX_COORDINATE)
-                x_max = max(x_max, started, ended if ended else MIN_COORDINATE)
-                y_min = min(y_min, Y_AXIS[production_line])
-                y_max = max(y_max, Y_AXIS[production_line])
-
             # 移動履歴から仕掛品の移動グラフを描画する
-            for history_ix in product_data.transfer_work_histories:
-                transfer_working_history = self._production_data_cache.product_transfer_work_histories[history_ix]
-                # 移動時刻
-                timestamp = float(transfer_working_history.get('timestamp_utime', None))
-                # 対象仕掛品識別子
-                product_id = transfer_working_history.get('product', '?').split(':')[1]
-                # 移動元識別子
-                from_id = transfer_working_history.get('from_id', None)
-                # 移動先識別子
-                to_id = transfer_working_history.get('to_id', None)
-
+            rows = transfer_histories.get_rows(product_id=product_id)
+            rows = slice(rows.start, rows.stop)
+            transfers = list(zip(
+                from_names[from_codes[rows]].tolist(),
+                to_names[to_codes[rows]].tolist(),
+                timestamps[rows].astype(np.float64).tolist()))
+            # 移動元毎の移動時刻 (貯蔵庫から次の移動作業を行った時刻)
+            departures = {}
+            for from_id, _, timestamp in transfers:
+                departures.setdefault(from_id, []).append(timestamp)
+
+            for from_id, to_id, timestamp in transfers:
                 # 欠陥品はrepair1貯蔵庫に移動されるが、グラフにすると見にくいので描画しない
                 if to_id == 'STORAGE:repair1':
                     continue
 
                 # 次の移動作業をが存在すれば、貯蔵庫に存在した線分を描画する
                 if to_id.split(':')[0] == 'STORAGE':
-                    for ix in product_data.transfer_work_histories:
-                        tx_work_history = self._production_data_cache.product_transfer_work_histories[ix]
-                        tx_from_id = tx_work_history.get('from_id', None)
-                        if tx_from_id and tx_from_id == to_id:
-                            tx_timestamp = float(tx_work_history.get('timestamp_utime', None))
-                            self._graphic_builder.build_line(
-                                start=Point2(timestamp, Y_AXIS[to_id]),
-                                end=Point2(tx_timestamp, Y_AXIS[tx_from_id]),
-                                line_width=3,
-                                color=self._graphic_builder.get_color(ColorManager.ColorIx.TRANSFER),
-                                zorder=1,
-                                gid=product_id,
-                            )
-
-                if to_id in ['STORAGE:storage3', 'STORAGE:storage6']:
-                    color = self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_PRODUCT) \
-                        if self._production_data_cache.products[product_data.product_info_index].get('data', {}).get(
-                        'type') == 'PRODUCT' \
-                        else self._graphic_builder.get_color(ColorManager.ColorIx.PROCESS_SEMI_PRODUCT)
+                    for tx_timestamp in departures.get(to_id, []):
+                        self._graphic_builder.build_line(
+                            start=Point2(timestamp, Y_AXIS[to_id]),
+                            end=Point2(tx_timestamp, Y_AXIS[to_id]),
+                            line_width=3,
+                            color=self._graphic_builder.get_color(ColorManager.ColorIx.TRANSFER),
+                            zorder=1,
+                            gid=gid,
+                        )
+
+                if to_id in WAREHOUSES:
                     self._graphic_builder.build_marker(
                         center=Point2(timestamp, Y_AXIS[to_id]),
                         marker='D',
-                        color=color,
+                        color=product_color,
                         size=8,
                         zorder=1,
-                        gid=product_id,
+                        gid=gid,
                     )
 
                 self._graphic_builder.build_arrow(
@@ -196,14 +213,9 @@ class ProductionLinesStatusView:
                     line_width=1,
                     color=self._graphic_builder.get_color(ColorManager.ColorIx.TRANSFER),
                     solid_capstyle='butt',
-                    gid=product_id,
+                    gid=gid,
                 )
 
-                x_min = min(x_min, timestamp)
-                x_max = max(x_max, timestamp)
-                y_min = min(y_min, Y_AXIS[from_id], Y_AXIS[to_id])
-                y_max = max(y_max, Y_AXIS[from_id], Y_AXIS[to_id])
-
         # TODO 暫定的にview_x_minを変更する
         x_min = util.convert_utc_string_to_datetime('2023-01-01T00:00:00+00:00').timestamp()
         # Ｙ軸の上限へ下駄履かせ
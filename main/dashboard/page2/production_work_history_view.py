@@ -11,6 +11,7 @@ from matplotlib import pyplot as plt
 import japanize_matplotlib
 
 from arguments_parser import Params
+from dashboard.factory_session_state_cache import get_dataset
 from dashboard.page1.factory_dashboard import FONT_NAME
 from dashboard.page2.product_operation_view import show_product_operation_graph
 from dashboard.page2.production_line_data_cache import ProductionLineDataCache, SidebarParameter
@@ -49,9 +50,8 @@ def create_md_for_product(
     if target_product:
         # 仕掛品作業履歴表示
         rows = []
-        for i in product_ix_info.production_histories:
+        for work_history in production_data_cache.get_product_work_histories(product_id='PRODUCT:' + target_product):
             r = []
-            work_history = production_data_cache.product_work_histories[i]
             r.append(work_history.get('production_line', '?').split(':')[1])
             r.append(format_datetime_str(work_history.get('started', None)))
             r.append(format_datetime_str(work_history.get('ended', None)))
@@ -65,9 +65,9 @@ def create_md_for_product(
 
         # 移動作業履歴表示
         rows = []
-        for i in product_ix_info.transfer_work_histories:
+        for transfer_history in production_data_cache.get_product_transfer_work_histories(
+                product_id='PRODUCT:' + target_product):
             r = []
-            transfer_history = production_data_cache.product_transfer_work_histories[i]
             r.append(transfer_history.get('from_id', '?').split(':')[1])
             r.append(transfer_history.get('to_id', '?').split(':')[1])
             r.append(format_datetime_str(transfer_history.get('timestamp', None)))
@@ -142,13 +142,18 @@ async def run(param: Params) -> None:
             password=param.pw,
             database=param.database,
             namespace=param.namespace,
+            transport=param.transport,
     ) as client:
 
-        if 'production_data_visualizer' not in st.session_state:
-            # 製造情報を取得しキャッシュへ格納
-            production_line_data_cache = await ProductionLineDataCache().build(client=client)
+        # 製造情報を取得し全セッションで共有するキャッシュへ格納
+        production_line_data_cache = await get_dataset(
+            client=client,
+            name='production_line_data_cache',
+            load=lambda _client: ProductionLineDataCache().build(client=_client))
 
-            # 図形要素生成
+        if 'production_data_visualizer' not in st.session_state \
+                or st.session_state.production_data_visualizer.production_data_cache is not production_line_data_cache:
+            # 図形要素生成 (キャッシュが再生成された場合は図形要素も再生成する)
             st.session_state.production_data_visualizer = production_data_visualizer = \
                 ProductionLinesStatusView(production_data_cache=production_line_data_cache)
             production_data_visualizer.build()
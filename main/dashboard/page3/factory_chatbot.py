@@ -155,6 +155,7 @@ async def run(param: Params):
             password=param.pw,
             database=param.database,
             namespace=param.namespace,
+            transport=param.transport,
     ) as client:
 
         if 'generated' not in st.session_state:
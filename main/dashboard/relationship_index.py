@@ -0,0 +1,110 @@
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from helper.surrealdb_sql_def import EXCLUSION_TABLE_NAMES
+
+# 関係の向き
+DIRECTION_OUT = 'out'       # (ノード)-[関係]->(相手ノード)
+DIRECTION_IN = 'in'         # (相手ノード)-[関係]->(ノード)
+DIRECTION_BOTH = 'both'
+
+
+class RelationshipIndex:
+    """
+    関係の隣接インデックス
+    SurrealDB から取得した関係レコードから、ノード識別子毎の入出力の関係 (関係名付き) を保持する.
+    FactoryDBHelper.get_relationships_of_node と同じ探索を SurrealDB へ問い合わせずに行う.
+    """
+
+    def __init__(
+            self,
+            relationships: {},
+    ):
+        """
+        コンストラクタ
+        :param relationships: 関係情報群 {関係名: 関係レコード群} (FactoryDBHelper.get_relationships の結果)
+        """
+        # {ノード識別子: [(関係名, 関係レコード)]}
+        self._outgoing: {str, List[Tuple[str, dict]]} = defaultdict(list)
+        self._incoming: {str, List[Tuple[str, dict]]} = defaultdict(list)
+        self.relationships_count = 0
+        for relation, records in relationships.items() if relationships else []:
+            for record in records if records else []:
+                self._outgoing[record.get('in', None)].append((relation, record))
+                self._incoming[record.get('out', None)].append((relation, record))
+                self.relationships_count += 1
+
+    def get_relationships(
+            self,
+            node_id: str,
+            direction: str = DIRECTION_BOTH,
+            relation: Optional[str] = None,
+    ) -> [{}]:
+        """
+        ノードの関係取得
+        :param node_id: ノード識別子
+        :param direction: 関係の向き ('out': ノードから出る関係, 'in': ノードへ入る関係, 'both': 両方)
+        :param relation: 関係名 (省略時 全ての関係)
+        :return: 関係レコード群
+        """
+        edges = []
+        if direction in (DIRECTION_OUT, DIRECTION_BOTH):
+            edges.extend(self._outgoing.get(node_id, []))
+        if direction in (DIRECTION_IN, DIRECTION_BOTH):
+            edges.extend(self._incoming.get(node_id, []))
+        return [record for label, record in edges if relation is None or label == relation]
+
+    def get_neighboring_nodes(
+            self,
+            node_id: str,
+            direction: str = DIRECTION_BOTH,
+            relation: Optional[str] = None,
+    ) -> [str]:
+        """
+        隣接ノード取得
+        :param node_id: ノード識別子
+        :param direction: 関係の向き ('out', 'in', 'both')
+        :param relation: 関係名 (省略時 全ての関係)
+        :return: 隣接ノード識別子群
+        """
+        nodes = {}
+        for record in self.get_relationships(node_id=node_id, direction=direction, relation=relation):
+            for _n in [record.get('in', None), record.get('out', None)]:
+                if _n and _n != node_id:
+                    nodes[_n] = None
+        return list(nodes)
+
+    def get_relationships_of_node(
+            self,
+            node_id: str,
+    ) -> ([{}], [str], [str]):
+        """
+        指定されたノードに関連する「関係」と「ノード」を検索する
+        FactoryDBHelper.get_relationships_of_node と同じく起点ノードから幅優先で探索し、
+        EXCLUSION_TABLE_NAMES のテーブルのノードから先は探索しない.
+        :param node_id: 起点ノード
+        :return: (検索された関係群: [{}], 検索されたノード群: [str], 検索起点ノード群: [str])
+        """
+        relationships: {str, {}} = {}
+        nodes: {str, None} = {}
+        traversed_nodes: {str, None} = {}
+
+        frontier = [node_id]
+        while len(frontier) > 0:
+            found_nodes = []
+            for _node in frontier:
+                if _node in traversed_nodes or _node.split(':')[0] in EXCLUSION_TABLE_NAMES:
+                    continue
+                traversed_nodes[_node] = None
+                nodes.setdefault(_node, None)
+                for _r in self.get_relationships(node_id=_node):
+                    _rid = _r.get('id', '?')
+                    if _rid in relationships:
+                        continue
+                    relationships[_rid] = _r
+                    for _n in [_r.get('in', None), _r.get('out', None)]:
+                        if _n and _n not in nodes:
+                            nodes[_n] = None
+                            found_nodes.append(_n)
+            frontier = found_nodes
+        return list(relationships.values()), list(nodes), list(traversed_nodes)
@@ -0,0 +1,292 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from helper.db_helper import DBHelper
+
+# キャッシュの有効期間(秒)(デフォルト)
+DEFAULT_TTL = 600.0
+
+# キャッシュの最大メモリ使用量(バイト)(デフォルト)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def estimate_size(value: Any) -> int:
+    """
+    おおよそのメモリ使用量(バイト)
+    dict, list, tuple, set, dataclass, __dict__ を持つオブジェクトの要素を再帰的に合計する (同じオブジェクトは1回だけ数える)
+    :param value: 対象オブジェクト
+    :return: メモリ使用量(バイト)
+    """
+    size = 0
+    seen = set()
+    stack = [value]
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            stack.extend(getattr(obj, f.name, None) for f in dataclasses.fields(obj))
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            stack.append(vars(obj))
+    return size
+
+
+@dataclass
+class _CacheEntry:
+    value: Any                      # キャッシュした値
+    size: int                       # おおよそのメモリ使用量(バイト)
+    expires: float                  # 有効期限 (time.monotonic の値)
+
+
+class SharedCache:
+    """
+    プロセス内で共有するデータセットキャッシュ
+    ダッシュボードの全セッション(Streamlit のスクリプト実行スレッド)で同じデータセットを共有する.
+    キーは (SurrealDB server url, 名前空間, データベース名, データセット名).
+    有効期間(TTL)を過ぎたデータセットは破棄し、最大メモリ使用量を超える場合は最も長く参照されていないデータセットから破棄する.
+    同じデータセットを同時に要求された場合は1回だけ読み込み、他の要求は読み込み結果を待つ.
+    """
+
+    def __init__(
+            self,
+            ttl: float = DEFAULT_TTL,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        """
+        コンストラクタ
+        :param ttl: 有効期間(秒)
+        :param max_bytes: 最大メモリ使用量(バイト)
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Tuple, _CacheEntry] = OrderedDict()
+        # 読み込み中のデータセット {キー: 読み込み結果を通知する Future}
+        self._loading: {Tuple, concurrent.futures.Future} = {}
+        # 読み込み中に無効化されたデータセットのキー (読み込み結果を格納しない)
+        self._invalidated_loads = set()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+            client: DBHelper,
+            name: str,
+    ) -> Tuple[str, str, str, str]:
+        """
+        キャッシュキー生成
+        :param client: SurrealDBヘルパ
+        :param name: データセット名
+        :return: キャッシュキー (url, 名前空間, データベース名, データセット名)
+        """
+        return client.url, client.namespace, client.database, name
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple) -> bool:
+        return self.get(key=key) is not None
+
+    def get(
+            self,
+            key: Tuple,
+    ) -> Any:
+        """
+        キャッシュ取得
+        :param key: キャッシュキー
+        :return: キャッシュした値 (キャッシュしていない、または有効期限切れの場合は None)
+        """
+        with self._lock:
+            return self._get(key=key)
+
+    def put(
+            self,
+            key: Tuple,
+            value: Any,
+            ttl: Optional[float] = None,
+    ) -> None:
+        """
+        キャッシュ格納 (None は格納しない)
+        :param key: キャッシュキー
+        :param value: 値
+        :param ttl: 有効期間(秒) (省略時 コンストラクタで指定した有効期間)
+        :return:
+        """
+        size = estimate_size(value)
+        with self._lock:
+            self._put(key=key, value=value, size=size, ttl=ttl)
+
+    def update(
+            self,
+            key: Tuple,
+            function: Callable[[Any], Any],
+    ) -> bool:
+        """
+        キャッシュ更新
+        キャッシュした値を function の戻り値で置き換える (有効期限は変更しない).
+        読み込み中の他のセッションと競合しないよう、function は値を変更せずに新しい値を返すこと.
+        function の実行とメモリ使用量の計算はロックの外で行い、その間に他のスレッドが値を置き換えた場合はやり直す.
+        :param key: キャッシュキー
+        :param function: 更新関数 (引数: キャッシュした値, 戻り値: 新しい値)
+        :return: True: 更新した  False: キャッシュしていない
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key, None)
+                if entry is None or entry.expires <= time.monotonic():
+                    return False
+            value = function(entry.value)
+            size = estimate_size(value)
+            with self._lock:
+                if self._entries.get(key, None) is not entry:
+                    continue
+                self._size += size - entry.size
+                self._entries[key] = _CacheEntry(value=value, size=size, expires=entry.expires)
+                return True
+
+    async def get_or_load(
+            self,
+            key: Tuple,
+            load: Callable[[], Awaitable[Any]],
+            ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        キャッシュ取得 (キャッシュしていない場合は読み込んで格納する)
+        他のセッションが同じデータセットを読み込み中の場合は、その読み込み結果を返す.
+        :param key: キャッシュキー
+        :param load: 読み込み関数 (async)
+        :param ttl: 有効期間(秒) (省略時 コンストラクタで指定した有効期間)
+        :return: 値
+        """
+        with self._lock:
+            value = self._get(key=key)
+            if value is not None:
+                return value
+            future = self._loading.get(key, None)
+            loader = future is None
+            if loader:
+                future = self._loading[key] = concurrent.futures.Future()
+                self._invalidated_loads.discard(key)
+
+        if not loader:
+            # 他のスレッド(イベントループ)の読み込み結果を待つ (待機の取り消しは読み込みへ波及させない)
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            value = await load()
+            size = estimate_size(value)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+                self._invalidated_loads.discard(key)
+            if not future.done():
+                future.set_exception(e)
+            raise
+        with self._lock:
+            self._loading.pop(key, None)
+            if key in self._invalidated_loads:
+                self._invalidated_loads.discard(key)
+            else:
+                self._put(key=key, value=value, size=size, ttl=ttl)
+        if not future.done():
+            future.set_result(value)
+        return value
+
+    def invalidate(
+            self,
+            url: Optional[str] = None,
+            namespace: Optional[str] = None,
+            database: Optional[str] = None,
+            name: Optional[str] = None,
+    ) -> int:
+        """
+        キャッシュ無効化
+        指定された条件に一致するデータセットを破棄する (省略した条件は全てに一致する)
+        読み込み中のデータセットが一致する場合は、その読み込み結果を格納しない.
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param name: データセット名
+        :return: 破棄したデータセット数
+        """
+        conditions = (url, namespace, database, name)
+
+        def _match(key: Tuple) -> bool:
+            return all(condition is None or condition == k for condition, k in zip(conditions, key))
+
+        with self._lock:
+            self._invalidated_loads.update(key for key in self._loading if _match(key))
+            keys = [key for key in self._entries if _match(key)]
+            for key in keys:
+                self._remove(key=key)
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        全データセット破棄
+        :return:
+        """
+        self.invalidate()
+
+    def _get(
+            self,
+            key: Tuple,
+    ) -> Any:
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key=key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def _put(
+            self,
+            key: Tuple,
+            value: Any,
+            size: int,
+            ttl: Optional[float],
+    ) -> None:
+        if key in self._entries:
+            self._remove(key=key)
+        if value is None:
+            return
+        if size > self.max_bytes:
+            print(f'Dataset {key[-1]} is too large to cache. ({size} bytes)')
+            return
+        now = time.monotonic()
+        for _key in [_key for _key, entry in self._entries.items() if entry.expires <= now]:
+            self._remove(key=_key)
+        while len(self._entries) > 0 and self._size + size > self.max_bytes:
+            self._remove(key=next(iter(self._entries)))
+        self._entries[key] = _CacheEntry(value=value, size=size, expires=now + (self.ttl if ttl is None else ttl))
+        self._size += size
+
+    def _remove(
+            self,
+            key: Tuple,
+    ) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+
+
+# ダッシュボードのプロセスで共有するキャッシュ
+SHARED_CACHE = SharedCache()
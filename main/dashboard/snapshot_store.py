@@ -0,0 +1,239 @@
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import stat
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+# スナップショット形式のバージョン (キャッシュするデータセットのクラス構成を変更した場合は更新する)
+SNAPSHOT_VERSION = 1
+
+# スナップショットの格納ディレクトリ(デフォルト) ('' の場合はスナップショットを使用しない)
+DEFAULT_SNAPSHOT_DIR = ''
+
+_MAGIC = b'FDSNAP\x00\x01'
+_PREFIX = struct.Struct('<8sQ')     # マジックナンバー, ヘッダ長
+_ALIGNMENT = 64                     # ヘッダ以降のデータの境界
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _is_private(st: os.stat_result) -> bool:
+    """
+    実行ユーザのみが変更できるか (所有者が実行ユーザで、グループ・他ユーザに書き込み権限が無い)
+    所有者を判定できない環境(Windows)では書き込み権限のみ判定する.
+    :param st: ファイル情報
+    :return: True: 実行ユーザのみが変更できる
+    """
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) == 0
+
+
+def _make_private_dir(path: Path) -> None:
+    """
+    実行ユーザのみがアクセスできるディレクトリ生成 (既存のディレクトリは実行ユーザのみが変更できることを確認する)
+    :param path: ディレクトリパス
+    :return:
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or not _is_private(st):
+        raise PermissionError(f'Snapshot directory is not private to the current user. ({path})')
+
+
+@dataclass
+class Snapshot:
+    """
+    スナップショット
+    """
+    value: Any                      # データセット
+    fingerprint: Optional[str]      # 保存時のデータの識別 (集計テーブルの更新日時)
+    created: str                    # 保存日時
+
+
+class SnapshotStore:
+    """
+    データセットのスナップショット (ダッシュボード再起動時のウォームスタート用)
+    データセットを pickle (protocol 5) で保存し、NumPy 配列等のバッファは pickle の外に境界を揃えて格納する.
+    読み込み時はファイルを mmap し、バッファはコピーせずに mmap を参照する.
+    ファイルは (url, 名前空間, データベース名) 毎のディレクトリにデータセット名で保存する.
+    pickle は読み込み時に任意のコードを実行できるため、ディレクトリは実行ユーザのみがアクセスできる権限で生成し、
+    実行ユーザ以外が変更できるディレクトリ・ファイルは読み込まない.
+    """
+
+    def __init__(
+            self,
+            directory: str = DEFAULT_SNAPSHOT_DIR,
+            version: int = SNAPSHOT_VERSION,
+    ):
+        """
+        コンストラクタ
+        :param directory: 格納ディレクトリ
+        :param version: スナップショット形式のバージョン (異なるバージョンのファイルは読み込まない)
+        """
+        self.directory = Path(directory)
+        self.version = version
+
+    def get_path(
+            self,
+            key: Tuple[str, str, str, str],
+    ) -> Path:
+        """
+        スナップショットのファイルパス
+        :param key: キャッシュキー (url, 名前空間, データベース名, データセット名)
+        :return: ファイルパス
+        """
+        url, namespace, database, name = key
+        database_dir = hashlib.sha1(f'{url}|{namespace}|{database}'.encode('utf-8')).hexdigest()[:16]
+        return self.directory / database_dir / f'{name}.snapshot'
+
+    def save(
+            self,
+            key: Tuple[str, str, str, str],
+            value: Any,
+            fingerprint: Optional[str],
+    ) -> bool:
+        """
+        スナップショット保存 (一時ファイルへ書き込み、置き換える)
+        :param key: キャッシュキー
+        :param value: データセット
+        :param fingerprint: データの識別 (集計テーブルの更新日時)
+        :return: True: 保存した
+        """
+        path = self.get_path(key=key)
+        try:
+            buffers = []
+            payload = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+            raw_buffers = [buffer.raw() for buffer in buffers]
+
+            # データ開始位置からの相対位置 (各データの先頭を境界に揃える)
+            offset = 0
+            layout = []
+            for length in [len(payload)] + [buffer.nbytes for buffer in raw_buffers]:
+                layout.append([offset, length])
+                offset = _align(offset + length)
+            header = json.dumps({
+                'version': self.version,
+                'name': key[-1],
+                'fingerprint': fingerprint,
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'payload': layout[0],
+                'buffers': layout[1:],
+            }).encode('utf-8')
+            data_start = _align(_PREFIX.size + len(header))
+
+            _make_private_dir(self.directory)
+            _make_private_dir(path.parent)
+            temp_path = path.with_name(path.name + '.tmp')
+            with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                f.write(_PREFIX.pack(_MAGIC, len(header)))
+                f.write(header)
+                for data, (relative_offset, _) in zip([payload] + raw_buffers, layout):
+                    f.seek(data_start + relative_offset)
+                    f.write(data)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            print(f'Failed to save the snapshot of {key[-1]}. ({e})')
+            return False
+
+    def load(
+            self,
+            key: Tuple[str, str, str, str],
+    ) -> Optional[Snapshot]:
+        """
+        スナップショット読み込み (mmap)
+        :param key: キャッシュキー
+        :return: スナップショット (存在しない、またはバージョンが異なる場合は None)
+        """
+        path = self.get_path(key=key)
+        if not path.exists():
+            return None
+        try:
+            for directory in [self.directory, path.parent]:
+                if not _is_private(os.lstat(directory)):
+                    print(f'Snapshot of {key[-1]} was ignored. ({directory} is not private to the current user)')
+                    return None
+            # シンボリックリンクは辿らず、開いたファイルの所有者・権限を確認する
+            with os.fdopen(os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_BINARY', 0)), 'rb') as f:
+                st = os.fstat(f.fileno())
+                if not stat.S_ISREG(st.st_mode) or not _is_private(st):
+                    print(f'Snapshot of {key[-1]} was ignored. ({path} is not private to the current user)')
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, header_length = _PREFIX.unpack_from(mapped, 0)
+            if magic != _MAGIC:
+                return None
+            header = json.loads(mapped[_PREFIX.size:_PREFIX.size + header_length].decode('utf-8'))
+            if header.get('version', None) != self.version:
+                print(f'Snapshot of {key[-1]} was ignored. (version={header.get("version", None)})')
+                return None
+            data_start = _align(_PREFIX.size + header_length)
+            view = memoryview(mapped)
+            payload_offset, payload_length = header['payload']
+            buffers = [view[data_start + offset:data_start + offset + length]
+                       for offset, length in header['buffers']]
+            value = pickle.loads(
+                view[data_start + payload_offset:data_start + payload_offset + payload_length],
+                buffers=buffers)
+            return Snapshot(value=value, fingerprint=header.get('fingerprint', None), created=header.get('created', ''))
+        except Exception as e:
+            print(f'Failed to load the snapshot of {key[-1]}. ({e})')
+            return None
+
+    def delete(
+            self,
+            url: str,
+            namespace: str,
+            database: str,
+            name: Optional[str] = None,
+    ) -> None:
+        """
+        スナップショット削除
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param name: データセット名 (省略時 全データセット)
+        :return:
+        """
+        if name is not None:
+            paths = [self.get_path(key=(url, namespace, database, name))]
+        else:
+            paths = list(self.get_path(key=(url, namespace, database, '_')).parent.glob('*.snapshot'))
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                print(f'Failed to delete the snapshot. ({e})')
+
+
+# ダッシュボードのプロセスで使用するスナップショット (None: 使用しない)
+_snapshot_store: Optional[SnapshotStore] = None
+
+
+def configure_snapshot_store(
+        directory: str,
+) -> Optional[SnapshotStore]:
+    """
+    スナップショットの格納ディレクトリ設定
+    :param directory: 格納ディレクトリ ('' の場合はスナップショットを使用しない)
+    :return: スナップショット
+    """
+    global _snapshot_store
+    if not directory:
+        _snapshot_store = None
+    elif _snapshot_store is None or _snapshot_store.directory != Path(directory):
+        _snapshot_store = SnapshotStore(directory=directory)
+    return _snapshot_store
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    return _snapshot_store
@@ -0,0 +1,251 @@
+import asyncio
+import atexit
+import hashlib
+import threading
+from typing import Any, Optional, Coroutine
+
+import httpx
+from surrealdb import SurrealHTTP
+
+from helper.surreal_ws_client import MultiplexedSurrealWS
+from helper.options import TRANSPORT_HTTP, TRANSPORT_WS, TRANSPORTS, DEFAULT_TRANSPORT
+
+# コネクションプール 最大コネクション数(デフォルト)
+DEFAULT_POOL_SIZE = 10
+
+# コネクションプール 未使用コネクション保持時間(秒)(デフォルト)
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+
+class PooledSurrealHTTP(SurrealHTTP):
+    """
+    コネクション数と keep-alive 時間を指定できる SurrealHTTP
+    """
+
+    def __init__(
+            self,
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ):
+        """
+        コンストラクタ
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        :param pool_size: 最大コネクション数
+        :param idle_timeout: 未使用コネクション保持時間(秒)
+        """
+        # SurrealHTTP.__init__ は既定の設定で httpx.AsyncClient を生成するため呼び出さず、同じ属性を設定する
+        self._url = url
+        self._namespace = namespace
+        self._database = database
+        self._username = username
+        self._password = password
+        self._http = httpx.AsyncClient(
+            base_url=url,
+            auth=httpx.BasicAuth(username=username, password=password),
+            headers={
+                'NS': namespace,
+                'DB': database,
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+            },
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=idle_timeout,
+            ),
+        )
+
+
+class ConnectionPool:
+    """
+    SurrealDB コネクションプール
+    プロセス内の DBHelper で共有される keep-alive コネクション (HTTP)
+    または 認証済み WebSocket コネクション (WebSocket RPC) を保持する.
+    Streamlit は再実行毎に新しいイベントループを生成するため、
+    コネクションはプール専用スレッドのイベントループ上で管理する.
+    """
+
+    _pools: {tuple, 'ConnectionPool'} = {}
+    _lock = threading.Lock()
+    _loop_lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(
+            self,
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            transport: str = DEFAULT_TRANSPORT,
+    ):
+        """
+        コンストラクタ
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        :param pool_size: 最大コネクション数 (HTTP のみ)
+        :param idle_timeout: 未使用コネクション保持時間(秒) (HTTP のみ)
+        :param transport: 接続方式 ('http': HTTP, 'ws': WebSocket RPC)
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f'Unknown transport. ({transport})')
+        self._key = ConnectionPool.get_key(
+            url=url, namespace=namespace, database=database, username=username, password=password, transport=transport)
+        self._loop = ConnectionPool._get_loop()
+        if transport == TRANSPORT_WS:
+            self.client = MultiplexedSurrealWS(
+                url=url,
+                namespace=namespace,
+                database=database,
+                username=username,
+                password=password,
+            )
+        else:
+            self.client = PooledSurrealHTTP(
+                url=url,
+                namespace=namespace,
+                database=database,
+                username=username,
+                password=password,
+                pool_size=pool_size,
+                idle_timeout=idle_timeout,
+            )
+        self.closed = False
+
+    @staticmethod
+    def get_key(
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+            transport: str,
+    ) -> tuple:
+        """
+        共有コネクションプールのキー生成
+        認証情報は接続毎に固定されるため、パスワードも含める (パスワードはハッシュ値で保持する)
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        :param transport: 接続方式
+        :return: キー
+        """
+        return url, namespace, database, username, hashlib.sha256(password.encode('utf-8')).hexdigest(), transport
+
+    @classmethod
+    def get(
+            cls,
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            transport: str = DEFAULT_TRANSPORT,
+    ) -> 'ConnectionPool':
+        """
+        共有コネクションプール取得
+        (url, namespace, database, username, password, transport) 毎に1つのプールを生成して共有する
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        :param pool_size: 最大コネクション数 (プール生成時のみ有効)
+        :param idle_timeout: 未使用コネクション保持時間(秒) (プール生成時のみ有効)
+        :param transport: 接続方式 ('http': HTTP, 'ws': WebSocket RPC)
+        :return: コネクションプール
+        """
+        key = cls.get_key(
+            url=url, namespace=namespace, database=database, username=username, password=password, transport=transport)
+        with cls._lock:
+            pool = cls._pools.get(key, None)
+            if not pool or pool.closed:
+                pool = ConnectionPool(
+                    url=url,
+                    namespace=namespace,
+                    database=database,
+                    username=username,
+                    password=password,
+                    pool_size=pool_size,
+                    idle_timeout=idle_timeout,
+                    transport=transport,
+                )
+                cls._pools[key] = pool
+            return pool
+
+    async def run(
+            self,
+            coroutine: Coroutine,
+    ) -> Any:
+        """
+        プール専用イベントループ上でコルーチンを実行する
+        :param coroutine: SurrealDB へアクセスするコルーチン
+        :return: コルーチンの実行結果
+        """
+        if self.closed:
+            coroutine.close()
+            raise RuntimeError('Connection pool is already closed.')
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        return await asyncio.wrap_future(future)
+
+    def close(self) -> None:
+        """
+        プールが保持する全コネクションを切断する
+        :return:
+        """
+        with ConnectionPool._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if ConnectionPool._pools.get(self._key, None) is self:
+                del ConnectionPool._pools[self._key]
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        全共有コネクションプールを切断する
+        :return:
+        """
+        for pool in list(cls._pools.values()):
+            pool.close()
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        プール専用イベントループ取得 (初回呼び出し時にスレッドを起動する)
+        :return: イベントループ
+        """
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(
+                    target=cls._loop.run_forever,
+                    name='surrealdb-connection-pool',
+                    daemon=True,
+                )
+                cls._thread.start()
+            return cls._loop
+
+
+atexit.register(ConnectionPool.close_all)
@@ -1,6 +1,77 @@
-from typing import Any, Optional
+import json
+import re
+import time
+from functools import lru_cache
+from typing import Any, Optional, List, Tuple, Coroutine, Callable
 
-from surrealdb import SurrealHTTP
+from helper.connection_pool import ConnectionPool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from helper.options import DEFAULT_TRANSPORT
+from helper.request_stats import RequestStats
+from helper.retry_policy import RetryPolicy, TokenBucket, SurrealDBTransientError, TRANSIENT_STATUS_CODES, \
+    is_transient_error_message
+
+
+@lru_cache(maxsize=None)
+def get_relate_query(relation: str) -> str:
+    """
+    関係登録 SurrealQL 取得
+    関係名はバインド変数で指定できないため関係毎に文を生成し、生成した文は再利用する.
+    FROM/TO ノードは <テーブル名>, <識別子> のバインド変数 ($from_table, $from_id, $to_table, $to_id) で指定する.
+    :param relation: 関係
+    :return: SurrealQL文字列
+    """
+    return (
+        'LET $from = type::thing($from_table, $from_id);'
+        'LET $to = type::thing($to_table, $to_id);'
+        f'RELATE $from->{relation}->$to CONTENT {{ data: {{ timestamp: $timestamp }} }};'
+    )
+
+
+# 関係レコード識別子を指定する関係登録 SurrealQL
+# 関係レコードは <関係名>, <識別子> のバインド変数 ($relation, $edge_id) で指定する.
+RELATE_WITH_ID = (
+    'LET $from = type::thing($from_table, $from_id);'
+    'LET $to = type::thing($to_table, $to_id);'
+    'LET $edge = type::thing($relation, $edge_id);'
+    'RELATE $from->$edge->$to CONTENT { data: { timestamp: $timestamp } };'
+)
+
+# 登録済みの関係を置き換える場合に先行して実行する SurrealQL
+DELETE_EDGE = 'DELETE type::thing($relation, $edge_id);'
+
+
+def get_content(data: Any) -> str:
+    """
+    登録データの SurrealQL 表記 (json)
+    HTTP 接続方式はバインド変数を URL パラメータ(文字列)として送信するため、オブジェクトの登録データはバインドできない.
+    登録データは json として文へ埋め込み、テーブル名・識別子のみバインド変数で指定する.
+    :param data: 登録データ
+    :return: SurrealQL文字列
+    """
+    return json.dumps(data, ensure_ascii=False)
+
+
+def get_identifier(name: str) -> str:
+    """
+    テーブル名・関係名の検査
+    文へ埋め込むテーブル名・関係名は英数字と '_' のみとする.
+    :param name: テーブル名・関係名
+    :return: テーブル名・関係名
+    """
+    if not re.fullmatch(r'\w+', name):
+        raise ValueError(f'Invalid table name. ({name})')
+    return name
+
+
+def get_thing(record_id: str) -> str:
+    """
+    レコード識別子の SurrealQL 表記 (<テーブル名>:⟨識別子⟩)
+    一括登録の文はバインド変数を使用しないため、識別子はエスケープして埋め込む.
+    :param record_id: レコード識別子 (<テーブル名>:<識別子>)
+    :return: SurrealQL文字列
+    """
+    table, _, key = record_id.partition(':')
+    return f'{get_identifier(table)}:⟨' + key.replace('\\', '\\\\').replace('⟩', '\\⟩') + '⟩'
 
 
 class DBHelper:
@@ -14,7 +85,13 @@ class DBHelper:
             namespace: str = 'test',
             database: str = 'test',
             username: str = 'root',
-            password: str = 'root'
+            password: str = 'root',
+            pool_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            shared: bool = True,
+            retry_policy: Optional[RetryPolicy] = None,
+            rate_limit: float = 0,
+            transport: str = DEFAULT_TRANSPORT,
     ):
         """
         コンストラクタ
@@ -23,6 +100,12 @@ class DBHelper:
         :param database: データベース名
         :param username: 認証ユーザ
         :param password: パスワード
+        :param pool_size: コネクションプール 最大コネクション数
+        :param idle_timeout: コネクションプール 未使用コネクション保持時間(秒)
+        :param shared: True: プロセス内で共有するプールを使用  False: このヘルパ専用のプールを使用
+        :param retry_policy: 再試行ポリシー (省略時 RetryPolicy())
+        :param rate_limit: 1秒あたりの最大リクエスト数 (0: 制限しない)
+        :param transport: 接続方式 ('http': HTTP, 'ws': 1本の WebSocket コネクションで多重化する RPC)
         """
         self.client = None
         self.url = url
@@ -30,22 +113,67 @@ class DBHelper:
         self.database = database
         self.username = username
         self.password = password
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.shared = shared
+        self.transport = transport
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        self._rate_limiter = TokenBucket(rate=rate_limit) if rate_limit > 0 else None
+        self._pool: Optional[ConnectionPool] = None
 
     def __enter__(self):
-        self.client = SurrealHTTP(
-            url=self.url,
-            namespace=self.namespace,
-            database=self.database,
-            username=self.username,
-            password=self.password
-        )
+        self.open()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
-    def close(self):
-        pass
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> None:
+        """
+        コネクションプール取得
+        :return:
+        """
+        if self._pool and not self._pool.closed:
+            return
+        pool_args = {
+            'url': self.url,
+            'namespace': self.namespace,
+            'database': self.database,
+            'username': self.username,
+            'password': self.password,
+            'pool_size': self.pool_size,
+            'idle_timeout': self.idle_timeout,
+            'transport': self.transport,
+        }
+        self._pool = ConnectionPool.get(**pool_args) if self.shared else ConnectionPool(**pool_args)
+        self.client = self._pool.client
+
+    def close(self) -> None:
+        """
+        コネクションプール解放
+        専用プールの場合は保持する全コネクションを切断する.
+        共有プールの場合はコネクションを他のヘルパのために残す. (プロセス終了時に切断される)
+        :return:
+        """
+        if self._pool and not self.shared:
+            self._pool.close()
+        self._pool = None
+        self.client = None
+
+    @staticmethod
+    def close_all_pools() -> None:
+        """
+        全共有コネクションプールの切断
+        :return:
+        """
+        ConnectionPool.close_all()
 
     async def relate(
             self,
@@ -53,61 +181,370 @@ class DBHelper:
             to_id: str,
             relation: str,
             timestamp: Optional[str] = None,
+            edge_id: Optional[str] = None,
+            replace: bool = False,
+            stats: Optional[RequestStats] = None,
     ) -> Any:
         """
         リレーションシップ登録
         (FROMノード）-[関係]->(TOノード)
+        エラーの場合は RuntimeError を送出する
         :param from_id: FROMノード識別子
         :param to_id: TOノード識別子
         :param relation: 関係
         :param timestamp: タイムスタンプ
-        :return:
+        :param edge_id: 関係レコード識別子 (省略時 SurrealDB が識別子を割り当てる)
+        :param replace: True: 同じ識別子の関係が登録済みの場合は置き換える
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :return: SurrealDB レスポンス
         """
-        timestamp_str = f'type::datetime("{timestamp}")' if timestamp else 'time::now()'
-        content = {
-            'data': {
-                'timestamp': '$timestamp',
-            }
+        from_table, _, from_key = from_id.partition(':')
+        to_table, _, to_key = to_id.partition(':')
+        variables = {
+            'from_table': from_table,
+            'from_id': from_key,
+            'to_table': to_table,
+            'to_id': to_key,
+            'timestamp': f'{timestamp}',
         }
-        sql = f'let $timestamp = {timestamp_str} ;' \
-              + f'RELATE {from_id}->{relation}->{to_id} CONTENT ' \
-              + '{ data: {timestamp: ' \
-              + f'"{timestamp}" ' \
-              + '}}'
-        response = await self.client.query(sql)
+        if edge_id:
+            sql = (DELETE_EDGE if replace else '') + RELATE_WITH_ID
+            variables.update({'relation': relation, 'edge_id': edge_id})
+        else:
+            sql = get_relate_query(relation=relation)
+        # 識別子を指定して置き換える場合は再実行しても結果は変わらない
+        response = await self._request(
+            lambda: self.client.query(sql, variables),
+            sent=sql,
+            stats=stats,
+            check=True,
+            idempotent=bool(edge_id) and replace)
+        return response
+
+    async def relate_many(
+            self,
+            relation: str,
+            edges: List[Tuple[str, str, Optional[str], Optional[str]]],
+            replace: bool = False,
+            stats: Optional[RequestStats] = None,
+    ) -> Any:
+        """
+        複数リレーションシップ一括登録
+        同一の関係を1トランザクション内の複数 RELATE 文として1回のリクエストで登録する
+        (HTTP 接続方式はバインド変数を URL パラメータで送信するため、一括登録の文は識別子をエスケープして埋め込む)
+        (FROMノード）-[関係]->(TOノード)
+        :param relation: 関係
+        :param edges: (FROMノード識別子, TOノード識別子, タイムスタンプ, 関係レコード識別子) 群
+                      関係レコード識別子が None の場合は SurrealDB が識別子を割り当てる
+        :param replace: True: 同じ識別子の関係が登録済みの場合は置き換える
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :return: SurrealDB レスポンス
+        """
+        if len(edges) <= 0:
+            return []
+        statements = []
+        for from_id, to_id, timestamp, edge_id in edges:
+            edge = get_thing(f'{relation}:{edge_id}') if edge_id else get_identifier(relation)
+            if edge_id and replace:
+                statements.append(f'DELETE {edge};')
+            statements.append(
+                f'RELATE {get_thing(from_id)}->{edge}->{get_thing(to_id)} CONTENT '
+                + get_content({'data': {'timestamp': timestamp}}) + ';')
+        # 全ての関係に識別子を指定して置き換える場合は再実行しても結果は変わらない
+        idempotent = replace and all(edge_id for _, _, _, edge_id in edges)
+        response = await self.transaction(statements=statements, stats=stats, idempotent=idempotent)
         return response
 
     async def create_one(
             self,
             table: str,
             id: str,
-            data: Any
+            data: Any,
+            stats: Optional[RequestStats] = None,
     ):
         """
         1レコード登録
+        エラーの場合は RuntimeError を送出する
+        (SurrealHTTP.create はエラー応答を検査せずに結果を参照するため、CREATE 文で登録してレスポンスを検査する)
+        :param table: 対象テーブル識別子
+        :param id: レコード識別子
+        :param data: 詳細データ
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :return: 登録レコード
+        """
+        sql = f'CREATE type::thing($table, $id) CONTENT {get_content(data)};'
+        variables = {'table': table, 'id': id}
+        response = await self._request(
+            lambda: self.client.query(sql, variables),
+            sent=sql,
+            stats=stats,
+            check=True)
+        return response[0].get('result', None) if len(response) > 0 else None
+
+    async def insert_many(
+            self,
+            table: str,
+            records: List[dict],
+            stats: Optional[RequestStats] = None,
+    ) -> Any:
+        """
+        複数レコード一括登録
+        1回のリクエストで INSERT INTO <table> [...] を実行する (登録データは json として埋め込む)
+        :param table: 対象テーブル識別子
+        :param records: 登録レコード群 (各レコードは 'id' を含む)
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :return: SurrealDB レスポンス
+        """
+        if len(records) <= 0:
+            return []
+        sql = f'INSERT INTO {get_identifier(table)} {get_content(records)};'
+        response = await self._request(lambda: self.client.query(sql), sent=sql, stats=stats, check=True)
+        return response
+
+    async def upsert_one(
+            self,
+            table: str,
+            id: str,
+            data: Any,
+            stats: Optional[RequestStats] = None,
+    ):
+        """
+        1レコード登録 (登録済みの場合は置き換える)
+        エラーの場合は RuntimeError を送出する (create_one と同様に UPDATE 文で登録する)
         :param table: 対象テーブル識別子
         :param id: レコード識別子
         :param data: 詳細データ
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :return: 登録レコード
+        """
+        sql = f'UPDATE type::thing($table, $id) CONTENT {get_content(data)};'
+        variables = {'table': table, 'id': id}
+        response = await self._request(
+            lambda: self.client.query(sql, variables),
+            sent=sql,
+            stats=stats,
+            check=True,
+            idempotent=True)
+        return response[0].get('result', None) if len(response) > 0 else None
+
+    async def upsert_many(
+            self,
+            table: str,
+            records: List[dict],
+            stats: Optional[RequestStats] = None,
+    ) -> Any:
+        """
+        複数レコード一括登録 (登録済みの場合は置き換える)
+        1回のリクエストで1トランザクション内の複数 UPDATE <table>:<id> CONTENT 文を実行する
+        :param table: 対象テーブル識別子
+        :param records: 登録レコード群 (各レコードは 'id' を含む)
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
         :return: SurrealDB レスポンス
         """
-        response = await self.client.create(thing=table + ':' + id, data=data)
+        if len(records) <= 0:
+            return []
+        statements = [
+            f'UPDATE {get_thing(table + ":" + str(record["id"]))} CONTENT {get_content(record)};'
+            for record in records
+        ]
+        response = await self.transaction(statements=statements, stats=stats, idempotent=True)
         return response
 
+    async def transaction(
+            self,
+            statements: List[str],
+            stats: Optional[RequestStats] = None,
+            idempotent: bool = False,
+    ) -> Any:
+        """
+        複数の SurrealQL 文を1トランザクションとして1回のリクエストで実行する
+        いずれかの文がエラーの場合は RuntimeError を送出する
+        :param statements: SurrealQL 文群 (各文は ';' で終わる)
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :param idempotent: True: 再実行しても結果が変わらない文のみ (応答が不明なエラーも再試行する)
+        :return: SurrealDB レスポンス
+        """
+        sql = 'BEGIN TRANSACTION;' + ''.join(statements) + 'COMMIT TRANSACTION;'
+        response = await self._request(
+            lambda: self.client.query(sql),
+            sent=sql,
+            stats=stats,
+            check=True,
+            idempotent=idempotent)
+        return response
+
+    def batch(self) -> 'QueryBatch':
+        """
+        名前付き SurrealQL バッチ生成
+        :return: 空のバッチ
+        """
+        return QueryBatch(client=self)
+
     async def execute(
             self,
-            query: str
+            query: str,
+            variables: Optional[dict] = None,
     ):
         """
         SurrealQL実行
+        値は SurrealQL 文字列へ埋め込まず、バインド変数 ($<変数名>) として渡す
         :param query: SurrealQL文字列
+        :param variables: バインド変数 {変数名: 値} (省略時 なし)
         :return: SurrealDBからのレスポンス
         """
-        response = await self.client.query(sql=query)
+        response = await self._request(lambda: self.client.query(sql=query, vars=variables), sent=query)
         result = response[0].get('result') if len(response) > 0 and response[0].get('result', None) else None
         return result
 
+    async def _request(
+            self,
+            request: Callable[[], Coroutine],
+            sent: Any,
+            stats: Optional[RequestStats] = None,
+            check: bool = False,
+            idempotent: bool = False,
+    ) -> Any:
+        """
+        リクエスト実行
+        レート制限を適用し、一時的なエラーの場合は再試行ポリシーに従って再試行する
+        :param request: SurrealDB へアクセスするコルーチンを生成する関数 (再試行毎に呼び出す)
+        :param sent: 送信内容 (SurrealQL 文字列または登録データ) 送信バイト数の集計に使用する
+        :param stats: リクエスト統計の集計先 (省略時 集計しない)
+        :param check: True: SurrealDB レスポンスを検査する
+        :param idempotent: True: 再実行しても結果が変わらないリクエスト (応答が不明なエラーも再試行する)
+        :return: SurrealDB レスポンス
+        """
+        sent_bytes = len((sent if isinstance(sent, str) else json.dumps(sent, ensure_ascii=False)).encode('utf-8')) \
+            if stats else 0
 
+        def _on_retry() -> None:
+            if stats:
+                stats.retries += 1
 
+        async for attempt in self.retry_policy.retrying(idempotent=idempotent, on_retry=_on_retry):
+            with attempt:
+                if self._rate_limiter:
+                    await self._rate_limiter.acquire()
+                response = await self._send(request=request, sent_bytes=sent_bytes, stats=stats, check=check)
+        return response
+
+    async def _send(
+            self,
+            request: Callable[[], Coroutine],
+            sent_bytes: int,
+            stats: Optional[RequestStats] = None,
+            check: bool = False,
+    ) -> Any:
+        if not stats:
+            response = await self._pool.run(request())
+            if check:
+                self.check_response(response=response)
+            return response
 
+        started = time.perf_counter()
+        error = True
+        try:
+            response = await self._pool.run(request())
+            if check:
+                self.check_response(response=response)
+            error = False
+            return response
+        finally:
+            stats.add_request(sent_bytes=sent_bytes, started=started, finished=time.perf_counter(), error=error)
+
+    @staticmethod
+    def check_response(
+            response: Any,
+    ) -> None:
+        """
+        SurrealDBレスポンスの検査
+        エラーを含む場合は RuntimeError を送出する (一時的なエラーの場合は SurrealDBTransientError)
+        :param response: SurrealDB レスポンス
+        :return:
+        """
+        if isinstance(response, dict):
+            message = f'SurrealDB returned an error. ({response.get("information", response)})'
+            if response.get('code', None) in TRANSIENT_STATUS_CODES:
+                raise SurrealDBTransientError(message)
+            raise RuntimeError(message)
+        for result in response if response else []:
+            if result.get('status', 'OK') != 'OK':
+                detail = result.get('detail', result)
+                message = f'SurrealDB returned an error. ({detail})'
+                if is_transient_error_message(detail):
+                    raise SurrealDBTransientError(message)
+                raise RuntimeError(message)
 
 
+class QueryBatch:
+    """
+    名前付き SurrealQL バッチ
+    複数の SurrealQL 文を1回のリクエストで実行し、各文の結果を名前で返す.
+    各 SurrealQL は1文とし、バインド変数はバッチ内で一意な名前 (q<n>_<変数名>) に置き換えて送信する.
+    """
+
+    def __init__(
+            self,
+            client: DBHelper,
+    ):
+        """
+        コンストラクタ
+        :param client: SurrealDBヘルパ
+        """
+        self._client = client
+        self.names: List[str] = []
+        self._statements: List[str] = []
+        self._variables = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(
+            self,
+            name: str,
+            sql: str,
+            variables: Optional[dict] = None,
+    ) -> 'QueryBatch':
+        """
+        SurrealQL 追加
+        :param name: 結果の名前 (バッチ内で一意)
+        :param sql: SurrealQL文字列 (1文)
+        :param variables: バインド変数 {変数名: 値} (省略時 なし)
+        :return: 本バッチ
+        """
+        if name in self.names:
+            raise ValueError(f'Duplicate query name. ({name})')
+        prefix = f'q{len(self.names)}_'
+        if variables:
+            sql = re.sub(
+                r'\$(\w+)',
+                lambda m: f'${prefix}{m.group(1)}' if m.group(1) in variables else m.group(0),
+                sql)
+            self._variables.update({f'{prefix}{key}': value for key, value in variables.items()})
+        self._statements.append(sql.strip().rstrip(';').rstrip() + ';')
+        self.names.append(name)
+        return self
+
+    async def execute(
+            self,
+            idempotent: bool = False,
+    ) -> {}:
+        """
+        バッチ実行
+        いずれかの文がエラーの場合は RuntimeError を送出する
+        :param idempotent: True: 再実行しても結果が変わらない文のみ (応答が不明なエラーも再試行する)
+        :return: {名前: 結果} (結果が空の場合 None)
+        """
+        if len(self.names) <= 0:
+            return {}
+        sql = ''.join(self._statements)
+        variables = self._variables if self._variables else None
+        response = await self._client._request(
+            lambda: self._client.client.query(sql, variables),
+            sent=sql,
+            check=True,
+            idempotent=idempotent)
+        return {
+            name: result.get('result') if result.get('result', None) else None
+            for name, result in zip(self.names, response)
+        }
@@ -1,9 +1,44 @@
-from typing import Optional, List
+import asyncio
+from functools import lru_cache
+from typing import Optional, List, Tuple, Set
 
-from helper.db_helper import DBHelper
+import util
+from helper.connection_pool import DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from helper.db_helper import DBHelper, QueryBatch
+from helper.options import DEFAULT_TRANSPORT
 from helper.surrealdb_sql_def import GET_PRODUCT_INFO, GET_PRODUCTION_HISTORIES, GET_PRODUCTION_YIELD, \
     GET_PRODUCTION_WORK_HISTORIES, GET_TRANSFER_WORK_HISTORIES, GET_PROCESSING_TIME, PARAM_PRODUCTION_LINE1, \
-    PARAM_PRODUCTION_LINE2, GET_RELATIONSHIPS_ABOUT_NODE, EXCLUSION_TABLE_NAMES, GET_MEASUREMENTS_VALUE
+    PARAM_PRODUCTION_LINE2, EXCLUSION_TABLE_NAMES, GET_MEASUREMENTS_VALUE, \
+    GET_NEIGHBORING_NODES, GET_ALL_RECORDS, GET_RELATIONSHIPS_ABOUT_NODES, GET_SUMMARY_TABLES_STATUS, \
+    WORK_HISTORIES_TABLE, TRANSFER_WORK_HISTORIES_TABLE, MEASUREMENTS_VALUE_TABLE, WORK_START_END_TABLE, \
+    GET_PRODUCTION_HISTORIES_FROM_SUMMARY, GET_TRANSFER_WORK_HISTORIES_FROM_SUMMARY, \
+    GET_MEASUREMENTS_VALUE_FROM_SUMMARY, GET_PRODUCTION_WORK_HISTORIES_FROM_SUMMARY, PRODUCTION_TIMES_TABLE, \
+    GET_PRODUCTION_LEAD_TIMES_FROM_SUMMARY, PARAM_FIRST_PROCESS, PARAM_LAST_PROCESS, GET_SUMMARY_TABLES_REFRESHED
+
+# 1リクエストで関係を検索するノード数
+TRAVERSAL_BATCH_SIZE = 50
+
+
+@lru_cache(maxsize=None)
+def get_relationships_about_nodes_query(count: int) -> str:
+    """
+    複数ノードの関係一括検索 SurrealQL 取得
+    ノードは <テーブル名>, <識別子> のバインド変数 ($table<n>, $id<n>) で指定する.
+    生成した文はノード数毎に再利用する.
+    :param count: 検索対象ノード数
+    :return: SurrealQL文字列
+    """
+    return GET_RELATIONSHIPS_ABOUT_NODES.format(', '.join(f'type::thing($table{i}, $id{i})' for i in range(count)))
+
+
+def split_record_id(record_id: str) -> Tuple[str, str]:
+    """
+    レコード識別子を テーブル名 と 識別子 に分割する
+    :param record_id: レコード識別子 (<テーブル名>:<識別子>)
+    :return: (テーブル名, 識別子)
+    """
+    table, _, data_id = str(record_id).partition(':')
+    return table, data_id.strip('⟨⟩`')
 
 
 class FactoryDBHelper(DBHelper):
@@ -14,7 +49,11 @@ class FactoryDBHelper(DBHelper):
             namespace: str = 'test',
             database: str = 'test',
             username: str = 'root',
-            password: str = 'root'
+            password: str = 'root',
+            pool_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            shared: bool = True,
+            transport: str = DEFAULT_TRANSPORT,
     ):
         """
         コンストラクタ
@@ -23,14 +62,24 @@ class FactoryDBHelper(DBHelper):
         :param database: データベース名
         :param username: 認証ユーザ
         :param password: パスワード
+        :param pool_size: コネクションプール 最大コネクション数
+        :param idle_timeout: コネクションプール 未使用コネクション保持時間(秒)
+        :param shared: True: プロセス内で共有するプールを使用  False: このヘルパ専用のプールを使用
+        :param transport: 接続方式 ('http': HTTP, 'ws': 1本の WebSocket コネクションで多重化する RPC)
         """
         super(FactoryDBHelper, self).__init__(
             url=url,
             namespace=namespace,
             database=database,
             username=username,
-            password=password
+            password=password,
+            pool_size=pool_size,
+            idle_timeout=idle_timeout,
+            shared=shared,
+            transport=transport,
         )
+        # インポータが生成した集計テーブル名群 (未取得の場合 None)
+        self._summary_tables: Optional[Set[str]] = None
 
     def __enter__(self):
         super(FactoryDBHelper, self).__enter__()
@@ -40,26 +89,93 @@ class FactoryDBHelper(DBHelper):
         self._close()
         super(FactoryDBHelper, self).__exit__(exc_type, exc_val, exc_tb)
 
+    async def __aenter__(self):
+        await super(FactoryDBHelper, self).__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._close()
+        await super(FactoryDBHelper, self).__aexit__(exc_type, exc_val, exc_tb)
+
     def _close(self):
         pass
 
     async def exec_sql(
             self,
             sql: str,
+            variables: Optional[dict] = None,
     ) -> {}:
         """
         SurrealQL実行
         :param sql: SurrealQL文字列
+        :param variables: バインド変数 {変数名: 値} (省略時 なし)
         :return: SurrealDBからのレスポンス
         """
         response = None
         try:
-            response = await self.execute(query=sql)
+            response = await self.execute(query=sql, variables=variables)
         except Exception as e:
             print(f'{e}')
             return {}
         return response
 
+    async def exec_batch(
+            self,
+            batch: QueryBatch,
+    ) -> {}:
+        """
+        名前付き SurrealQL バッチ実行 (参照のみ)
+        :param batch: バッチ
+        :return: {名前: SurrealDBからのレスポンス} (エラーの場合は全ての名前の結果が {})
+        """
+        try:
+            return await batch.execute(idempotent=True)
+        except Exception as e:
+            print(f'{e}')
+            return {name: {} for name in batch.names}
+
+    async def get_summary_tables(
+            self,
+    ) -> Set[str]:
+        """
+        インポータが生成した集計テーブル名取得
+        集計テーブルの生成中やインポート中は集計テーブルの状態レコードが存在しないため空集合を返す.
+        問い合わせはヘルパ毎に1回だけ行う.
+        :return: 集計テーブル名群
+        """
+        if self._summary_tables is None:
+            response = await self.exec_sql(sql=GET_SUMMARY_TABLES_STATUS)
+            self._summary_tables = set(response[0].get('tables', None) or []) if response else set()
+        return self._summary_tables
+
+    async def get_summary_tables_refreshed(
+            self,
+    ) -> Optional[str]:
+        """
+        集計テーブルの更新日時取得 (インポートによるデータ変更の検出に使用する)
+        通信エラーの場合は例外を送出する.
+        :return: 更新日時 (インポート中、または集計テーブルが存在しない場合は None)
+        """
+        response = await self.execute(query=GET_SUMMARY_TABLES_REFRESHED)
+        return response[0].get('refreshed', None) if response else None
+
+    async def exec_summary_sql(
+            self,
+            table: str,
+            summary_sql: str,
+            sql: str,
+    ) -> {}:
+        """
+        集計テーブルが存在する場合は集計テーブルを検索し、存在しない場合はグラフを検索する
+        :param table: 集計テーブル名
+        :param summary_sql: 集計テーブル検索 SurrealQL文字列
+        :param sql: グラフ検索 SurrealQL文字列
+        :return: SurrealDBからのレスポンス
+        """
+        if table in await self.get_summary_tables():
+            return await self.exec_sql(sql=summary_sql + ';')
+        return await self.exec_sql(sql=sql + ';')
+
     async def get_all_records_from_table(
             self,
             table: str,
@@ -69,8 +185,22 @@ class FactoryDBHelper(DBHelper):
         :param table: テーブル識別子
         :return: レコード群
         """
-        sql = f"SELECT * FROM {table};"
-        result = await self.exec_sql(sql=sql)
+        result = await self.exec_sql(sql=GET_ALL_RECORDS, variables={'table': table})
+        return result
+
+    async def get_all_records_from_tables(
+            self,
+            tables: List[str],
+    ) -> {}:
+        """
+        指定された複数テーブルの全レコードを1回のリクエストで取得
+        :param tables: テーブル識別子群
+        :return: {テーブル識別子: レコード群}
+        """
+        batch = self.batch()
+        for table in tables:
+            batch.add(name=table, sql=GET_ALL_RECORDS, variables={'table': table})
+        result = await self.exec_batch(batch=batch)
         return result
 
     async def get_relationships(
@@ -82,11 +212,7 @@ class FactoryDBHelper(DBHelper):
         :param relationships: 取得する関係リスト
         :return: 関係情報群
         """
-        result = {}
-        for relationship in [r for r in relationships]:
-            sql = f"SELECT * FROM {relationship};"
-            response = await self.exec_sql(sql=sql)
-            result[relationship] = response
+        result = await self.get_all_records_from_tables(tables=relationships)
         return result
 
     async def get_neighboring_nodes(
@@ -102,9 +228,8 @@ class FactoryDBHelper(DBHelper):
         """
         if not (object_id and table):
             return {}, {}
-        sql = f'SELECT <->(? AS relationship)<->(? AS nodes) FROM {table} WHERE id="{object_id}";'
-        response = await self.exec_sql(sql=sql)
-        if len(response) <= 0:
+        response = await self.exec_sql(sql=GET_NEIGHBORING_NODES, variables={'table': table, 'id': object_id})
+        if not response or len(response) <= 0:
             return {}, {}
         return response[0].get('relationship', {}), response[0].get('nodes', {})
 
@@ -126,8 +251,10 @@ class FactoryDBHelper(DBHelper):
         全作業情報取得
         :return: 作業情報群
         """
-        sql = f"{GET_PRODUCTION_HISTORIES};"
-        result = await self.exec_sql(sql=sql)
+        result = await self.exec_summary_sql(
+            table=WORK_HISTORIES_TABLE,
+            summary_sql=GET_PRODUCTION_HISTORIES_FROM_SUMMARY,
+            sql=GET_PRODUCTION_HISTORIES)
         return result
 
     async def get_production_yield(
@@ -148,8 +275,10 @@ class FactoryDBHelper(DBHelper):
         全製品の作業履歴取得
         :return: 作業情報群
         """
-        sql = GET_PRODUCTION_WORK_HISTORIES + ';'
-        result = await self.exec_sql(sql=sql)
+        result = await self.exec_summary_sql(
+            table=WORK_START_END_TABLE,
+            summary_sql=GET_PRODUCTION_WORK_HISTORIES_FROM_SUMMARY,
+            sql=GET_PRODUCTION_WORK_HISTORIES)
         return result
 
     async def get_transfer_work_histories(
@@ -159,8 +288,10 @@ class FactoryDBHelper(DBHelper):
         全移動作業情報取得
         :return: 移動作業情報
         """
-        sql = GET_TRANSFER_WORK_HISTORIES + ';'
-        result = await self.exec_sql(sql=sql)
+        result = await self.exec_summary_sql(
+            table=TRANSFER_WORK_HISTORIES_TABLE,
+            summary_sql=GET_TRANSFER_WORK_HISTORIES_FROM_SUMMARY,
+            sql=GET_TRANSFER_WORK_HISTORIES)
         return result
 
     async def get_production_time_records(
@@ -174,10 +305,49 @@ class FactoryDBHelper(DBHelper):
         :param first_process: 終了製造ライン識別子
         :return: 製造時間情報
         """
-        sql = (GET_PROCESSING_TIME
-               .replace(f'{PARAM_PRODUCTION_LINE1}', first_process)) \
-                  .replace(f'{PARAM_PRODUCTION_LINE2}', last_process) + ';'
-        result = await self.exec_sql(sql=sql)
+        sql = GET_PROCESSING_TIME + ';'
+        result = await self.exec_sql(
+            sql=sql,
+            variables={PARAM_PRODUCTION_LINE1: first_process, PARAM_PRODUCTION_LINE2: last_process})
+        return result
+
+    async def get_production_time_records_many(
+            self,
+            processes: {},
+    ) -> {}:
+        """
+        複数の製造時間を1回のリクエストで取得
+        :param processes: {名前: (終了製造ライン識別子, 開始製造ライン識別子)}
+        :return: {名前: 製造時間情報}
+        """
+        batch = self.batch()
+        for name, (last_process, first_process) in processes.items():
+            batch.add(
+                name=name,
+                sql=GET_PROCESSING_TIME,
+                variables={PARAM_PRODUCTION_LINE1: first_process, PARAM_PRODUCTION_LINE2: last_process})
+        result = await self.exec_batch(batch=batch)
+        return result
+
+    async def get_production_lead_times_many(
+            self,
+            processes: {},
+    ) -> Optional[dict]:
+        """
+        集計テーブルで集計済みの複数の製造時間を1回のリクエストで取得
+        :param processes: {名前: (終了製造ライン識別子, 開始製造ライン識別子)}
+        :return: {名前: [{'product': 仕掛品識別子, 'started_utime': 開始時刻, 'ended_utime': 終了時刻,
+                          'lead_time': 製造時間(秒)}]} (集計テーブルが存在しない場合は None)
+        """
+        if PRODUCTION_TIMES_TABLE not in await self.get_summary_tables():
+            return None
+        batch = self.batch()
+        for name, (last_process, first_process) in processes.items():
+            batch.add(
+                name=name,
+                sql=GET_PRODUCTION_LEAD_TIMES_FROM_SUMMARY,
+                variables={PARAM_FIRST_PROCESS: first_process, PARAM_LAST_PROCESS: last_process})
+        result = await self.exec_batch(batch=batch)
         return result
 
     async def get_relationships_of_node(
@@ -189,53 +359,63 @@ class FactoryDBHelper(DBHelper):
     ) -> ([{}], [str], [str]):
         """
         指定されたノードに関連する「関係」と「ノード」を検索する
+        起点ノードから幅優先で探索し、同じ深さのノード(フロンティア)の関係を TRAVERSAL_BATCH_SIZE 毎に一括検索する.
+        (1ノード毎に問い合わせると深い組立構成の製品では問い合わせ回数がノード数に比例するため)
         :param node_id:          起点ノード
-        :param relationships:    省略引数. 検索された関係.
-        :param nodes:            省略引数. 検索されたノード群
+        :param relationships:    省略引数. 検索済みの関係.
+        :param nodes:            省略引数. 検索済みのノード群
         :param traversed_nodes:  省略引数. 検索起点となったノード群
         :return: (検索された関係群: [{}], 検索されたノード群: [str], 検索起点ノード群: [str])
         """
-        _relationships = relationships if relationships else []
-        _nodes = nodes if nodes else []
-        _traversed_nodes = traversed_nodes if traversed_nodes else []
-        _found_nodes = []
-        while True:
-            _table = node_id.split(':')[0]
-            if _table in EXCLUSION_TABLE_NAMES:
-                break
-            if node_id in _traversed_nodes:
+        # 検索結果の順序を保つため dict を順序付き集合として使用する
+        _relationships: {str, {}} = {r.get('id', '?'): r for r in relationships} if relationships else {}
+        _nodes: {str, None} = dict.fromkeys(nodes) if nodes else {}
+        _traversed_nodes: {str, None} = dict.fromkeys(traversed_nodes) if traversed_nodes else {}
+
+        frontier = [node_id]
+        while len(frontier) > 0:
+            frontier = [
+                _n for _n in dict.fromkeys(frontier)
+                if _n not in _traversed_nodes and _n.split(':')[0] not in EXCLUSION_TABLE_NAMES
+            ]
+            if len(frontier) <= 0:
                 break
+            for _n in frontier:
+                _traversed_nodes[_n] = None
+                _nodes.setdefault(_n, None)
 
-            _traversed_nodes.append(node_id)
-            if node_id not in _nodes:
-                _nodes.append(node_id)
+            _responses = await asyncio.gather(*[
+                self._get_relationships_about_nodes(node_ids=node_ids)
+                for node_ids in util.chunks(frontier, TRAVERSAL_BATCH_SIZE)
+            ])
+            _found_nodes = []
+            for _response in _responses:
+                for _record in _response if _response else []:
+                    for _r in _record.get('relationship', []):
+                        _rid = _r.get('id', '?')
+                        if _rid in _relationships:
+                            continue
+                        _relationships[_rid] = _r
+                        for _n in [_r.get('in', None), _r.get('out', None)]:
+                            if _n and _n not in _nodes:
+                                _nodes[_n] = None
+                                _found_nodes.append(_n)
+            frontier = _found_nodes
+        return list(_relationships.values()), list(_nodes), list(_traversed_nodes)
 
-            _sql = GET_RELATIONSHIPS_ABOUT_NODE.format(_table, node_id)
-            _response = await self.exec_sql(sql=_sql)
-            if not _response or len(_response) <= 0:
-                break
-            for _r in _response[0].get('relationship', []):
-                _rid = (_r.get('id', '?'))
-                if not any(map(lambda x: x.get('id', '') == _rid, _relationships)):
-                    _relationships.append(_r)
-                else:
-                    continue
-                for _n in [_r.get('in', None), _r.get('out', None)]:
-                    if _n not in _nodes:
-                        _nodes.append(_n)
-                        _found_nodes.append(_n)
-
-            for _n in _found_nodes:
-                if not _n.split(':')[0] in EXCLUSION_TABLE_NAMES and (_n not in _traversed_nodes):
-                    _relationships, _nodes, _traversed_nodes = \
-                        await self.get_relationships_of_node(
-                            node_id=_n,
-                            relationships=_relationships,
-                            nodes=_nodes,
-                            traversed_nodes=_traversed_nodes,
-                        )
-                    _traversed_nodes.append(_n)
-        return _relationships, _nodes, _traversed_nodes
+    async def _get_relationships_about_nodes(
+            self,
+            node_ids: List[str],
+    ) -> {}:
+        """
+        複数ノードに関連する関係を1回の問い合わせで検索する
+        :param node_ids: 検索対象ノード識別子群
+        :return: SurrealDBからのレスポンス (ノード毎の関係群)
+        """
+        variables = {}
+        for i, node_id in enumerate(node_ids):
+            variables[f'table{i}'], variables[f'id{i}'] = split_record_id(node_id)
+        return await self.exec_sql(sql=get_relationships_about_nodes_query(count=len(node_ids)), variables=variables)
 
     async def get_measurements_values(
             self,
@@ -244,6 +424,8 @@ class FactoryDBHelper(DBHelper):
         機器の測定情報取得
         :return: 測定情報群
         """
-        sql = GET_MEASUREMENTS_VALUE + ';'
-        result = await self.exec_sql(sql=sql)
+        result = await self.exec_summary_sql(
+            table=MEASUREMENTS_VALUE_TABLE,
+            summary_sql=GET_MEASUREMENTS_VALUE_FROM_SUMMARY,
+            sql=GET_MEASUREMENTS_VALUE)
         return result
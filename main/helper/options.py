@@ -0,0 +1,10 @@
+# 接続オプションの定数 (コマンド引数の解釈でも参照するため、依存パッケージを import しない)
+
+# SurrealDB への接続方式
+TRANSPORT_HTTP = 'http'     # HTTP (/sql へ1リクエスト毎に認証情報を送信する)
+TRANSPORT_WS = 'ws'         # WebSocket RPC (1本の認証済みコネクションで複数のリクエストを同時に実行する)
+TRANSPORTS = (TRANSPORT_HTTP, TRANSPORT_WS)
+DEFAULT_TRANSPORT = TRANSPORT_HTTP
+
+# 再試行回数(デフォルト)
+DEFAULT_MAX_RETRIES = 3
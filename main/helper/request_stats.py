@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+# 集計するレイテンシのパーセンタイル
+LATENCY_PERCENTILES = [50, 90, 99]
+
+
+@dataclass
+class RequestStats:
+    """
+    SurrealDB リクエスト統計
+    """
+    requests: int = 0                                       # リクエスト数
+    sent_bytes: int = 0                                     # 送信バイト数 (リクエスト本文)
+    retries: int = 0                                        # 再試行数
+    errors: int = 0                                         # エラー数 (通信エラー、SurrealDB のエラー応答)
+    latencies: List[float] = field(default_factory=list)    # リクエスト毎のレイテンシ(秒)
+    started: Optional[float] = None                         # 最初のリクエストの開始時刻 (time.perf_counter)
+    finished: Optional[float] = None                        # 最後のリクエストの終了時刻 (time.perf_counter)
+
+    def add_request(
+            self,
+            sent_bytes: int,
+            started: float,
+            finished: float,
+            error: bool = False,
+    ) -> None:
+        """
+        リクエスト結果を集計する
+        :param sent_bytes: 送信バイト数
+        :param started: 開始時刻 (time.perf_counter)
+        :param finished: 終了時刻 (time.perf_counter)
+        :param error: True: エラー
+        :return:
+        """
+        self.requests += 1
+        self.sent_bytes += sent_bytes
+        self.latencies.append(finished - started)
+        if error:
+            self.errors += 1
+        self.started = started if self.started is None else min(self.started, started)
+        self.finished = finished if self.finished is None else max(self.finished, finished)
+
+    @property
+    def elapsed(self) -> float:
+        """
+        最初のリクエストの開始から最後のリクエストの終了までの時間(秒)
+        """
+        return self.finished - self.started if self.started is not None else 0.0
+
+    def get_latency_percentiles(self) -> {str, float}:
+        """
+        レイテンシのパーセンタイル
+        :return: {'p50': 秒, 'p90': 秒, 'p99': 秒, 'max': 秒}
+        """
+        if len(self.latencies) <= 0:
+            return {}
+        values = np.percentile(self.latencies, LATENCY_PERCENTILES)
+        percentiles = {f'p{percentile}': float(value) for percentile, value in zip(LATENCY_PERCENTILES, values)}
+        percentiles['max'] = float(max(self.latencies))
+        return percentiles
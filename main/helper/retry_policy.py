@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential, RetryCallState
+
+from helper.options import DEFAULT_MAX_RETRIES
+
+# 再試行間隔の初期値(秒)(デフォルト)
+DEFAULT_INITIAL_WAIT = 0.5
+
+# 再試行間隔の最大値(秒)(デフォルト)
+DEFAULT_MAX_WAIT = 30.0
+
+# 一時的なエラーを示す SurrealDB の HTTP ステータスコード
+TRANSIENT_STATUS_CODES = (429, 502, 503, 504)
+
+# 一時的なエラー(トランザクションはロールバック済み)を示す SurrealDB のエラーメッセージ
+TRANSIENT_ERROR_MESSAGES = (
+    'transaction conflict',
+    'resource busy',
+    'try again',
+    'can be retried',
+)
+
+# リクエストが送信されていないことが確実な通信エラー
+_NOT_SENT_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    ConnectionRefusedError,
+    InvalidHandshake,
+)
+
+# リクエストが処理されたか不明な通信エラー
+_AMBIGUOUS_ERRORS = (
+    httpx.TransportError,
+    json.JSONDecodeError,
+    ConnectionClosed,
+)
+
+
+class SurrealDBTransientError(RuntimeError):
+    """
+    SurrealDB の一時的なエラー (再試行すれば成功する可能性がある)
+    """
+    pass
+
+
+def is_transient_error_message(message: str) -> bool:
+    """
+    一時的なエラーを示す SurrealDB のエラーメッセージの判定
+    :param message: エラーメッセージ
+    :return: True: 一時的なエラー
+    """
+    message = str(message).lower()
+    return any(transient_message in message for transient_message in TRANSIENT_ERROR_MESSAGES)
+
+
+def is_retryable(
+        e: BaseException,
+        idempotent: bool,
+) -> bool:
+    """
+    再試行可否の判定
+    リクエストが処理されなかったことが確実なエラーは常に再試行する.
+    処理されたか不明なエラー(応答の受信中の切断等)は、再実行しても結果が変わらないリクエストのみ再試行する.
+    :param e: 例外
+    :param idempotent: True: 再実行しても結果が変わらないリクエスト
+    :return: True: 再試行する
+    """
+    if isinstance(e, SurrealDBTransientError) or isinstance(e, _NOT_SENT_ERRORS):
+        return True
+    return idempotent and isinstance(e, _AMBIGUOUS_ERRORS)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    再試行ポリシー
+    ジッタ付き指数バックオフ (0 ～ min(max_wait, initial_wait * 2^n) 秒の乱数) で再試行する
+    """
+    max_retries: int = DEFAULT_MAX_RETRIES      # 最大再試行回数 (0: 再試行しない)
+    initial_wait: float = DEFAULT_INITIAL_WAIT  # 再試行間隔の初期値(秒)
+    max_wait: float = DEFAULT_MAX_WAIT          # 再試行間隔の最大値(秒)
+
+    def retrying(
+            self,
+            idempotent: bool,
+            on_retry=None,
+    ) -> AsyncRetrying:
+        """
+        再試行制御生成
+        :param idempotent: True: 再実行しても結果が変わらないリクエスト
+        :param on_retry: 再試行前に呼び出す関数 (省略時 なし)
+        :return: 再試行制御
+        """
+
+        def _before_sleep(retry_state: RetryCallState) -> None:
+            exception = retry_state.outcome.exception() if retry_state.outcome else None
+            print(f'SurrealDB request failed. retrying ({retry_state.attempt_number}/{self.max_retries}) ({exception})')
+            if on_retry:
+                on_retry()
+
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=wait_random_exponential(multiplier=self.initial_wait, max=self.max_wait),
+            retry=retry_if_exception(lambda e: is_retryable(e=e, idempotent=idempotent)),
+            before_sleep=_before_sleep,
+            reraise=True,
+        )
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限
+    rate 個/秒でトークンを補充し、リクエスト毎にトークンを1つ消費する (最大 capacity 個まで連続して送信できる)
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            capacity: Optional[float] = None,
+    ):
+        """
+        コンストラクタ
+        :param rate: 1秒あたりのリクエスト数
+        :param capacity: バケット容量 (省略時 rate (最低1))
+        """
+        self._rate = rate
+        self._capacity = capacity if capacity else max(1.0, rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """
+        トークンを1つ取得する (トークンが無い場合は補充されるまで待つ)
+        :return:
+        """
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
@@ -0,0 +1,228 @@
+import asyncio
+import json
+from typing import Any, Callable, Optional, Union
+
+import websockets
+from websockets.exceptions import ConnectionClosed, ConnectionClosedError
+from surrealdb.ws import Surreal, Request, ResponseSuccess, ResponseError, ConnectionState
+
+from helper.retry_policy import SurrealDBTransientError, is_transient_error_message
+
+
+def get_rpc_url(url: str) -> str:
+    """
+    SurrealDB server url から WebSocket RPC エンドポイントの url を生成する
+    :param url: SurrealDB server url (http://host:port 等)
+    :return: WebSocket RPC url (ws://host:port/rpc 等)
+    """
+    if url.startswith('https://'):
+        url = 'wss://' + url[len('https://'):]
+    elif url.startswith('http://'):
+        url = 'ws://' + url[len('http://'):]
+    return url if url.rstrip('/').endswith('/rpc') else url.rstrip('/') + '/rpc'
+
+
+class MultiplexedSurrealWS(Surreal):
+    """
+    1本の認証済み WebSocket コネクション上で複数のリクエストを同時に実行する SurrealDB RPC クライアント
+    surrealdb.Surreal は送信と受信を交互に行うため同時に1リクエストしか実行できない.
+    本クラスはリクエスト識別子で応答を振り分ける受信タスクを持ち、応答を待たずに次のリクエストを送信する.
+    コネクションは最初のリクエスト時に接続・認証し、切断された場合は次のリクエスト時に再接続する.
+    ライブクエリ(LIVE SELECT)の通知はライブクエリ識別子で登録された関数へ振り分ける
+    (ライブクエリはコネクションの切断で終了するため、再接続後に再登録が必要).
+    """
+
+    def __init__(
+            self,
+            url: str,
+            namespace: str,
+            database: str,
+            username: str,
+            password: str,
+    ):
+        """
+        コンストラクタ
+        :param url: SurrealDB server url
+        :param namespace: 名前空間
+        :param database: データベース名
+        :param username: 認証ユーザ
+        :param password: パスワード
+        """
+        super(MultiplexedSurrealWS, self).__init__(url=get_rpc_url(url))
+        self.namespace = namespace
+        self.database = database
+        self.username = username
+        self.password = password
+        # 応答待ちのリクエスト {リクエスト識別子: 応答を受け取る Future}
+        self._pending: {str, asyncio.Future} = {}
+        # ライブクエリの通知を受け取る関数 {ライブクエリ識別子: 関数}
+        self._live_handlers: {str, Callable[[dict], None]} = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        """
+        :return: True: 接続・認証済み
+        """
+        return self._ready
+
+    async def connect(
+            self,
+            url: Optional[str] = None,
+    ) -> None:
+        """
+        接続、認証し、名前空間とデータベースを選択する
+        :param url: WebSocket RPC url (省略時 コンストラクタで指定した url)
+        :return:
+        """
+        if url is not None:
+            self.url = get_rpc_url(url)
+        self.ws = await websockets.connect(self.url, max_size=None)
+        self.client_state = ConnectionState.CONNECTED
+        self._reader = asyncio.create_task(self._read_responses(self.ws))
+        try:
+            await self.signin({'user': self.username, 'pass': self.password})
+            await self.use(namespace=self.namespace, database=self.database)
+        except BaseException:
+            await self.close()
+            raise
+        self._ready = True
+
+    async def close(self) -> None:
+        """
+        コネクションを切断する
+        :return:
+        """
+        self._ready = False
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        self.client_state = ConnectionState.DISCONNECTED
+
+    async def subscribe(
+            self,
+            table: str,
+            handler: Callable[[dict], None],
+    ) -> str:
+        """
+        ライブクエリ登録
+        :param table: テーブル名
+        :param handler: 通知を受け取る関数 (引数は {'id': ライブクエリ識別子, 'action': 'CREATE' 等, 'result': レコード})
+        :return: ライブクエリ識別子
+        """
+        live_id = await self.live(table)
+        self._live_handlers[live_id] = handler
+        return live_id
+
+    async def unsubscribe(
+            self,
+            live_id: str,
+    ) -> None:
+        """
+        ライブクエリ終了
+        :param live_id: ライブクエリ識別子
+        :return:
+        """
+        if self._live_handlers.pop(live_id, None) is not None and self._ready:
+            await self.kill(live_id)
+
+    async def _ensure_connected(self) -> None:
+        """
+        未接続(切断済み)の場合は接続する
+        同時に呼び出された場合も接続は1回だけ行う
+        :return:
+        """
+        if self._ready:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if not self._ready:
+                await self.connect()
+
+    async def _send_receive(
+            self,
+            request: Request,
+    ) -> Union[ResponseSuccess, ResponseError]:
+        """
+        リクエストを送信し、同じ識別子の応答を待つ
+        :param request: リクエスト
+        :return: 応答
+        """
+        # 接続処理中の認証リクエストは接続を待たずに送信する
+        if request.method not in ('signin', 'use'):
+            await self._ensure_connected()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request.id] = future
+        try:
+            await self._send(request)
+            response = await future
+        finally:
+            self._pending.pop(request.id, None)
+        if isinstance(response, ResponseError) and is_transient_error_message(response.message):
+            raise SurrealDBTransientError(f'SurrealDB returned an error. ({response.message})')
+        return response
+
+    async def _read_responses(
+            self,
+            ws: Any,
+    ) -> None:
+        """
+        受信タスク
+        受信した応答をリクエスト識別子で応答待ちのリクエストへ振り分ける.
+        切断された場合は応答待ちの全リクエストへ切断の例外を通知する.
+        :param ws: WebSocket コネクション
+        :return:
+        """
+        error: Optional[Exception] = None
+        try:
+            async for message in ws:
+                response = json.loads(message)
+                if response.get('id', None) is None and isinstance(response.get('result', None), dict):
+                    # ライブクエリの通知
+                    self._notify(notification=response['result'])
+                    continue
+                future = self._pending.get(response.get('id', None), None)
+                if future is None or future.done():
+                    # 応答待ちのリクエストがないメッセージは破棄する
+                    continue
+                if response.get('error', None):
+                    future.set_result(ResponseError(**response['error']))
+                else:
+                    future.set_result(ResponseSuccess(**response))
+        except ConnectionClosed as e:
+            error = e
+        except Exception as e:
+            # 応答を解釈できない場合は応答の対応付けが保証できないため切断する
+            error = e
+            await ws.close()
+        if self.ws is not ws:
+            return
+        self._ready = False
+        self.client_state = ConnectionState.DISCONNECTED
+        self._live_handlers.clear()
+        error = error if error else ConnectionClosedError(None, None)
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(error)
+
+    def _notify(
+            self,
+            notification: dict,
+    ) -> None:
+        """
+        ライブクエリの通知を登録された関数へ渡す
+        :param notification: 通知 {'id': ライブクエリ識別子, 'action': 'CREATE' 等, 'result': レコード}
+        :return:
+        """
+        handler = self._live_handlers.get(notification.get('id', None), None)
+        if handler is None:
+            return
+        try:
+            handler(notification)
+        except Exception as e:
+            print(f'Live query notification handler failed. ({e})')
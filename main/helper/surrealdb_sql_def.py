@@ -8,6 +8,11 @@ WORK_HISTORIES_TABLE = 'WORK_HISTORIES_TABLE'
 TRANSFER_WORK_HISTORIES_TABLE = 'TRANSFER_WORK_HISTORIES_TABLE'
 MEASUREMENTS_VALUE_TABLE = 'MEASUREMENTS_VALUE_TABLE'
 WORK_START_END_TABLE = 'WORK_START_END_TABLE'
+PRODUCTION_TIMES_TABLE = 'PRODUCTION_TIMES_TABLE'
+
+# 集計テーブルの状態 (インポータが全集計テーブルの生成を完了した場合のみ存在する)
+SUMMARY_TABLES_STATUS_TABLE = 'SUMMARY_TABLES_STATUS'
+SUMMARY_TABLES_STATUS_ID = 'status'
 
 EXCLUSION_TABLE_NAMES = [
     FactoryNodeTable.FACTORY.name,
@@ -55,13 +60,14 @@ GET_PROCESSING_TIME = (
     '<-STARTED_BY<-PRODUCT.id AS product_id,'
     '<-STARTED_BY.data.timestamp AS started_at,'
     '<-ENDED_BY.data.timestamp AS ended_at '
-    'FROM WORK WHERE <-EXECUTES<-(PRODUCTION_LINE WHERE id = "$$production_line1$$") '
-    'OR <-EXECUTES<-(PRODUCTION_LINE WHERE id = "$$production_line2$$") '
+    'FROM WORK WHERE <-EXECUTES<-(PRODUCTION_LINE WHERE id = $production_line1) '
+    'OR <-EXECUTES<-(PRODUCTION_LINE WHERE id = $production_line2) '
     'SPLIT production_line_id, product_id, started_at, ended_at '
     'FETCH started_at, ended_at '
 )
-PARAM_PRODUCTION_LINE1 = '$$production_line1$$'
-PARAM_PRODUCTION_LINE2 = '$$production_line2$$'
+# GET_PROCESSING_TIME のバインド変数名
+PARAM_PRODUCTION_LINE1 = 'production_line1'
+PARAM_PRODUCTION_LINE2 = 'production_line2'
 
 # 全移動作業履歴検索
 GET_TRANSFER_WORK_HISTORIES = (
@@ -121,13 +127,23 @@ GET_PRODUCTION_YIELD = (
     'FROM PRODUCTION_LINE);'
 )
 
-GET_RELATIONSHIPS_ABOUT_NODE = (
+# 複数ノードに関連する関係の一括検索 ({0}: 検索対象ノード (カンマ区切り))
+GET_RELATIONSHIPS_ABOUT_NODES = (
     'SELECT <->(? AS relationship)<->(?) AS node '
     'FROM {0} '
-    'WHERE id="{1}" '
     'FETCH relationship ;'
 )
 
+# 隣接ノード検索 (テーブル名、識別子は バインド変数 $table, $id で指定する)
+GET_NEIGHBORING_NODES = (
+    'SELECT <->(? AS relationship)<->(? AS nodes) '
+    'FROM type::table($table) '
+    'WHERE id = $id ;'
+)
+
+# 全レコード検索 (テーブル名は バインド変数 $table で指定する)
+GET_ALL_RECORDS = 'SELECT * FROM type::table($table) ;'
+
 GET_PRODUCTION_WORK_HISTORIES = (
     'SELECT production_line,'
     'work_id AS work_id,'
@@ -150,9 +166,81 @@ GET_PRODUCTION_WORK_HISTORIES = (
 )
 INSERT_WORK_START_END = f'INSERT INTO {WORK_START_END_TABLE} (' + GET_PRODUCTION_WORK_HISTORIES + ');'
 
+# 製造ライン、仕掛品毎の作業開始・終了時刻(UNIX時間)と作業時間(秒) (WORK_START_END_TABLE から集計する)
+# 製造ライン識別子、仕掛品識別子はバインド変数(文字列)で検索できるよう文字列で保持する
+GET_PRODUCTION_TIMES = (
+    'SELECT <string> production_line AS production_line,'
+    '<string> product AS product,'
+    'started_utime,'
+    'ended_utime,'
+    'ended_utime - started_utime AS processing_time '
+    'FROM (SELECT production_line, product,'
+    '             math::min(started_utime) AS started_utime,'
+    '             math::max(ended_utime) AS ended_utime '
+    f'      FROM {WORK_START_END_TABLE} WHERE started_utime AND ended_utime '
+    '      GROUP BY production_line, product) '
+)
+INSERT_PRODUCTION_TIMES = f'INSERT INTO {PRODUCTION_TIMES_TABLE} (' + GET_PRODUCTION_TIMES + ');'
+
 GET_PRODUCT_INFO = (
     'SELECT *, '
     '       ->COMPRISED_OF->PRODUCT AS parts ,'
     '       <-USED_TO_PRODUCE<-RAW_MATERIAL AS raw_materials '
     'FROM PRODUCT; '
 )
+
+# 集計テーブル {集計テーブル名: 集計テーブル生成 SurrealQL}
+SUMMARY_TABLES = {
+    WORK_HISTORIES_TABLE: INSERT_WORK_HISTORIES,
+    TRANSFER_WORK_HISTORIES_TABLE: INSERT_TRANSFER_WORK_HISTORIES,
+    MEASUREMENTS_VALUE_TABLE: INSERT_MEASUREMENTS_VALUE,
+    WORK_START_END_TABLE: INSERT_WORK_START_END,
+    # WORK_START_END_TABLE から集計するため WORK_START_END_TABLE の後に生成する
+    PRODUCTION_TIMES_TABLE: INSERT_PRODUCTION_TIMES,
+}
+
+GET_SUMMARY_TABLES_STATUS = f'SELECT tables FROM {SUMMARY_TABLES_STATUS_TABLE}:{SUMMARY_TABLES_STATUS_ID};'
+DELETE_SUMMARY_TABLES_STATUS = f'DELETE {SUMMARY_TABLES_STATUS_TABLE}:{SUMMARY_TABLES_STATUS_ID};'
+# データ変更の検出 (インポータがインポート開始時に削除し、集計テーブル生成後に更新日時を登録する)
+GET_SUMMARY_TABLES_REFRESHED = f'SELECT refreshed FROM {SUMMARY_TABLES_STATUS_TABLE}:{SUMMARY_TABLES_STATUS_ID};'
+
+# 集計テーブル検索 (各 GET_* と同じ項目、同じ順序で返す)
+GET_PRODUCTION_HISTORIES_FROM_SUMMARY = (
+    'SELECT work_id, machines, working_teams, parts, raw_materials, production_line, product, '
+    'started, ended, inspection, defect '
+    f'FROM {WORK_HISTORIES_TABLE}'
+)
+
+GET_TRANSFER_WORK_HISTORIES_FROM_SUMMARY = (
+    'SELECT work_id, product, to_id, from_id, timestamp, timestamp_utime '
+    f'FROM {TRANSFER_WORK_HISTORIES_TABLE} '
+    'ORDER BY product, timestamp '
+)
+
+GET_MEASUREMENTS_VALUE_FROM_SUMMARY = (
+    'SELECT production_line, machine, value, timestamp '
+    f'FROM {MEASUREMENTS_VALUE_TABLE}'
+)
+
+GET_PRODUCTION_WORK_HISTORIES_FROM_SUMMARY = (
+    'SELECT production_line, work_id, product, product_status, started, ended, started_utime, ended_utime, '
+    'inspection_result '
+    f'FROM {WORK_START_END_TABLE} '
+    'ORDER BY production_line, started '
+)
+
+# 仕掛品毎の先頭工程の作業開始から最終工程の作業終了までの製造時間(秒) (集計テーブル検索)
+# 先頭工程、最終工程の製造ライン識別子は バインド変数 $first_process, $last_process で指定する
+# (先頭工程と最終工程が同じ場合は製造ラインの作業時間)
+GET_PRODUCTION_LEAD_TIMES_FROM_SUMMARY = (
+    'SELECT product, started_utime, ended_utime, ended_utime - started_utime AS lead_time '
+    'FROM (SELECT product, started_utime,'
+    f'             (SELECT VALUE ended_utime FROM {PRODUCTION_TIMES_TABLE} '
+    '              WHERE production_line = $last_process AND product = $parent.product)[0] AS ended_utime '
+    f'      FROM {PRODUCTION_TIMES_TABLE} WHERE production_line = $first_process) '
+    'WHERE ended_utime '
+    'ORDER BY product '
+)
+# GET_PRODUCTION_LEAD_TIMES_FROM_SUMMARY のバインド変数名
+PARAM_FIRST_PROCESS = 'first_process'
+PARAM_LAST_PROCESS = 'last_process'
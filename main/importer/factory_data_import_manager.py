@@ -1,19 +1,468 @@
 import asyncio
 import datetime
+import hashlib
+import os
 import sys
 import traceback
+from functools import partial
+from typing import List, Optional, Callable, Awaitable, Any
 
 import util
 from arguments_parser import Params, parse
+from helper.connection_pool import DEFAULT_POOL_SIZE
 from helper.db_helper import DBHelper
+from helper.retry_policy import RetryPolicy
 from importer.factory_data_reader import FactoryDataReader
+from importer.import_checkpoint import ImportCheckpoint
+from importer.import_metrics import ImportMetrics
+from importer.schema_definition import define_schema
+from importer.import_manifest import ImportManifest
+from importer.summary_tables import invalidate_summary_tables, refresh_summary_tables
+from simulator.factory_models import ANode, Relationship, Factory
+
+# 登録対象ノード (Factory 属性名, 登録件数メッセージ, 登録データ取得関数)
+FACTORY_NODE_TABLES = [
+    # 製造ライン
+    ('production_lines', 'production lines were created.', None),
+    # 貯蔵庫
+    ('storages', 'storages were created.', None),
+    # 製造ライン機器
+    ('machines', 'machines were created.', lambda machine: {}),
+    # 作業班
+    ('operating_crews', 'operation crews were created.', None),
+    # 原材料
+    ('raw_materials', 'raw materials were created.', None),
+    # 仕掛品・部品・製品
+    ('products', 'products were created.', None),
+    # 作業
+    ('works', 'works were created.', None),
+    # 検査結果
+    ('inspection_results', 'Inspection results were created.', None),
+    # 欠陥情報
+    ('defect_information', 'defect information were created.', None),
+    # 測定情報
+    ('measurement_messages', 'measurements information were created. ', None),
+]
+
+# 関係登録件数メッセージ
+RELATIONSHIPS_MESSAGE = 'relationships were created.'
+
+# チェックポイントファイル拡張子
+CHECKPOINT_FILE_EXTENSION = '.checkpoint'
+
+
+async def execute_requests(
+        requests: List[Callable[[], Awaitable[Any]]],
+        semaphore: Optional[asyncio.BoundedSemaphore] = None,
+) -> None:
+    """
+    リクエスト実行
+    semaphore が指定された場合は同時実行数を semaphore で制限して並行に実行する
+    :param requests: リクエスト群
+    :param semaphore: 同時実行数制御セマフォ (省略時 逐次実行)
+    :return:
+    """
+    if not semaphore:
+        for request in requests:
+            await request()
+        return
+
+    async def _execute(request: Callable[[], Awaitable[Any]]) -> None:
+        async with semaphore:
+            await request()
+
+    await asyncio.gather(*[_execute(request) for request in requests])
+
+
+def checkpointed_request(
+        request: Callable[[], Awaitable[Any]],
+        checkpoint: ImportCheckpoint,
+        key: str,
+) -> Callable[[], Awaitable[Any]]:
+    """
+    リクエストの完了をチェックポイントへ記録するリクエストを生成する
+    :param request: リクエスト
+    :param checkpoint: インポート チェックポイント
+    :param key: バッチ識別子
+    :return: リクエスト
+    """
+
+    async def _request() -> Any:
+        response = await request()
+        checkpoint.complete(key)
+        return response
+
+    return _request
+
+
+def tracked_request(
+        request: Callable[[], Awaitable[Any]],
+        metrics: ImportMetrics,
+        table: str,
+        records: int,
+) -> Callable[[], Awaitable[Any]]:
+    """
+    リクエストの完了をインポート統計へ記録するリクエストを生成する
+    :param request: リクエスト
+    :param metrics: インポート統計
+    :param table: テーブル名 または 関係名
+    :param records: リクエストで登録するレコード数
+    :return: リクエスト
+    """
+
+    async def _request() -> Any:
+        response = await request()
+        metrics.complete(table=table, records=records)
+        return response
+
+    return _request
+
+
+def get_edge_ids(
+        relationships: List[Relationship],
+        key_prefix: str = '',
+) -> List[str]:
+    """
+    関係レコード識別子生成
+    再開時に同じ関係を同じ識別子で置き換えられるよう (FROM, 関係, TO, 出現順) から決定的に生成する
+    (工場構成の関係のタイムスタンプは読み込み毎に変わるため識別子に含めない)
+    :param relationships: 関係群
+    :param key_prefix: 識別子接頭辞 (分割読み込み時のチャンク番号)
+    :return: 関係レコード識別子群
+    """
+    occurrences: {str, int} = {}
+    edge_ids = []
+    for relationship in relationships:
+        edge = f'{key_prefix}{relationship.from_id}|{relationship.relationship}|{relationship.to_id}'
+        occurrence = occurrences.get(edge, 0)
+        occurrences[edge] = occurrence + 1
+        edge_ids.append('r' + hashlib.sha1(f'{edge}|{occurrence}'.encode('utf-8')).hexdigest())
+    return edge_ids
+
+
+async def create_nodes(
+        client: DBHelper,
+        nodes: List[ANode],
+        batch_size: int = 0,
+        get_data: Optional[Callable[[ANode], dict]] = None,
+        semaphore: Optional[asyncio.BoundedSemaphore] = None,
+        checkpoint: Optional[ImportCheckpoint] = None,
+        key_prefix: str = '',
+        upsert: bool = False,
+        metrics: Optional[ImportMetrics] = None,
+) -> None:
+    """
+    ノード登録
+    batch_size が1以上の場合は batch_size 件毎に INSERT 文で一括登録する
+    :param client: SurrealDBヘルパ
+    :param nodes: 登録ノード群
+    :param batch_size: 1リクエストで登録するレコード数 (0: 1レコード毎に登録)
+    :param get_data: 登録データ取得関数 (省略時 ANode.get_dict)
+    :param semaphore: 同時実行数制御セマフォ (省略時 逐次実行)
+    :param checkpoint: インポート チェックポイント (省略時 記録しない) batch_size が1以上の場合のみ有効
+    :param key_prefix: バッチ識別子接頭辞
+    :param upsert: True: 登録済みのレコードを置き換える
+    :param metrics: インポート統計 (省略時 集計しない)
+    :return:
+    """
+    get_data = get_data if get_data else (lambda node: node.get_dict())
+    requests = []
+    if batch_size <= 0:
+        for node in nodes:
+            request = partial(
+                client.upsert_one if upsert else client.create_one,
+                table=node.table,
+                id=node.id,
+                data=get_data(node),
+                stats=metrics.get(node.table) if metrics else None)
+            requests.append(tracked_request(request, metrics, node.table, 1) if metrics else request)
+    else:
+        tables: {str, List[ANode]} = {}
+        for node in nodes:
+            tables.setdefault(node.table, []).append(node)
+        for table, table_nodes in tables.items():
+            for i, chunk in enumerate(util.chunks(table_nodes, batch_size)):
+                key = f'{key_prefix}{table}:{i}'
+                if checkpoint and checkpoint.is_completed(key):
+                    continue
+                request = partial(
+                    client.upsert_many if upsert else client.insert_many,
+                    table=table,
+                    records=[{**get_data(node), 'id': node.id} for node in chunk],
+                    stats=metrics.get(table) if metrics else None)
+                request = tracked_request(request, metrics, table, len(chunk)) if metrics else request
+                requests.append(checkpointed_request(request, checkpoint, key) if checkpoint else request)
+    await execute_requests(requests=requests, semaphore=semaphore)
+
+
+async def create_relationships(
+        client: DBHelper,
+        relationships: List[Relationship],
+        batch_size: int = 0,
+        semaphore: Optional[asyncio.BoundedSemaphore] = None,
+        checkpoint: Optional[ImportCheckpoint] = None,
+        key_prefix: str = '',
+        upsert: bool = False,
+        metrics: Optional[ImportMetrics] = None,
+) -> None:
+    """
+    関係登録
+    batch_size が1以上の場合は関係毎に集約し、batch_size 件毎に1トランザクションで一括登録する
+    :param client: SurrealDBヘルパ
+    :param relationships: 登録関係群
+    :param batch_size: 1リクエストで登録する関係数 (0: 1関係毎に登録)
+    :param semaphore: 同時実行数制御セマフォ (省略時 逐次実行)
+    :param checkpoint: インポート チェックポイント (省略時 記録しない) batch_size が1以上の場合のみ有効
+                       記録する場合は関係レコード識別子を決定的に割り当てる
+    :param key_prefix: バッチ識別子接頭辞
+    :param upsert: True: 登録済みの関係を置き換える
+    :param metrics: インポート統計 (省略時 集計しない)
+    :return:
+    """
+    requests = []
+    if batch_size <= 0:
+        # 置き換える場合は関係レコード識別子を決定的に割り当てる
+        edge_ids = get_edge_ids(relationships=relationships, key_prefix=key_prefix) \
+            if upsert else [None] * len(relationships)
+        for relationship, edge_id in zip(relationships, edge_ids):
+            request = partial(
+                client.relate,
+                from_id=relationship.from_id,
+                to_id=relationship.to_id,
+                relation=relationship.relationship,
+                timestamp=util.to_iso88601_datatime(relationship.timestamp),
+                edge_id=edge_id,
+                replace=upsert,
+                stats=metrics.get(relationship.relationship) if metrics else None,
+            )
+            requests.append(tracked_request(request, metrics, relationship.relationship, 1) if metrics else request)
+    else:
+        edge_ids = get_edge_ids(relationships=relationships, key_prefix=key_prefix) \
+            if checkpoint else [None] * len(relationships)
+        relations: {str, List[(Relationship, Optional[str])]} = {}
+        for relationship, edge_id in zip(relationships, edge_ids):
+            relations.setdefault(relationship.relationship, []).append((relationship, edge_id))
+        for relation, relation_relationships in relations.items():
+            for i, chunk in enumerate(util.chunks(relation_relationships, batch_size)):
+                key = f'{key_prefix}{relation}:{i}'
+                if checkpoint and checkpoint.is_completed(key):
+                    continue
+                request = partial(
+                    client.relate_many,
+                    relation=relation,
+                    edges=[(relationship.from_id,
+                            relationship.to_id,
+                            util.to_iso88601_datatime(relationship.timestamp),
+                            edge_id) for relationship, edge_id in chunk],
+                    replace=upsert,
+                    stats=metrics.get(relation) if metrics else None)
+                request = tracked_request(request, metrics, relation, len(chunk)) if metrics else request
+                requests.append(checkpointed_request(request, checkpoint, key) if checkpoint else request)
+    await execute_requests(requests=requests, semaphore=semaphore)
+
+
+async def import_factory(
+        client: DBHelper,
+        factory: Factory,
+        batch_size: int = 0,
+        semaphore: Optional[asyncio.BoundedSemaphore] = None,
+        with_factory: bool = True,
+        verbose: bool = True,
+        checkpoint: Optional[ImportCheckpoint] = None,
+        key_prefix: str = '',
+        upsert: bool = False,
+        metrics: Optional[ImportMetrics] = None,
+) -> None:
+    """
+    工場情報登録
+    全ノードの登録完了後に関係を登録する
+    :param client: SurrealDBヘルパ
+    :param factory: 工場情報
+    :param batch_size: 1リクエストで登録するレコード数 (0: 1レコード毎に登録)
+    :param semaphore: 同時実行数制御セマフォ (省略時 逐次実行)
+    :param with_factory: True: 工場ノードを登録する
+    :param verbose: True: テーブル毎の登録件数を表示する
+    :param checkpoint: インポート チェックポイント (省略時 記録しない)
+    :param key_prefix: バッチ識別子接頭辞
+    :param upsert: True: 登録済みのレコードを置き換える
+    :param metrics: インポート統計 (省略時 集計しない)
+    :return:
+    """
+
+    async def _create_nodes(
+            nodes: List[ANode],
+            message: Optional[str] = None,
+            get_data: Optional[Callable[[ANode], dict]] = None,
+    ) -> None:
+        await create_nodes(
+            client=client,
+            nodes=nodes,
+            batch_size=batch_size,
+            get_data=get_data,
+            semaphore=semaphore,
+            checkpoint=checkpoint,
+            key_prefix=key_prefix,
+            upsert=upsert,
+            metrics=metrics)
+        if message and verbose:
+            print(f'{len(nodes)} {message}')
+
+    # 工場登録
+    node_tables = [partial(_create_nodes, nodes=[factory])] if with_factory else []
+    for attribute, message, get_data in FACTORY_NODE_TABLES:
+        node_tables.append(partial(_create_nodes, nodes=getattr(factory, attribute), message=message, get_data=get_data))
+    if semaphore:
+        # 全ノードテーブルを並行に登録する
+        await asyncio.gather(*[node_table() for node_table in node_tables])
+    else:
+        for node_table in node_tables:
+            await node_table()
+
+    # 関係登録 (関係が参照するノードの登録完了後に実行する)
+    await create_relationships(
+        client=client,
+        relationships=factory.relationships,
+        batch_size=batch_size,
+        semaphore=semaphore,
+        checkpoint=checkpoint,
+        key_prefix=key_prefix,
+        upsert=upsert,
+        metrics=metrics)
+    if verbose:
+        print(f'{len(factory.relationships)} {RELATIONSHIPS_MESSAGE}')
+
+
+def create_checkpoint(param: Params) -> Optional[ImportCheckpoint]:
+    """
+    インポート チェックポイント生成
+    バッチ単位で登録する場合 (batch_size が1以上) のみ生成する
+    :param param: 引数
+    :return: インポート チェックポイント (バッチ単位で登録しない場合 None)
+    """
+    if param.delta:
+        if param.resume:
+            print('--resume was ignored because --delta skips records that were already imported.')
+        return None
+    if param.batch_size <= 0:
+        if param.resume:
+            print('--resume was ignored because it requires --batch-size.')
+        return None
+    stat = os.stat(param.json_file)
+    fingerprint = {
+        'json_file': os.path.abspath(param.json_file),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'batch_size': param.batch_size,
+        'chunk_size': param.chunk_size,
+    }
+    return ImportCheckpoint(
+        checkpoint_file_path=param.json_file + CHECKPOINT_FILE_EXTENSION,
+        fingerprint=fingerprint,
+        resume=param.resume)
+
+
+def finish_checkpoint(
+        checkpoint: Optional[ImportCheckpoint],
+        completed: bool,
+) -> None:
+    """
+    インポート チェックポイント終了
+    :param checkpoint: インポート チェックポイント
+    :param completed: True: インポート完了 (チェックポイントファイルを削除する)
+    :return:
+    """
+    if not checkpoint:
+        return
+    if completed:
+        if checkpoint.skipped > 0:
+            print(f'{checkpoint.skipped} completed batches were skipped.')
+        checkpoint.finish()
+    else:
+        checkpoint.close()
+        print('Import was interrupted. Run the same command with --resume to continue importing.')
+
+
+async def create_manifest(
+        param: Params,
+        client: DBHelper,
+) -> Optional[ImportManifest]:
+    """
+    インポート済み識別子生成
+    差分インポートの場合はマニフェストファイル (指定時) または SurrealDB から登録済みの識別子を取得する
+    :param param: 引数
+    :param client: SurrealDBヘルパ
+    :return: インポート済み識別子 (差分インポートせず、マニフェストファイルも指定されない場合 None)
+    """
+    if param.delta:
+        manifest = ImportManifest.load(manifest_file_path=param.manifest) if param.manifest \
+            else await ImportManifest.from_db(client=client)
+        print(f'{len(manifest.node_ids)} nodes and {sum(manifest.relationships.values())} relationships '
+              f'were already imported.')
+        return manifest
+    return ImportManifest() if param.manifest else None
+
+
+def finish_manifest(
+        param: Params,
+        manifest: Optional[ImportManifest],
+) -> None:
+    """
+    インポート済み識別子終了
+    差分インポートの場合はスキップ件数を表示し、マニフェストファイルが指定された場合は保存する
+    :param param: 引数
+    :param manifest: インポート済み識別子
+    :return:
+    """
+    if not manifest:
+        return
+    if param.delta:
+        print(f'{manifest.skipped_nodes} nodes and {manifest.skipped_relationships} relationships '
+              f'were skipped because they were already imported.')
+    if param.manifest:
+        manifest.save(manifest_file_path=param.manifest)
+
+
+def finish_metrics(
+        param: Params,
+        metrics: Optional[ImportMetrics],
+) -> None:
+    """
+    インポート統計終了
+    テーブル毎の統計を表示し、統計ファイルが指定された場合は出力する
+    :param param: 引数
+    :param metrics: インポート統計
+    :return:
+    """
+    if not metrics:
+        return
+    metrics.close()
+    metrics.print_summary()
+    if param.metrics_file:
+        metrics.save(metrics_file_path=param.metrics_file)
+
+
+def count_records(
+        factory: Factory,
+        with_factory: bool = True,
+) -> int:
+    """
+    登録するレコード数 (ノード数と関係数の合計)
+    :param factory: 工場情報
+    :param with_factory: True: 工場ノードを含める
+    :return: レコード数
+    """
+    nodes = sum(len(getattr(factory, attribute)) for attribute, _, _ in FACTORY_NODE_TABLES)
+    return nodes + len(factory.relationships) + (1 if with_factory else 0)
 
 
 async def import_factory_data(
         param: Params,
         factory_data_reader: FactoryDataReader
 ):
-    factory = factory_data_reader.factory
+    # 同時実行数が1の場合は従来通り逐次実行する
+    semaphore = asyncio.BoundedSemaphore(param.concurrency) if param.concurrency > 1 else None
+    checkpoint = create_checkpoint(param=param)
+    metrics: Optional[ImportMetrics] = None
     try:
         with DBHelper(
                 url=param.url,
@@ -21,116 +470,121 @@ async def import_factory_data(
                 password=param.pw,
                 database=param.database,
                 namespace=param.namespace,
+                pool_size=max(param.concurrency, DEFAULT_POOL_SIZE),
+                retry_policy=RetryPolicy(max_retries=param.max_retries),
+                rate_limit=param.rate_limit,
+                transport=param.transport,
         ) as client:
-            # 工場登録
-            response = await client.create_one(
-                table=factory.table,
-                id=factory.id,
-                data=factory.get_dict())
-
-            # 製造ライン登録
-            for line in factory.production_lines:
-                response = await client.create_one(
-                    table=line.table,
-                    id=line.id,
-                    data=line.get_dict())
-            print(f'{len(factory.production_lines)} production lines were created.')
-
-            # 貯蔵庫登録
-            for storage in factory.storages:
-                response = await client.create_one(
-                    table=storage.table,
-                    id=storage.id,
-                    data=storage.get_dict())
-            print(f'{len(factory.storages)} storages were created.')
-
-            # 製造ライン機器登録
-            for machine in factory.machines:
-                response = await client.create_one(
-                    table=machine.table,
-                    id=machine.id,
-                    data={}
-                )
-                # data=machine.get_dict())
-            print(f'{len(factory.machines)} machines were created.')
-
-            # 作業班登録
-            for group in factory.operating_crews:
-                response = await client.create_one(
-                    table=group.table,
-                    id=group.id,
-                    data=group.get_dict())
-            print(f'{len(factory.operating_crews)} operation crews were created.')
-            # 原材料登録
-            for raw_material in factory.raw_materials:
-                response = await client.create_one(
-                    table=raw_material.table,
-                    id=raw_material.id,
-                    data=raw_material.get_dict())
-            print(f'{len(factory.raw_materials)} raw materials were created.')
-
-            # 仕掛品・部品・製品登録
-            for product in factory.products:
-                response = await client.create_one(
-                    table=product.table,
-                    id=product.id,
-                    data=product.get_dict())
-            print(f'{len(factory.products)} products were created.')
-
-            # 作業登録
-            for work in factory.works:
-                response = await client.create_one(
-                    table=work.table,
-                    id=work.id,
-                    data=work.get_dict())
-            print(f'{len(factory.works)} works were created.')
-
-            # 検査結果登録
-            for inspection_result in factory.inspection_results:
-                response = await client.create_one(
-                    table=inspection_result.table,
-                    id=inspection_result.id,
-                    data=inspection_result.get_dict())
-            print(f'{len(factory.inspection_results)} Inspection results were created.')
-
-            # 欠陥情報登録
-            for defect_info in factory.defect_information:
-                response = await client.create_one(
-                    table=defect_info.table,
-                    id=defect_info.id,
-                    data=defect_info.get_dict())
-            print(f'{len(factory.defect_information)} defect information were created.')
-
-            for measurement in factory.measurement_messages:
-                response = await client.create_one(
-                    table=measurement.table,
-                    id=measurement.id,
-                    data=measurement.get_dict())
-            print(f'{len(factory.measurement_messages)} measurements information were created. ')
-
-            # 関係登録
-            for relationship in factory.relationships:
-                response = await client.relate(
-                    from_id=relationship.from_id,
-                    to_id=relationship.to_id,
-                    relation=relationship.relationship,
-                    timestamp=util.to_iso88601_datatime(relationship.timestamp),
-                )
-            print(f'{len(factory.relationships)} relationships were created.')
+            factory = factory_data_reader.factory
+            if not param.skip_schema:
+                await define_schema(client=client)
+            manifest = await create_manifest(param=param, client=client)
+            await invalidate_summary_tables(client=client)
+            with_factory = not manifest or not manifest.contains_node(factory)
+            factory = manifest.extract_new(factory) if manifest else factory
+            metrics = ImportMetrics(total=count_records(factory=factory, with_factory=with_factory))
+            await import_factory(
+                client=client,
+                factory=factory,
+                batch_size=param.batch_size,
+                semaphore=semaphore,
+                with_factory=with_factory,
+                checkpoint=checkpoint,
+                upsert=param.resume,
+                metrics=metrics)
+            metrics.close()
+            if not param.skip_summary:
+                await refresh_summary_tables(client=client)
+        finish_metrics(param=param, metrics=metrics)
+        finish_checkpoint(checkpoint=checkpoint, completed=True)
+        finish_manifest(param=param, manifest=manifest)
+
+    except Exception as e:
+        traceback.print_exc()
+        finish_metrics(param=param, metrics=metrics)
+        finish_checkpoint(checkpoint=checkpoint, completed=False)
+        raise RuntimeError(f'Exception was occurred. ({e})')
+
+
+async def import_factory_data_in_chunks(
+        param: Params,
+        factory_data_reader: FactoryDataReader
+):
+    """
+    工場情報をファイルから逐次読み込みながら登録する
+    :param param: 引数
+    :param factory_data_reader: 工場情報読み込み
+    :return:
+    """
+    semaphore = asyncio.BoundedSemaphore(param.concurrency) if param.concurrency > 1 else None
+    counts = {attribute: 0 for attribute, _, _ in FACTORY_NODE_TABLES}
+    relationships_count = 0
+    checkpoint = create_checkpoint(param=param)
+    # 分割読み込みでは登録予定のレコード数は不明
+    metrics = ImportMetrics()
+    try:
+        with DBHelper(
+                url=param.url,
+                username=param.user,
+                password=param.pw,
+                database=param.database,
+                namespace=param.namespace,
+                pool_size=max(param.concurrency, DEFAULT_POOL_SIZE),
+                retry_policy=RetryPolicy(max_retries=param.max_retries),
+                rate_limit=param.rate_limit,
+                transport=param.transport,
+        ) as client:
+            if not param.skip_schema:
+                await define_schema(client=client)
+            manifest = await create_manifest(param=param, client=client)
+            await invalidate_summary_tables(client=client)
+            for i, chunk in enumerate(factory_data_reader.iter_chunks(chunk_size=param.chunk_size)):
+                with_factory = i == 0 and (not manifest or not manifest.contains_node(chunk))
+                chunk = manifest.extract_new(chunk) if manifest else chunk
+                await import_factory(
+                    client=client,
+                    factory=chunk,
+                    batch_size=param.batch_size,
+                    semaphore=semaphore,
+                    with_factory=with_factory,
+                    verbose=False,
+                    checkpoint=checkpoint,
+                    key_prefix=f'{i}:',
+                    upsert=param.resume,
+                    metrics=metrics)
+                for attribute in counts.keys():
+                    counts[attribute] += len(getattr(chunk, attribute))
+                relationships_count += len(chunk.relationships)
+            metrics.close()
+            if not param.skip_summary:
+                await refresh_summary_tables(client=client)
+
+        for attribute, message, _ in FACTORY_NODE_TABLES:
+            print(f'{counts[attribute]} {message}')
+        print(f'{relationships_count} {RELATIONSHIPS_MESSAGE}')
+        finish_metrics(param=param, metrics=metrics)
+        finish_checkpoint(checkpoint=checkpoint, completed=True)
+        finish_manifest(param=param, manifest=manifest)
 
     except Exception as e:
         traceback.print_exc()
+        finish_metrics(param=param, metrics=metrics)
+        finish_checkpoint(checkpoint=checkpoint, completed=False)
         raise RuntimeError(f'Exception was occurred. ({e})')
 
 
 def main(params: Params):
     try:
         data_reader = FactoryDataReader(json_data_file_path=params.json_file)
-        data_reader.rebuild()
+        if params.chunk_size <= 0:
+            data_reader.rebuild(workers=params.workers)
         # 工場データをSurrealDBへ移入する
         s = datetime.datetime.now()
         print(f'{s.isoformat()}: started importing factory data into SurrealDB.')
-        asyncio.run(import_factory_data(param=params, factory_data_reader=data_reader))
+        if params.chunk_size > 0:
+            asyncio.run(import_factory_data_in_chunks(param=params, factory_data_reader=data_reader))
+        else:
+            asyncio.run(import_factory_data(param=params, factory_data_reader=data_reader))
         e = datetime.datetime.now()
         print(f'{e.isoformat()}: finished importing factory data into SurrealDB. elapsed time: {e - s}')
     except Exception as e:
@@ -1,9 +1,22 @@
 import json
+from concurrent.futures import ProcessPoolExecutor
 from os import path
-from typing import Optional
+from typing import Optional, Iterator, List, Tuple, Any
 
+from importer.json_stream_reader import JsonStreamReader
+from simulator import factory_data_arrow
 from simulator.factory_model_builder import FactoryModelBuilder
-from simulator.factory_models import Factory, FactoryRelationship, OperationType, FactoryNodeTable, WorkType
+from simulator.factory_models import Factory, FactoryRelationship, OperationType, FactoryNodeTable, WorkType, \
+    ProductionEventMessage
+
+# 分割読み込み時に1回で返すメッセージ数(デフォルト)
+DEFAULT_CHUNK_SIZE = 10000
+
+# 並行再構築時の1プロセスあたりの作業履歴分割数
+PARTS_PER_WORKER = 4
+
+# 移動作業を生成する工程 (work_type)
+TRANSFER_OPERATION_TYPES = (OperationType.PUT_IN.value, OperationType.PUT_OUT.value)
 
 
 class FactoryDataReader:
@@ -23,55 +36,273 @@ class FactoryDataReader:
         if not path.isfile(self._json_data_file_path):
             raise RuntimeError(f'File not found. ({self._json_data_file_path})')
 
-    def rebuild(self) -> None:
-        with open(self._json_data_file_path, 'r', encoding='utf-8') as f:
-            factory_json_data = json.load(f)
+    def rebuild(
+            self,
+            workers: int = 1,
+    ) -> None:
+        """
+        工場シミュレーション結果情報をファイルから読み込み、工場情報を再構築する
+        作業履歴からの作業情報・関係の生成は作業履歴単位で分割できるため、
+        workers が2以上の場合はプロセスプールで並行に生成する.
+        移動作業の識別子は分割前に各分割の開始番号を決めるため、並行数に関わらず同じになる.
+        :param workers: 関係を生成するプロセス数 (1: 逐次生成)
+        :return:
+        """
+        if factory_data_arrow.is_arrow_file(self._json_data_file_path):
+            factory_json_data = factory_data_arrow.read_factory_data(file_path=self._json_data_file_path)
+        else:
+            with open(self._json_data_file_path, 'r', encoding='utf-8') as f:
+                factory_json_data = json.load(f)
         factory_data = factory_json_data.get('factory', None)
         if not factory_data:
             raise RuntimeError(f'Unable to parse the file contents. ({self._json_data_file_path}) ')
+        production_histories_data = factory_data.get('production_histories', None)
+        measurements_data = factory_data.get('measurements', None)
+        if not (production_histories_data and measurements_data):
+            raise RuntimeError(f'Unable to parse file contents. ({self._json_data_file_path}) ')
+
+        # 工場構成情報生成
+        self.factory = self._build_factory(factory_data=factory_data)
+
+        # 作業履歴から作業情報、工程メッセージ、関係を生成する
+        parts = self._split_production_histories(
+            production_histories=production_histories_data,
+            parts_num=workers * PARTS_PER_WORKER if workers > 1 else 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(FactoryDataReader._build_production_histories, *zip(*parts)))
+        else:
+            results = [self._build_production_histories(*part) for part in parts]
+
+        # 作業履歴情報
+        for histories, _ in results:
+            self._merge(factory=self.factory, part=histories)
+
+        # 製造ライン機器からの測定情報生成
+        for measurement in measurements_data:
+            created_by = measurement.get('created_by', '')
+            for message_data in measurement.get('messages', []):
+                self._build_measurement(factory=self.factory, created_by=created_by, message_data=message_data)
+
+        # 工程作業メッセージから生成した関係
+        for _, relationships in results:
+            self._merge(factory=self.factory, part=relationships)
+
+    @staticmethod
+    def _split_production_histories(
+            production_histories: List[dict],
+            parts_num: int,
+    ) -> List[Tuple[List[dict], int]]:
+        """
+        作業履歴をメッセージ数がほぼ均等になるよう連続した parts_num 個に分割し、
+        各分割の移動作業の開始番号(先行する分割の移動作業数の合計)を求める
+        :param production_histories: 作業履歴群
+        :param parts_num: 分割数
+        :return: (作業履歴群, 生成済み移動作業数) 群
+        """
+        messages_num = sum(len(history.get('messages', [])) for history in production_histories)
+        part_size = max(1, -(-messages_num // max(1, parts_num)))
+        parts = []
+        part: List[dict] = []
+        part_messages_num = 0
+        transfer_message_number = 0
+        part_transfer_message_number = 0
+        for production_history in production_histories:
+            messages = production_history.get('messages', [])
+            part.append(production_history)
+            part_messages_num += len(messages)
+            transfer_message_number += sum(
+                1 for message in messages
+                if message.get('data', {}).get('work_type', None) in TRANSFER_OPERATION_TYPES)
+            if part_messages_num >= part_size:
+                parts.append((part, part_transfer_message_number))
+                part = []
+                part_messages_num = 0
+                part_transfer_message_number = transfer_message_number
+        if len(part) > 0:
+            parts.append((part, part_transfer_message_number))
+        return parts
+
+    @staticmethod
+    def _build_production_histories(
+            production_histories: List[dict],
+            transfer_message_number: int,
+    ) -> Tuple[Factory, Factory]:
+        """
+        作業履歴群から作業情報と工程メッセージ、工程作業メッセージの関係を生成する (プロセスプールから呼び出される)
+        :param production_histories: 作業履歴群
+        :param transfer_message_number: 生成済み移動作業数
+        :return: (作業情報・工程メッセージ, 工程作業メッセージから生成した情報)
+        """
+        histories = FactoryModelBuilder.build_factory(id='', name='')
+        for production_history in production_histories:
+            FactoryDataReader._build_production_history(factory=histories, production_history=production_history)
+        relationships = FactoryModelBuilder.build_factory(id='', name='')
+        for process_message in histories.process_messages:
+            transfer_message_number = FactoryDataReader._build_process_message_relationships(
+                factory=relationships,
+                process_message=process_message,
+                transfer_message_number=transfer_message_number,
+            )
+        return histories, relationships
+
+    @staticmethod
+    def _merge(
+            factory: Factory,
+            part: Factory,
+    ) -> None:
+        """
+        分割して生成した情報を工場情報へ追加する
+        :param factory: 工場情報
+        :param part: 分割して生成した情報
+        :return:
+        """
+        factory.works.extend(part.works)
+        factory.inspection_results.extend(part.inspection_results)
+        factory.defect_information.extend(part.defect_information)
+        factory.process_messages.extend(part.process_messages)
+        factory.relationships.extend(part.relationships)
+
+    def iter_chunks(
+            self,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[Factory]:
+        """
+        工場シミュレーション結果情報をファイルから逐次読み込み、分割して再構築する
+        作業履歴(production_histories)と測定情報(measurements)は1要素ずつ読み込むため、
+        ファイルサイズに関わらず使用メモリは chunk_size に比例する.
+        最初に工場構成情報(製造ライン、貯蔵庫、機器、作業班、原材料、製品)を、
+        以降は作業・測定メッセージ chunk_size 件毎の情報を、それぞれ Factory として返す.
+        :param chunk_size: 1回に返すメッセージ数
+        :return: 分割された工場情報 (generator)
+        """
+        chunk: Optional[Factory] = None
+        messages_num = 0
+        transfer_message_number = 0
+        for kind, value in self._iter_sections():
+            if kind == 'factory':
+                factory = self._build_factory(factory_data=value)
+                yield factory
+                chunk = self._new_chunk(factory=factory)
+            elif kind == 'production_history':
+                # 作業履歴情報生成
+                for process_message in self._build_production_history(
+                        factory=chunk,
+                        production_history=value):
+                    transfer_message_number = self._build_process_message_relationships(
+                        factory=chunk,
+                        process_message=process_message,
+                        transfer_message_number=transfer_message_number,
+                    )
+                    messages_num += 1
+            else:
+                # 製造ライン機器からの測定情報生成
+                created_by, message_data = value
+                self._build_measurement(factory=chunk, created_by=created_by, message_data=message_data)
+                messages_num += 1
+            if messages_num >= chunk_size:
+                chunk.process_messages.clear()
+                yield chunk
+                chunk = self._new_chunk(factory=chunk)
+                messages_num = 0
+        if not chunk:
+            raise RuntimeError(f'Unable to parse file contents. ({self._json_data_file_path}) ')
+        chunk.process_messages.clear()
+        if messages_num > 0:
+            yield chunk
+
+    def _iter_sections(self) -> Iterator[Tuple[str, Any]]:
+        """
+        ファイルから工場情報を先頭から順に読み込む
+        :return: ('factory', 工場構成情報),
+                 ('production_history', 作業履歴), ('measurement', (測定情報作成元識別子, 測定情報)) (generator)
+        """
+        if factory_data_arrow.is_arrow_file(self._json_data_file_path):
+            yield from factory_data_arrow.iter_factory_data(file_path=self._json_data_file_path)
+            return
+
+        with open(self._json_data_file_path, 'r', encoding='utf-8') as f:
+            reader = JsonStreamReader(file=f)
+            for key in reader.iter_object():
+                if key != 'factory':
+                    reader.read_value()
+                    continue
+                factory_data = {}
+                factory_data_read = False
+                for name in reader.iter_object():
+                    if name not in ('production_histories', 'measurements'):
+                        factory_data[name] = reader.read_value()
+                        continue
+                    if not factory_data_read:
+                        # 工場構成情報は作業履歴・測定情報より前に格納されている
+                        yield 'factory', factory_data
+                        factory_data_read = True
+
+                    if name == 'production_histories':
+                        for production_history in reader.iter_array():
+                            yield 'production_history', production_history
+                    else:
+                        for element in reader.iter_array_elements():
+                            created_by = ''
+                            for member in element.iter_object():
+                                if member == 'created_by':
+                                    created_by = element.read_value()
+                                elif member == 'messages':
+                                    for message_data in element.iter_array():
+                                        yield 'measurement', (created_by, message_data)
+                                else:
+                                    element.read_value()
+
+    def _build_factory(
+            self,
+            factory_data: {},
+    ) -> Factory:
+        """
+        工場構成情報(製造ライン、貯蔵庫、機器、作業班、原材料、製品)生成
+        :param factory_data: 工場情報
+        :return: 工場情報
+        """
         production_lines_data = factory_data.get('production_lines', None)
         machines_data = factory_data.get('machines', None)
         storages_data = factory_data.get('storages', None)
         raw_materials_data = factory_data.get('raw_materials', None)
         operating_crews_data = factory_data.get('operating_crews', None)
         products_data = factory_data.get('products', None)
-        production_histories_data = factory_data.get('production_histories', None)
-        measurements_data = factory_data.get('measurements', None)
         if not (production_lines_data and machines_data and storages_data and raw_materials_data
-                and production_histories_data and operating_crews_data and products_data and measurements_data):
+                and operating_crews_data and products_data):
             raise RuntimeError(f'Unable to parse file contents. ({self._json_data_file_path}) ')
 
         # Factory情報生成
-        self.factory = FactoryModelBuilder.build_factory(
+        factory = FactoryModelBuilder.build_factory(
             id=factory_data.get('id', '?'),
             name=factory_data.get('name', '?'))
 
         # 製造ライン機器情報生成
         for machine_data in machines_data:
             machine = FactoryModelBuilder.build_machine_from_dict(source=machine_data)
-            self.factory.machines.append(machine)
+            factory.machines.append(machine)
 
         # 製造ライン情報生成
         for production_line_data in production_lines_data:
             production_line = FactoryModelBuilder.build_production_line_from_dict(
                 source=production_line_data,
-                all_machines=self.factory.machines)
-            self.factory.production_lines.append(production_line)
+                all_machines=factory.machines)
+            factory.production_lines.append(production_line)
             # (Factory)-[CONSISTS_OF]->(ProductionLine)
-            self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                from_id=self.factory.get_compound_id(),
+            factory.relationships.append(FactoryModelBuilder.build_relationship(
+                from_id=factory.get_compound_id(),
                 to_id=production_line.get_compound_id(),
                 relationship=FactoryRelationship.CONSISTS_OF,
             ))
             # (ProductionLine)-[CONSISTS_OF]->(Machine)
             for machine in production_line.machines:
-                self.factory.relationships.append(FactoryModelBuilder.build_relationship(
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
                     from_id=production_line.get_compound_id(),
                     to_id=machine.get_compound_id(),
                     relationship=FactoryRelationship.CONSISTS_OF,
                 ))
             # (ProductionLine)-[HAS_WORKERS]->(WorkingGroup)
-            self.factory.relationships.append(FactoryModelBuilder.build_relationship(
+            factory.relationships.append(FactoryModelBuilder.build_relationship(
                 from_id=production_line.get_compound_id(),
                 to_id=production_line.working_group_id,
                 relationship=FactoryRelationship.HAS_WORKERS,
@@ -79,10 +310,10 @@ class FactoryDataReader:
         # 貯蔵庫情報生成
         for storage_data in storages_data:
             storage = FactoryModelBuilder.build_storage_from_dict(source=storage_data)
-            self.factory.storages.append(storage)
+            factory.storages.append(storage)
             # (Factory)-[CONSISTS_OF]->(Storage)
-            self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                from_id=self.factory.get_compound_id(),
+            factory.relationships.append(FactoryModelBuilder.build_relationship(
+                from_id=factory.get_compound_id(),
                 to_id=storage.get_compound_id(),
                 relationship=FactoryRelationship.CONSISTS_OF,
             ))
@@ -90,225 +321,264 @@ class FactoryDataReader:
         # 原材料情報生成
         for raw_material_data in raw_materials_data:
             raw_material = FactoryModelBuilder.build_raw_material_from_dict(source=raw_material_data)
-            self.factory.raw_materials.append(raw_material)
+            factory.raw_materials.append(raw_material)
             # (Factory)-[CONSISTS_OF]->(RawMaterial)
-            self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                from_id=self.factory.get_compound_id(),
+            factory.relationships.append(FactoryModelBuilder.build_relationship(
+                from_id=factory.get_compound_id(),
                 to_id=raw_material.get_compound_id(),
                 relationship=FactoryRelationship.CONSISTS_OF,
             ))
 
         # 作業班情報生成
         for operatio_crew in operating_crews_data:
-            self.factory.operating_crews.append(FactoryModelBuilder.build_operating_crew_from_dict(source=operatio_crew))
+            factory.operating_crews.append(FactoryModelBuilder.build_operating_crew_from_dict(source=operatio_crew))
 
         # 製品・部品・仕掛品情報生成
         for product in products_data:
-            self.factory.products.append(FactoryModelBuilder.build_product_from_dict(source=product))
+            factory.products.append(FactoryModelBuilder.build_product_from_dict(source=product))
+        return factory
 
-        # 作業履歴情報生成
-        for production_history in production_histories_data:
-            created_by = production_history.get('created_by', '?')
-            messages = production_history.get('messages', [])
-            if len(messages) <= 0:
-                continue
-            work_id = messages[0].get('work_id', '?')
-            work = FactoryModelBuilder.build_work(
-                work_id=work_id,
-                name=f'work',
+    @staticmethod
+    def _build_production_history(
+            factory: Factory,
+            production_history: {},
+    ) -> List[ProductionEventMessage]:
+        """
+        作業履歴から作業情報と工程メッセージを生成する
+        :param factory: 生成した情報の格納先
+        :param production_history: 作業履歴
+        :return: 生成された工程メッセージ群
+        """
+        created_by = production_history.get('created_by', '?')
+        messages = production_history.get('messages', [])
+        if len(messages) <= 0:
+            return []
+        work_id = messages[0].get('work_id', '?')
+        work = FactoryModelBuilder.build_work(
+            work_id=work_id,
+            name=f'work',
+            created_by=created_by)
+        factory.works.append(work)
+        # (ProductionLine)-[EXECUTES]->(Work)
+        factory.relationships.append(FactoryModelBuilder.build_relationship(
+            from_id=created_by,
+            to_id=work.get_compound_id(),
+            relationship=FactoryRelationship.EXECUTES,
+        ))
+        process_messages = []
+        for message_data in messages:
+            message = FactoryModelBuilder.build_production_event_message_from_dict(
+                source=message_data,
                 created_by=created_by)
-            self.factory.works.append(work)
-            # (ProductionLine)-[EXECUTES]->(Work)
-            self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                from_id=created_by,
-                to_id=work.get_compound_id(),
-                relationship=FactoryRelationship.EXECUTES,
-            ))
-            messages = production_history.get('messages', [])
-            if len(messages) <= 0:
-                continue
-            for message_data in messages:
-                #print(f'{message_data}')
-                message = FactoryModelBuilder.build_production_event_message_from_dict(
-                    source=message_data,
-                    created_by=created_by)
-                self.factory.process_messages.append(message)
+            process_messages.append(message)
+        factory.process_messages.extend(process_messages)
+        return process_messages
 
-        # 製造ライン機器からの測定情報生成
-        for measurement in measurements_data:
-            created_by = measurement.get('created_by', '')
-            messages = measurement.get('messages', [])
-            for message_data in messages:
-                message = FactoryModelBuilder.build_measurement_message_from_dict(
-                    created_by=created_by,
-                    source=message_data)
-                self.factory.measurement_messages.append(message)
-                # (Machine)-[RECORDS]->(MeasurementMessage)
-                self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                    from_id=created_by,
-                    to_id=message.get_compound_id(),
+    @staticmethod
+    def _build_measurement(
+            factory: Factory,
+            created_by: str,
+            message_data: {},
+    ) -> None:
+        """
+        製造ライン機器からの測定情報生成
+        :param factory: 生成した情報の格納先
+        :param created_by: 測定情報作成元識別子
+        :param message_data: 測定情報
+        :return:
+        """
+        message = FactoryModelBuilder.build_measurement_message_from_dict(
+            created_by=created_by,
+            source=message_data)
+        factory.measurement_messages.append(message)
+        # (Machine)-[RECORDS]->(MeasurementMessage)
+        factory.relationships.append(FactoryModelBuilder.build_relationship(
+            from_id=created_by,
+            to_id=message.get_compound_id(),
+            relationship=FactoryRelationship.RECORDS,
+        ))
+
+    @staticmethod
+    def _build_process_message_relationships(
+            factory: Factory,
+            process_message: ProductionEventMessage,
+            transfer_message_number: int,
+    ) -> int:
+        """
+        工程作業メッセージから関係を生成する
+        :param factory: 生成した情報の格納先
+        :param process_message: 工程作業メッセージ
+        :param transfer_message_number: 生成済み移動作業数
+        :return: 生成済み移動作業数
+        """
+        match process_message.operation_type:
+
+            case OperationType.OPERATION_START:
+                # (PRODUCT)-[STARTED_BY]->(WORK)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.STARTED_BY,
+                ))
+
+            case OperationType.OPERATION_END:
+                # (PRODUCT)-[ENDED_BY]->(WORK)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.ENDED_BY,
+                ))
+
+            case OperationType.CREATED:
+                # (RAW_MATERIAL)-[USED_TO_PRODUCT]->(PRODUCT)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=process_message.product_id,
+                    from_id=process_message.raw_material,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.USED_TO_PRODUCE,
+                ))
+                # (PRODUCT)-[PRODUCED_BY]->(WORK)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.PRODUCED_BY,
+                ))
+
+            case OperationType.INSPECTION:
+                inspection_result_id = f'ir{process_message.id}'
+                inspection_result = FactoryModelBuilder.build_inspection_result(
+                    id=inspection_result_id,
+                    name='Inspection result',
+                    timestamp=process_message.timestamp,
+                    detail=process_message.inspection_result,
+                )
+                factory.inspection_results.append(inspection_result)
+                # (PRODUCT)-[TESTED_BY]->(WORK)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.TESTED_BY,
+                ))
+                # (Work)-[RECORDS]->(InspectionResult)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=inspection_result.get_compound_id(),
+                    from_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    timestamp=process_message.timestamp,
                     relationship=FactoryRelationship.RECORDS,
                 ))
-        #
-        # 工程作業メッセージから関係を生成する
-        transfer_message_number = 0
-        for process_message in self.factory.process_messages:
-            match process_message.operation_type:
-
-                case OperationType.OPERATION_START:
-                    # (PRODUCT)-[STARTED_BY]->(WORK)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.STARTED_BY,
-                    ))
-
-                case OperationType.OPERATION_END:
-                    # (PRODUCT)-[ENDED_BY]->(WORK)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.ENDED_BY,
-                    ))
-
-                case OperationType.CREATED:
-                    # (RAW_MATERIAL)-[USED_TO_PRODUCT]->(PRODUCT)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=process_message.product_id,
-                        from_id=process_message.raw_material,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.USED_TO_PRODUCE,
-                    ))
-                    # (PRODUCT)-[PRODUCED_BY]->(WORK)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.PRODUCED_BY,
-                    ))
-
-                case OperationType.INSPECTION:
-                    inspection_result_id = f'ir{process_message.id}'
-                    inspection_result = FactoryModelBuilder.build_inspection_result(
-                        id=inspection_result_id,
-                        name='Inspection result',
-                        timestamp=process_message.timestamp,
-                        detail=process_message.inspection_result,
-                    )
-                    self.factory.inspection_results.append(inspection_result)
-                    # (PRODUCT)-[TESTED_BY]->(WORK)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.TESTED_BY,
-                    ))
-                    # (Work)-[RECORDS]->(InspectionResult)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=inspection_result.get_compound_id(),
-                        from_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.RECORDS,
-                    ))
-                    # (InspectionResult)-[TEST_RESULT_OF]->(Product)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        from_id=inspection_result.get_compound_id(),
-                        to_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.TEST_RESULT_OF,
-                    ))
-
-                case OperationType.DEFECT_DETECTION:
-                    defect_information_id = f'df{process_message.id}'
-                    defect_info = FactoryModelBuilder.build_defect_information(
-                        id=defect_information_id,
-                        name='Defect information',
-                        timestamp=process_message.timestamp,
-                        detail=process_message.product_defect,
-                    )
-                    self.factory.defect_information.append(defect_info)
-                    # (PRODUCT)-[DEFECT_DETECTED_BY]->(WORK)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.DEFECT_DETECTED_BY,
-                    ))
-
-                    # (Work)-[RECORDS]->(DefectInformation)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=defect_info.get_compound_id(),
-                        from_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.RECORDS,
-                    ))
-                    # (Product)-[HAS_DEFECT]->(DefectInformation)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=defect_info.get_compound_id(),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.HAS_DEFECT,
-                    ))
-
-                case OperationType.ASSEMBLY:
-                    # (Product)-[ASSEMBLED_BY]->(Work)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.ASSEMBLED_BY,
-                    ))
-                    # (Product)-[COMPRISED_OF]->(Parts)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=process_message.parts,
-                        from_id=process_message.product_id,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.COMPRISED_OF,
-                    ))
-
-                case OperationType.FINISHED_PRODUCT:
-                    # TODO この情報が必要か？
-                    pass
-
-                case OperationType.PUT_IN | OperationType.PUT_OUT:
-                    # 移動Work作成
-                    transfer_message_number += 1
-                    transfer_work = FactoryModelBuilder.build_work(
-                        work_id=f'tf{transfer_message_number:08}',
-                        name='transfer work',
-                        created_by=process_message.created_by,
-                        work_type=WorkType.TransferWork,
-                    )
-                    self.factory.works.append(transfer_work)
-                    # PUT_IN:  (Storage)-[MOVE_FROM]->(Work)
-                    # PUT_OUT: (ProductionLine)-[MOVE_FROM]->(Work)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        to_id=transfer_work.get_compound_id(),
-                        from_id=process_message.storage_id \
-                            if process_message.operation_type == OperationType.PUT_IN  else process_message.created_by,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.MOVE_FROM,
-                    ))
-                    # PUT_IN:  (Work)-[MOVE_TO]->(ProductionLine)
-                    # PUT_OUT: (Work)-[MOVE_TO]->(Storage)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        from_id=transfer_work.get_compound_id(),
-                        to_id=process_message.created_by \
-                            if process_message.operation_type==OperationType.PUT_IN else process_message.storage_id ,
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.MOVE_TO,
-                    ))
-                    # (Product)-[MOVED_BY]->(Work)
-                    self.factory.relationships.append(FactoryModelBuilder.build_relationship(
-                        from_id=process_message.product_id,
-                        to_id=transfer_work.get_compound_id(),
-                        timestamp=process_message.timestamp,
-                        relationship=FactoryRelationship.MOVED_BY,
-                    ))
-                case _:
-                    raise RuntimeError(f'Invalid operation type was specified. ({process_message.operation_type.name})')
+                # (InspectionResult)-[TEST_RESULT_OF]->(Product)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    from_id=inspection_result.get_compound_id(),
+                    to_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.TEST_RESULT_OF,
+                ))
+
+            case OperationType.DEFECT_DETECTION:
+                defect_information_id = f'df{process_message.id}'
+                defect_info = FactoryModelBuilder.build_defect_information(
+                    id=defect_information_id,
+                    name='Defect information',
+                    timestamp=process_message.timestamp,
+                    detail=process_message.product_defect,
+                )
+                factory.defect_information.append(defect_info)
+                # (PRODUCT)-[DEFECT_DETECTED_BY]->(WORK)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.DEFECT_DETECTED_BY,
+                ))
+
+                # (Work)-[RECORDS]->(DefectInformation)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=defect_info.get_compound_id(),
+                    from_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.RECORDS,
+                ))
+                # (Product)-[HAS_DEFECT]->(DefectInformation)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=defect_info.get_compound_id(),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.HAS_DEFECT,
+                ))
+
+            case OperationType.ASSEMBLY:
+                # (Product)-[ASSEMBLED_BY]->(Work)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=FactoryDataReader.get_compound_id(FactoryNodeTable.WORK, process_message.work_id),
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.ASSEMBLED_BY,
+                ))
+                # (Product)-[COMPRISED_OF]->(Parts)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=process_message.parts,
+                    from_id=process_message.product_id,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.COMPRISED_OF,
+                ))
+
+            case OperationType.FINISHED_PRODUCT:
+                # TODO この情報が必要か？
+                pass
+
+            case OperationType.PUT_IN | OperationType.PUT_OUT:
+                # 移動Work作成
+                transfer_message_number += 1
+                transfer_work = FactoryModelBuilder.build_work(
+                    work_id=f'tf{transfer_message_number:08}',
+                    name='transfer work',
+                    created_by=process_message.created_by,
+                    work_type=WorkType.TransferWork,
+                )
+                factory.works.append(transfer_work)
+                # PUT_IN:  (Storage)-[MOVE_FROM]->(Work)
+                # PUT_OUT: (ProductionLine)-[MOVE_FROM]->(Work)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    to_id=transfer_work.get_compound_id(),
+                    from_id=process_message.storage_id \
+                        if process_message.operation_type == OperationType.PUT_IN  else process_message.created_by,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.MOVE_FROM,
+                ))
+                # PUT_IN:  (Work)-[MOVE_TO]->(ProductionLine)
+                # PUT_OUT: (Work)-[MOVE_TO]->(Storage)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    from_id=transfer_work.get_compound_id(),
+                    to_id=process_message.created_by \
+                        if process_message.operation_type==OperationType.PUT_IN else process_message.storage_id ,
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.MOVE_TO,
+                ))
+                # (Product)-[MOVED_BY]->(Work)
+                factory.relationships.append(FactoryModelBuilder.build_relationship(
+                    from_id=process_message.product_id,
+                    to_id=transfer_work.get_compound_id(),
+                    timestamp=process_message.timestamp,
+                    relationship=FactoryRelationship.MOVED_BY,
+                ))
+            case _:
+                raise RuntimeError(f'Invalid operation type was specified. ({process_message.operation_type.name})')
+        return transfer_message_number
+
+    @staticmethod
+    def _new_chunk(
+            factory: Factory,
+    ) -> Factory:
+        """
+        分割読み込み用の空の工場情報を生成する
+        :param factory: 工場情報
+        :return: 工場情報
+        """
+        return FactoryModelBuilder.build_factory(id=factory.id, name=factory.name)
 
     @staticmethod
     def get_compound_id(
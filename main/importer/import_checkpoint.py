@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Optional, Set
+
+
+class ImportCheckpoint:
+    """
+    インポート チェックポイント
+    登録が完了したバッチの識別子をファイルへ追記し、中断したインポートを再開できるようにする.
+    ファイルの先頭行にはインポート条件(入力ファイル、バッチサイズ等)を記録し、
+    条件が異なる場合はチェックポイントを破棄する.
+    """
+
+    def __init__(
+            self,
+            checkpoint_file_path: str,
+            fingerprint: {},
+            resume: bool = False,
+    ):
+        """
+        コンストラクタ
+        :param checkpoint_file_path: チェックポイントファイルのパス
+        :param fingerprint: インポート条件
+        :param resume: True: 既存のチェックポイントから再開する  False: 新規にインポートする
+        """
+        self._checkpoint_file_path = checkpoint_file_path
+        self._fingerprint = fingerprint
+        self._completed: Set[str] = set()
+        self._truncated = False
+        self.skipped = 0
+        if resume:
+            self._load()
+        self._file = open(self._checkpoint_file_path, 'a' if len(self._completed) > 0 else 'w', encoding='utf-8')
+        if len(self._completed) <= 0:
+            self._write(self._fingerprint)
+        elif self._truncated:
+            self._file.write('\n')
+
+    def is_completed(
+            self,
+            key: str,
+    ) -> bool:
+        """
+        登録完了済みバッチの判定
+        :param key: バッチ識別子
+        :return: True: 登録完了済み
+        """
+        completed = key in self._completed
+        if completed:
+            self.skipped += 1
+        return completed
+
+    def complete(
+            self,
+            key: str,
+    ) -> None:
+        """
+        バッチの登録完了を記録する
+        :param key: バッチ識別子
+        :return:
+        """
+        self._completed.add(key)
+        self._write(key)
+
+    def finish(self) -> None:
+        """
+        全バッチの登録完了. チェックポイントファイルを削除する
+        :return:
+        """
+        self.close()
+        if os.path.isfile(self._checkpoint_file_path):
+            os.remove(self._checkpoint_file_path)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self._checkpoint_file_path):
+            return
+        with open(self._checkpoint_file_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        try:
+            fingerprint = json.loads(lines[0]) if len(lines) > 0 else None
+        except json.JSONDecodeError:
+            fingerprint = None
+        if fingerprint != self._fingerprint:
+            print(f'The checkpoint was ignored because the import conditions have changed. '
+                  f'({self._checkpoint_file_path})')
+            return
+        self._truncated = not lines[-1].endswith('\n')
+        for line in lines[1:]:
+            try:
+                self._completed.add(json.loads(line))
+            except json.JSONDecodeError:
+                # 書き込み途中で中断された行
+                continue
+        print(f'{len(self._completed)} completed batches were found in the checkpoint. '
+              f'({self._checkpoint_file_path})')
+
+    def _write(
+            self,
+            data: Optional[object],
+    ) -> None:
+        self._file.write(json.dumps(data, ensure_ascii=False) + '\n')
+        self._file.flush()
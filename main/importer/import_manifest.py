@@ -0,0 +1,164 @@
+import dataclasses
+import json
+import os
+from collections import Counter
+from typing import List, Optional, Set
+
+from helper.db_helper import DBHelper
+from simulator.factory_models import ANode, Relationship, Factory, FactoryNodeTable, FactoryRelationship
+
+# 差分抽出対象ノード (Factory 属性名)
+MANIFEST_NODE_ATTRIBUTES = [
+    'production_lines',
+    'storages',
+    'machines',
+    'operating_crews',
+    'raw_materials',
+    'products',
+    'works',
+    'inspection_results',
+    'defect_information',
+    'measurement_messages',
+]
+
+
+class ImportManifest:
+    """
+    インポート済み識別子
+    登録済みのノード識別子と関係を保持し、工場情報から未登録のノードと関係のみを抽出する.
+    同じ (FROM, 関係, TO) の関係が複数存在するため、関係は出現回数で管理する.
+    """
+
+    def __init__(
+            self,
+            node_ids: Optional[Set[str]] = None,
+            relationships: Optional[Counter] = None,
+    ):
+        """
+        コンストラクタ
+        :param node_ids: 登録済みノード識別子 (<テーブル名>:<識別子>)
+        :param relationships: 登録済み関係 (<FROM>-><関係>-><TO>) と登録数
+        """
+        self.node_ids: Set[str] = node_ids if node_ids else set()
+        self.relationships: Counter = relationships if relationships else Counter()
+        # 抽出時に照合する登録済み関係の残数
+        self._remaining_relationships = Counter(self.relationships)
+        self.skipped_nodes = 0
+        self.skipped_relationships = 0
+
+    @staticmethod
+    def get_relationship_key(
+            from_id: str,
+            relation: str,
+            to_id: str,
+    ) -> str:
+        return f'{from_id}->{relation}->{to_id}'
+
+    @staticmethod
+    def normalize_id(record_id: str) -> str:
+        """
+        SurrealDB が返すレコード識別子 (table:⟨id⟩ 等) を <テーブル名>:<識別子> 形式へ変換する
+        :param record_id: レコード識別子
+        :return: レコード識別子
+        """
+        table, _, data_id = str(record_id).partition(':')
+        return f'{table}:{data_id.strip("⟨⟩`")}'
+
+    @classmethod
+    def load(
+            cls,
+            manifest_file_path: str,
+    ) -> 'ImportManifest':
+        """
+        マニフェストファイル読み込み
+        ファイルが存在しない場合は空のマニフェストを返す
+        :param manifest_file_path: マニフェストファイルパス
+        :return: インポート済み識別子
+        """
+        if not os.path.isfile(manifest_file_path):
+            return ImportManifest()
+        with open(manifest_file_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return ImportManifest(
+            node_ids=set(manifest.get('nodes', [])),
+            relationships=Counter(manifest.get('relationships', {})),
+        )
+
+    @classmethod
+    async def from_db(
+            cls,
+            client: DBHelper,
+    ) -> 'ImportManifest':
+        """
+        SurrealDB に登録済みのノード識別子と関係を取得する
+        :param client: SurrealDBヘルパ
+        :return: インポート済み識別子
+        """
+        node_ids = set()
+        for node_table in FactoryNodeTable:
+            records = await client.execute(f'SELECT id FROM {node_table.value};')
+            for record in records if records else []:
+                node_ids.add(cls.normalize_id(record['id']))
+        relationships = Counter()
+        for relation in FactoryRelationship:
+            records = await client.execute(f'SELECT in, out FROM {relation.value};')
+            for record in records if records else []:
+                relationships[cls.get_relationship_key(
+                    from_id=cls.normalize_id(record['in']),
+                    relation=relation.value,
+                    to_id=cls.normalize_id(record['out']))] += 1
+        return ImportManifest(node_ids=node_ids, relationships=relationships)
+
+    def save(
+            self,
+            manifest_file_path: str,
+    ) -> None:
+        """
+        マニフェストファイル書き込み
+        :param manifest_file_path: マニフェストファイルパス
+        :return:
+        """
+        with open(manifest_file_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'nodes': sorted(self.node_ids), 'relationships': dict(sorted(self.relationships.items()))},
+                f,
+                ensure_ascii=False)
+
+    def contains_node(
+            self,
+            node: ANode,
+    ) -> bool:
+        return node.get_compound_id() in self.node_ids
+
+    def extract_new(
+            self,
+            factory: Factory,
+    ) -> Factory:
+        """
+        未登録のノードと関係のみを持つ工場情報を抽出し、抽出したノードと関係を登録済みとして記録する
+        :param factory: 工場情報
+        :return: 未登録のノードと関係のみを持つ工場情報
+        """
+        changes = {}
+        for attribute in MANIFEST_NODE_ATTRIBUTES:
+            nodes: List[ANode] = getattr(factory, attribute)
+            new_nodes = [node for node in nodes if not self.contains_node(node)]
+            self.skipped_nodes += len(nodes) - len(new_nodes)
+            self.node_ids.update(node.get_compound_id() for node in new_nodes)
+            changes[attribute] = new_nodes
+
+        new_relationships: List[Relationship] = []
+        for relationship in factory.relationships:
+            key = self.get_relationship_key(
+                from_id=relationship.from_id,
+                relation=relationship.relationship,
+                to_id=relationship.to_id)
+            if self._remaining_relationships[key] > 0:
+                self._remaining_relationships[key] -= 1
+                self.skipped_relationships += 1
+                continue
+            self.relationships[key] += 1
+            new_relationships.append(relationship)
+        changes['relationships'] = new_relationships
+        self.node_ids.add(factory.get_compound_id())
+        return dataclasses.replace(factory, **changes)
@@ -0,0 +1,138 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from tqdm import tqdm
+
+from helper.request_stats import RequestStats
+
+
+@dataclass
+class TableMetrics(RequestStats):
+    """
+    テーブル(関係)毎のインポート統計
+    """
+    records: int = 0                                        # 登録レコード数
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class ImportMetrics:
+    """
+    インポート統計
+    テーブル(関係)毎の登録レコード数、リクエスト数、レイテンシ、送信バイト数、再試行数、エラー数を集計し、
+    登録の進捗をプログレスバーで表示する.
+    """
+
+    def __init__(
+            self,
+            total: Optional[int] = None,
+    ):
+        """
+        コンストラクタ
+        :param total: 登録予定のレコード数 (不明な場合 None)
+        """
+        self.tables: {str, TableMetrics} = {}
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        # 端末以外へ出力する場合はプログレスバーを表示しない
+        self._progress = tqdm(total=total, unit='rec', desc='importing', disable=None)
+
+    def get(
+            self,
+            table: str,
+    ) -> TableMetrics:
+        """
+        テーブル(関係)の統計を取得する
+        :param table: テーブル名 または 関係名
+        :return: テーブルの統計
+        """
+        return self.tables.setdefault(table, TableMetrics())
+
+    def complete(
+            self,
+            table: str,
+            records: int,
+    ) -> None:
+        """
+        レコードの登録完了を記録する
+        :param table: テーブル名 または 関係名
+        :param records: 登録レコード数
+        :return:
+        """
+        self.get(table).records += records
+        self._progress.update(records)
+
+    def close(self) -> None:
+        """
+        集計を終了し、プログレスバーを閉じる
+        :return:
+        """
+        if self._finished is None:
+            self._finished = time.perf_counter()
+            self._progress.close()
+
+    def get_summary(self) -> {}:
+        """
+        統計情報
+        :return: 統計情報
+        """
+        elapsed = (self._finished if self._finished is not None else time.perf_counter()) - self._started
+        tables = {}
+        for table, metrics in self.tables.items():
+            tables[table] = {
+                'records': metrics.records,
+                'records_per_second': metrics.records_per_second,
+                'requests': metrics.requests,
+                'elapsed': metrics.elapsed,
+                'latency': metrics.get_latency_percentiles(),
+                'sent_bytes': metrics.sent_bytes,
+                'retries': metrics.retries,
+                'errors': metrics.errors,
+            }
+        records = sum(metrics.records for metrics in self.tables.values())
+        return {
+            'elapsed': elapsed,
+            'records': records,
+            'records_per_second': records / elapsed if elapsed > 0 else 0.0,
+            'requests': sum(metrics.requests for metrics in self.tables.values()),
+            'sent_bytes': sum(metrics.sent_bytes for metrics in self.tables.values()),
+            'retries': sum(metrics.retries for metrics in self.tables.values()),
+            'errors': sum(metrics.errors for metrics in self.tables.values()),
+            'tables': tables,
+        }
+
+    def print_summary(self) -> None:
+        """
+        テーブル毎の統計を表示する
+        :return:
+        """
+        summary = self.get_summary()
+        print(f'{"table":<20} {"records":>9} {"rec/s":>9} {"requests":>8} '
+              f'{"p50(ms)":>8} {"p90(ms)":>8} {"p99(ms)":>8} {"max(ms)":>8} '
+              f'{"sent(KB)":>10} {"retries":>7} {"errors":>6}')
+        for table, metrics in summary['tables'].items():
+            latency = metrics['latency']
+            print(f'{table:<20} {metrics["records"]:>9} {metrics["records_per_second"]:>9.1f} '
+                  f'{metrics["requests"]:>8} '
+                  f'{latency.get("p50", 0) * 1000:>8.1f} {latency.get("p90", 0) * 1000:>8.1f} '
+                  f'{latency.get("p99", 0) * 1000:>8.1f} {latency.get("max", 0) * 1000:>8.1f} '
+                  f'{metrics["sent_bytes"] / 1024:>10.1f} {metrics["retries"]:>7} {metrics["errors"]:>6}')
+        print(f'{"total":<20} {summary["records"]:>9} {summary["records_per_second"]:>9.1f} '
+              f'{summary["requests"]:>8} {"":>8} {"":>8} {"":>8} {"":>8} '
+              f'{summary["sent_bytes"] / 1024:>10.1f} {summary["retries"]:>7} {summary["errors"]:>6}')
+
+    def save(
+            self,
+            metrics_file_path: str,
+    ) -> None:
+        """
+        統計情報を json ファイルへ出力する
+        :param metrics_file_path: 出力ファイルパス
+        :return:
+        """
+        with open(metrics_file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_summary(), f, indent=2, ensure_ascii=False)
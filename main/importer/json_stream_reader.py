@@ -0,0 +1,133 @@
+import json
+from typing import Any, Iterator, TextIO
+
+# ファイル読み込み単位(文字数)
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+_WHITESPACES = ' \t\n\r'
+_VALUE_TERMINATORS = _WHITESPACES + ',:]}'
+
+
+class JsonStreamReader:
+    """
+    JSONファイル逐次読み込み
+    ファイル全体をメモリへ展開せずに、オブジェクトのメンバや配列の要素を1つずつ読み込む
+    """
+
+    def __init__(
+            self,
+            file: TextIO,
+            block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        """
+        コンストラクタ
+        :param file: 読み込み対象ファイル
+        :param block_size: ファイル読み込み単位(文字数)
+        """
+        self._file = file
+        self._block_size = block_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        オブジェクトのメンバ名を順に返す
+        呼び出し側はメンバ名を受け取る毎に read_value / iter_object / iter_array のいずれかで値を読み込むこと
+        :return: メンバ名 (generator)
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f'Invalid JSON object key was found. ({key})')
+            self._expect(':')
+            yield key
+            if self._next_delimiter(end='}'):
+                return
+
+    def iter_array(self) -> Iterator[Any]:
+        """
+        配列の要素を1つずつ読み込む
+        :return: 要素 (generator)
+        """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self._next_delimiter(end=']'):
+                return
+
+    def iter_array_elements(self) -> Iterator['JsonStreamReader']:
+        """
+        配列の要素毎に自身を返す
+        呼び出し側は要素を受け取る毎に read_value / iter_object / iter_array のいずれかで要素を読み込むこと
+        :return: 自身 (generator)
+        """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self
+            if self._next_delimiter(end=']'):
+                return
+
+    def read_value(self) -> Any:
+        """
+        値を1つ読み込む
+        :return: 読み込んだ値
+        """
+        self._skip_whitespaces()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # 区切り文字が続かない値(数値等)は途中で分断されている可能性があるため追加で読み込む
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in _VALUE_TERMINATORS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _next_delimiter(self, end: str) -> bool:
+        c = self._peek()
+        self._pos += 1
+        if c == end:
+            return True
+        if c != ',':
+            raise ValueError(f'Invalid JSON delimiter was found. ({c})')
+        return False
+
+    def _expect(self, c: str) -> None:
+        if self._peek() != c:
+            raise ValueError(f'Invalid JSON format. ("{c}" was expected)')
+        self._pos += 1
+
+    def _peek(self) -> str:
+        self._skip_whitespaces()
+        if self._pos >= len(self._buffer):
+            raise ValueError('Unexpected end of JSON file.')
+        return self._buffer[self._pos]
+
+    def _skip_whitespaces(self) -> None:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACES:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill()
+
+    def _fill(self) -> None:
+        block = self._file.read(self._block_size)
+        if not block:
+            self._eof = True
+        self._buffer = self._buffer[self._pos:] + block
+        self._pos = 0
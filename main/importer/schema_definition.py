@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from typing import List
+
+from helper.db_helper import DBHelper
+from helper.surrealdb_sql_def import PRODUCTION_TIMES_TABLE
+from simulator.factory_models import FactoryNodeTable, FactoryRelationship
+
+
+@dataclass(frozen=True)
+class FieldDefinition:
+    """
+    フィールド定義
+    """
+    table: str                      # テーブル名
+    field: str                      # フィールド名 (data.type 等)
+    type: str                       # SurrealQL の型 (option<string> 等)
+
+    def get_statement(self) -> str:
+        return f'DEFINE FIELD {self.field} ON TABLE {self.table} TYPE {self.type};'
+
+
+@dataclass(frozen=True)
+class IndexDefinition:
+    """
+    インデックス定義
+    """
+    table: str                      # テーブル名
+    fields: List[str]               # 対象フィールド名群
+    unique: bool = False            # True: 一意インデックス
+
+    @property
+    def name(self) -> str:
+        return f'{self.table}_{"_".join(field.replace(".", "_") for field in self.fields)}_idx'.lower()
+
+    def get_statement(self) -> str:
+        unique = ' UNIQUE' if self.unique else ''
+        return f'DEFINE INDEX {self.name} ON TABLE {self.table} FIELDS {", ".join(self.fields)}{unique};'
+
+
+# 検索条件に使用するフィールド
+# (WORK WHERE data.type="NormalWork", PRODUCT[WHERE data.type="PARTS"], PRODUCT の data.status による絞り込み)
+FIELD_DEFINITIONS = [
+    FieldDefinition(table=FactoryNodeTable.WORK.name, field='data.type', type='option<string>'),
+    FieldDefinition(table=FactoryNodeTable.PRODUCT.name, field='data.type', type='option<string>'),
+    FieldDefinition(table=FactoryNodeTable.PRODUCT.name, field='data.status', type='option<string>'),
+]
+
+INDEX_DEFINITIONS = [
+    IndexDefinition(table=FactoryNodeTable.WORK.name, fields=['data.type']),
+    IndexDefinition(table=FactoryNodeTable.PRODUCT.name, fields=['data.type']),
+    IndexDefinition(table=FactoryNodeTable.PRODUCT.name, fields=['data.status']),
+    # 集計テーブル (製造時間検索で製造ライン、仕掛品毎に検索する)
+    IndexDefinition(table=PRODUCTION_TIMES_TABLE, fields=['production_line', 'product']),
+]
+
+
+def get_schema_statements() -> List[str]:
+    """
+    スキーマ定義 SurrealQL 文群生成
+    全ノードテーブル(FactoryNodeTable)と全関係テーブル(FactoryRelationship)をスキーマレスのテーブルとして定義し、
+    検索条件に使用するフィールドとインデックスを定義する.
+    :return: SurrealQL 文群
+    """
+    statements = [f'DEFINE TABLE {table.name} SCHEMALESS;' for table in FactoryNodeTable]
+    statements += [f'DEFINE TABLE {relation.name} SCHEMALESS;' for relation in FactoryRelationship]
+    statements += [definition.get_statement() for definition in FIELD_DEFINITIONS]
+    statements += [definition.get_statement() for definition in INDEX_DEFINITIONS]
+    return statements
+
+
+async def define_schema(
+        client: DBHelper,
+) -> None:
+    """
+    スキーマ定義
+    テーブル、フィールド、インデックスを1トランザクションで定義する (定義済みの場合は再定義する)
+    :param client: SurrealDBヘルパ
+    :return:
+    """
+    statements = get_schema_statements()
+    await client.transaction(statements=statements, idempotent=True)
+    print(f'defined {len(FactoryNodeTable) + len(FactoryRelationship)} tables, '
+          f'{len(FIELD_DEFINITIONS)} fields, {len(INDEX_DEFINITIONS)} indexes.')
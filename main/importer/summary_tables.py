@@ -0,0 +1,46 @@
+import datetime
+import time
+
+import util
+from helper.db_helper import DBHelper
+from helper.surrealdb_sql_def import SUMMARY_TABLES, SUMMARY_TABLES_STATUS_TABLE, SUMMARY_TABLES_STATUS_ID, \
+    DELETE_SUMMARY_TABLES_STATUS
+
+
+async def invalidate_summary_tables(
+        client: DBHelper,
+) -> None:
+    """
+    集計テーブル無効化
+    インポート中の集計テーブルは登録済みの情報と一致しないため、集計テーブルの状態レコードを削除する.
+    (状態レコードが存在しない間、ダッシュボードは集計テーブルを使用せずにグラフを検索する)
+    :param client: SurrealDBヘルパ
+    :return:
+    """
+    await client.execute(query=DELETE_SUMMARY_TABLES_STATUS)
+
+
+async def refresh_summary_tables(
+        client: DBHelper,
+        verbose: bool = True,
+) -> None:
+    """
+    集計テーブル再生成
+    集計テーブル毎に全レコードの削除と集計結果の登録を1トランザクションで実行し、
+    全集計テーブルの生成後に集計テーブルの状態レコードを登録する.
+    :param client: SurrealDBヘルパ
+    :param verbose: True: 集計テーブル毎の処理時間を表示する
+    :return:
+    """
+    for table, insert_sql in SUMMARY_TABLES.items():
+        started = time.perf_counter()
+        await client.transaction(statements=[f'DELETE {table};', insert_sql], idempotent=True)
+        if verbose:
+            print(f'refreshed summary table {table}. ({time.perf_counter() - started:.1f}s)')
+    await client.upsert_one(
+        table=SUMMARY_TABLES_STATUS_TABLE,
+        id=SUMMARY_TABLES_STATUS_ID,
+        data={
+            'tables': list(SUMMARY_TABLES.keys()),
+            'refreshed': util.to_iso88601_datatime(datetime.datetime.now(datetime.timezone.utc)),
+        })
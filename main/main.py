@@ -26,15 +26,30 @@ if __name__ == '__main__':
     simulate 
         [--clock 500]                                  製造ラインシミュレータ クロック
         [--file PJ-DIR/json_data/factory_data.json]    製造データ格納jsonファイルパス 
+                                                       (拡張子が .arrow/.feather の場合は Arrow IPC 形式で出力する)
         
     import  
         [--file PJ-DIR/json_data/factory_data.json]    製造データ格納jsonファイルパス 
+                                                       (Arrow IPC 形式のファイルも読み込める)
         [--server localhost]                           SurrealDB ホスト名
         [--prot 8000]                                  SurrealDB ポート番号
         [--namespace test]                             SurrealDB 名前空間名
         [--database test]                              SurrealDB データベース名
         [--user root]                                  SurrealDB 認証ユーザ
         [--PW root]                                    SurrealDB 認証ユーザ パスワード
+        [--transport http]                             SurrealDB 接続方式(http, ws: 1本の WebSocket コネクションで多重化)
+        [--batch-size 0]                               1リクエストで登録するレコード数(0: 1レコード毎)
+        [--concurrency 1]                              同時に実行するリクエスト数(1: 逐次実行)
+        [--chunk-size 0]                               ファイルを逐次読み込む際のメッセージ数(0: ファイル全体を読み込む)
+        [--resume]                                     中断したインポートをチェックポイントから再開する(--batch-size 指定時)
+        [--delta]                                      未登録のノードと関係のみを登録する(差分インポート)
+        [--manifest '']                                登録済み識別子を記録するマニフェストファイルパス(省略時 --delta は SurrealDB を参照する)
+        [--workers 1]                                  作業履歴から関係を生成するプロセス数(1: 逐次生成)
+        [--metrics-file '']                            インポート統計情報(テーブル毎の登録速度、レイテンシ等)出力jsonファイルパス
+        [--max-retries 3]                              一時的なエラーの場合にリクエストを再試行する回数(0: 再試行しない)
+        [--rate-limit 0]                               1秒あたりの最大リクエスト数(0: 制限しない)
+        [--skip-schema]                                インポート前にテーブル、フィールド、インデックスを定義しない
+        [--skip-summary]                               インポート後にダッシュボード用の集計テーブルを生成しない
     ※PJ-DIR: project root directory
     """
     args = sys.argv
@@ -0,0 +1,243 @@
+import json
+from os import path
+from typing import Iterator, List, Optional, Tuple, Any
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import util
+
+# Arrow IPC 形式で入出力するファイルの拡張子
+ARROW_FILE_EXTENSIONS = ('.arrow', '.feather')
+
+# Arrow IPC ファイル先頭のマジックナンバー
+_ARROW_MAGIC = b'ARROW1'
+
+# 工場構成情報を格納するスキーマメタデータのキー
+_FACTORY_METADATA_KEY = b'factory'
+
+# タイムスタンプ列の文字列変換書式 (列は UTC で格納する)
+_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
+
+# 1レコードバッチに格納するメッセージ数
+DEFAULT_RECORD_BATCH_SIZE = 64 * 1024
+
+# メッセージの格納先セクション
+PRODUCTION_HISTORIES = 'production_histories'
+MEASUREMENTS = 'measurements'
+
+# 工程メッセージの data 内の文字列項目
+_PROCESS_DATA_STRING_COLUMNS = [
+    'mid',
+    'work_type',
+    'product_id',
+    'product_type',
+    'product_status',
+    'raw_material_id',
+    'parts_id',
+    'storage_id',
+]
+
+# 工程メッセージの data 内の辞書項目
+_PROCESS_DATA_STRUCT_COLUMNS = [
+    'inspection_result',
+    'product_defect',
+]
+
+
+def is_arrow_file_path(file_path: str) -> bool:
+    """
+    Arrow IPC 形式で出力するファイルパスの判定
+    :param file_path: ファイルパス
+    :return: True: Arrow IPC 形式
+    """
+    return path.splitext(file_path)[1].lower() in ARROW_FILE_EXTENSIONS
+
+
+def is_arrow_file(file_path: str) -> bool:
+    """
+    Arrow IPC 形式ファイルの判定 (ファイル先頭のマジックナンバーで判定する)
+    :param file_path: ファイルパス
+    :return: True: Arrow IPC 形式
+    """
+    with open(file_path, 'rb') as f:
+        return f.read(len(_ARROW_MAGIC)) == _ARROW_MAGIC
+
+
+def write_factory_data(
+        factory_data: {},
+        file_path: str,
+        record_batch_size: int = DEFAULT_RECORD_BATCH_SIZE,
+) -> None:
+    """
+    工場情報を Arrow IPC 形式ファイルへ出力する
+    作業履歴(production_histories)と測定情報(measurements)のメッセージは1メッセージ1行の型付きの列として格納し、
+    工場構成情報はスキーマメタデータに json として格納する.
+    memory map で読み込めるよう圧縮はしない.
+    :param factory_data: 工場情報 (json 出力と同じ構造)
+    :param file_path: 出力ファイルパス
+    :param record_batch_size: 1レコードバッチに格納するメッセージ数
+    :return:
+    """
+    rows: List[Tuple[str, int, str, dict]] = []
+    for group, production_history in enumerate(factory_data.get(PRODUCTION_HISTORIES, [])):
+        for message in production_history.get('messages', []):
+            rows.append((PRODUCTION_HISTORIES, group, production_history.get('created_by', ''), message))
+    for group, measurement in enumerate(factory_data.get(MEASUREMENTS, [])):
+        for message in measurement.get('messages', []):
+            rows.append((MEASUREMENTS, group, measurement.get('created_by', ''), message))
+
+    process_data = [message.get('data', {}) if section == PRODUCTION_HISTORIES else None
+                    for section, _, _, message in rows]
+    measurement_data = [message.get('data', {}).get('measurements', {}) if section == MEASUREMENTS else None
+                        for section, _, _, message in rows]
+    columns = {
+        'section': _dictionary_array([section for section, _, _, _ in rows]),
+        'group': pa.array([group for _, group, _, _ in rows], type=pa.int32()),
+        'created_by': _dictionary_array([created_by for _, _, created_by, _ in rows]),
+        'id': pa.array([message.get('id', None) for _, _, _, message in rows], type=pa.string()),
+        'work_id': _dictionary_array([message.get('work_id', None) for _, _, _, message in rows]),
+        'message_type': _dictionary_array([message.get('message_type', None) for _, _, _, message in rows]),
+        'timestamp': pa.array(
+            [util.convert_utc_string_to_datetime(message['timestamp']) if message.get('timestamp', None) else None
+             for _, _, _, message in rows],
+            type=pa.timestamp('s', tz='UTC')),
+    }
+    for name in _PROCESS_DATA_STRING_COLUMNS:
+        columns[name] = _dictionary_array([data.get(name, None) if data is not None else None
+                                           for data in process_data])
+    for name in _PROCESS_DATA_STRUCT_COLUMNS:
+        # 空の辞書は null として格納する
+        columns[name] = pa.array([data.get(name) if data and data.get(name, None) else None
+                                  for data in process_data])
+    values = [value for data in measurement_data if data for value in data.values()]
+    value_type = pa.array(values).type if len(values) > 0 else pa.float64()
+    columns[MEASUREMENTS] = pa.array(
+        [list(data.items()) if data is not None else None for data in measurement_data],
+        type=pa.map_(pa.string(), value_type))
+
+    factory = {key: value for key, value in factory_data.items() if key not in (PRODUCTION_HISTORIES, MEASUREMENTS)}
+    table = pa.table(columns).replace_schema_metadata(
+        {_FACTORY_METADATA_KEY: json.dumps(factory, ensure_ascii=False)})
+    # IPC ファイル形式ではレコードバッチ間で辞書を共有する必要がある
+    table = table.unify_dictionaries()
+    with pa.OSFile(file_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=record_batch_size)
+
+
+def iter_factory_data(
+        file_path: str,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Arrow IPC 形式ファイルを memory map で読み込み、工場情報を先頭から順に返す
+    レコードバッチはファイル上のバッファを複製せずに参照し、1バッチずつメッセージへ変換する.
+    :param file_path: ファイルパス
+    :return: ('factory', 工場構成情報),
+             ('production_history', 作業履歴), ('measurement', (測定情報作成元識別子, 測定情報)) (generator)
+    """
+    with pa.memory_map(file_path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata if reader.schema.metadata else {}
+        yield 'factory', json.loads(metadata.get(_FACTORY_METADATA_KEY, b'{}'))
+
+        production_history: Optional[dict] = None
+        current: Optional[Tuple[str, int]] = None
+        for i in range(reader.num_record_batches):
+            for section, group, created_by, message in _iter_messages(reader.get_batch(i)):
+                if section == MEASUREMENTS:
+                    if production_history:
+                        yield 'production_history', production_history
+                        production_history = None
+                    yield 'measurement', (created_by, message)
+                    continue
+                if current != (section, group):
+                    if production_history:
+                        yield 'production_history', production_history
+                    production_history = {'created_by': created_by, 'messages': []}
+                    current = (section, group)
+                production_history['messages'].append(message)
+        if production_history:
+            yield 'production_history', production_history
+
+
+def read_factory_data(
+        file_path: str,
+) -> {}:
+    """
+    Arrow IPC 形式ファイルから工場情報を読み込む
+    :param file_path: ファイルパス
+    :return: 工場情報 (json ファイルと同じ構造)
+    """
+    factory_data = {}
+    production_histories = []
+    measurements: {str, {}} = {}
+    for kind, value in iter_factory_data(file_path=file_path):
+        if kind == 'factory':
+            factory_data = value
+        elif kind == 'production_history':
+            production_histories.append(value)
+        else:
+            created_by, message = value
+            measurements.setdefault(created_by, {'created_by': created_by, 'messages': []})['messages'].append(message)
+    factory_data[PRODUCTION_HISTORIES] = production_histories
+    factory_data[MEASUREMENTS] = list(measurements.values())
+    return {'factory': factory_data}
+
+
+def _iter_messages(
+        batch: pa.RecordBatch,
+) -> Iterator[Tuple[str, int, str, dict]]:
+    """
+    レコードバッチの各行をメッセージへ変換する
+    :param batch: レコードバッチ
+    :return: (セクション, グループ番号, 作成元識別子, メッセージ) (generator)
+    """
+    columns = {name: _to_pylist(batch.column(name)) for name in batch.schema.names}
+    for i in range(batch.num_rows):
+        message = {
+            'id': columns['id'][i],
+            'work_id': columns['work_id'][i],
+            'message_type': columns['message_type'][i],
+            'timestamp': columns['timestamp'][i],
+        }
+        section = columns['section'][i]
+        if section == MEASUREMENTS:
+            message['data'] = {MEASUREMENTS: dict(columns[MEASUREMENTS][i])}
+        else:
+            data = {name: columns[name][i] for name in _PROCESS_DATA_STRING_COLUMNS}
+            for name in _PROCESS_DATA_STRUCT_COLUMNS:
+                data[name] = _drop_none(columns[name][i])
+            message['data'] = data
+        yield section, columns['group'][i], columns['created_by'][i], message
+
+
+def _to_pylist(column: pa.Array) -> List[Any]:
+    """
+    列を Python のリストへ変換する
+    辞書型の列は辞書を1回だけ変換して索引で参照し、タイムスタンプ列は json 出力と同じ書式の文字列へ変換する
+    :param column: 列
+    :return: 値のリスト
+    """
+    if pa.types.is_dictionary(column.type):
+        values = column.dictionary.to_pylist()
+        return [values[index] if index is not None else None for index in column.indices.to_pylist()]
+    if pa.types.is_timestamp(column.type):
+        return pc.strftime(column, format=_TIMESTAMP_FORMAT).to_pylist()
+    return column.to_pylist()
+
+
+def _dictionary_array(values: List[Optional[str]]) -> pa.Array:
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+
+def _drop_none(value: Optional[dict]) -> {}:
+    """
+    構造体列の値から null の項目を除く (列の型は全行の項目の和集合のため)
+    :param value: 構造体列の値
+    :return: 辞書
+    """
+    if not value:
+        return {}
+    return {key: _drop_none(item) if isinstance(item, dict) else item
+            for key, item in value.items() if item is not None}
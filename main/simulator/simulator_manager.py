@@ -7,6 +7,7 @@ import simpy
 from simpy import Environment
 
 from arguments_parser import parse, Params
+from simulator import factory_data_arrow
 from simulator.factory_model_builder import FactoryModelBuilder
 from simulator.factory_models import Relationship, Work, Product, Measurement
 from simulator.factory_simulator import FactorySimulator
@@ -167,6 +168,12 @@ class SimulatorManager:
             }
         }
 
+        if factory_data_arrow.is_arrow_file_path(json_data_file_path):
+            # 拡張子が .arrow/.feather の場合は Arrow IPC 形式で出力する
+            factory_data_arrow.write_factory_data(factory_data=factory['factory'], file_path=json_data_file_path)
+            print(f'arrow file: {json_data_file_path}')
+            return str(json_data_file_path)
+
         with open(json_data_file_path, "w", encoding='utf-8') as f:
             json.dump(factory, f, indent=2, ensure_ascii=False)
         print(f'json file: {json_data_file_path}')
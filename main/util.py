@@ -20,6 +20,17 @@ def convert_utc_string_to_datetime(utc_string) -> datetime.datetime:
     return datetime_object
 
 
+def chunks(items: [], size: int):
+    """
+    リストを指定サイズ毎に分割する
+    :param items: 分割対象リスト
+    :param size: 分割サイズ
+    :return: 分割されたリスト (generator)
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 def addMinutes(date: datetime.datetime, minutes: int) -> datetime.datetime:
     return date + datetime.timedelta(minutes=minutes)
 